@@ -9,27 +9,1676 @@ import os
 import sys
 import subprocess
 import platform
-import urllib.request
-import zipfile
-import tarfile
-import json
-import tempfile
+import re
 import shutil
+import glob
+import ntpath
+import time
+import threading
+import collections
+import contextlib
+import atexit
+import abc
 from pathlib import Path
-import winreg
 import logging
 
-# Cấu hình logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Cấu hình logging (main() chuyển sang ghi qua queue bằng setup_logging)
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+# Structured logging (--log-format=json): các field luôn có trong mỗi record (null nếu không áp dụng)
+LOG_FORMATS = ['text', 'json']
+LOG_EVENT_FIELDS = ('step', 'tool', 'duration_ms', 'bytes', 'exit_code')
+DEFAULT_LOG_FILE_MAX_SIZE = '10M'
+LOG_FILE_BACKUP_COUNT = 5
+
+# QueueListener đang chạy (setup_logging), dừng khi thoát chương trình
+log_listener = None
+log_atexit_registered = False   # stop_logging chỉ đăng ký với atexit một lần
+
+# Command bọc ngoài tool thật (get_command_tool) và các option của chúng có nhận giá trị ở token kế tiếp
+COMMAND_WRAPPER_OPTIONS = {
+    'sudo': {'-u', '--user', '-g', '--group', '-h', '--host', '-p', '--prompt', '-C', '--close-from',
+             '-D', '--chdir', '-r', '--role', '-t', '--type', '-U', '--other-user', '-T',
+             '--command-timeout', '-R', '--chroot'},
+    'env': {'-u', '--unset', '-C', '--chdir', '-S', '--split-string'},
+}
+
+# Package cần thiết cho từng Linux package manager (thứ tự = thứ tự ưu tiên khi phát hiện)
+#   refresh:         command cập nhật package index
+#   refresh_install: command cài đặt kèm refresh (nếu package manager không nên refresh riêng)
+#   index_files:     các file có mtime cho biết lần refresh gần nhất
+LINUX_PACKAGE_MANAGERS = {
+    'apt': {
+        'refresh': 'apt update',
+        'install': 'apt install -y',
+        'index_files': [
+            '/var/lib/apt/periodic/update-success-stamp',
+            '/var/lib/apt/lists/partial',
+            '/var/lib/apt/lists/*InRelease'
+        ],
+        'packages': ['build-essential', 'gcc', 'g++', 'gdb', 'make',
+                     'cmake', 'ninja-build', 'git', 'curl', 'wget']
+    },
+    'dnf': {
+        'refresh': 'dnf makecache',
+        'install': 'dnf install -y',
+        'index_files': [
+            '/var/cache/dnf/*.solv',
+            '/var/cache/libdnf5/*/repodata/repomd.xml'
+        ],
+        'groups': ['Development Tools'],
+        'group_list': 'dnf -C group list --installed',
+        'packages': ['gcc', 'gcc-c++', 'gdb', 'make', 'cmake', 'ninja-build',
+                     'git', 'curl', 'wget']
+    },
+    'yum': {
+        'refresh': 'yum makecache',
+        'install': 'yum install -y',
+        'index_files': ['/var/cache/yum/*/*/*/repomd.xml'],
+        'groups': ['Development Tools'],
+        'group_list': 'yum -C grouplist installed',
+        'packages': ['gcc', 'gcc-c++', 'gdb', 'make', 'cmake', 'ninja-build',
+                     'git', 'curl', 'wget']
+    },
+    'pacman': {
+        # Arch không hỗ trợ partial upgrade (-Sy rồi -S), refresh luôn đi kèm -u
+        'refresh_install': 'pacman -Syu --needed --noconfirm',
+        'install': 'pacman -S --needed --noconfirm',
+        'index_files': ['/var/lib/pacman/sync/*.db'],
+        'packages': ['base-devel', 'gcc', 'gdb', 'make', 'cmake', 'ninja',
+                     'git', 'curl', 'wget']
+    },
+    'zypper': {
+        'refresh': 'zypper --non-interactive refresh',
+        'install': 'zypper --non-interactive install',
+        'index_files': ['/var/cache/zypp/raw/*/repodata/repomd.xml'],
+        'packages': ['gcc', 'gcc-c++', 'gdb', 'make', 'cmake', 'ninja',
+                     'git', 'curl', 'wget']
+    }
+}
+
+# Tuổi tối đa (giây) của package index trước khi refresh lại
+DEFAULT_PACKAGE_INDEX_MAX_AGE = 24 * 60 * 60
+
+# Các thư mục MSYS2 root thông thường
+MSYS2_SEARCH_PATHS = [
+    "C:\\msys64",
+    "C:\\msys2",
+    "C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSYS2",
+    "C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSYS2",
+    "C:\\Program Files\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSYS2",
+    "C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSYS2"
+]
+
+# Danh sách MinGW packages cần thiết
+MINGW_PACKAGES = [
+    "mingw-w64-x86_64-gcc",           # GCC compiler
+    "mingw-w64-x86_64-g++",           # G++ compiler
+    "mingw-w64-x86_64-gdb",           # GNU Debugger
+    "mingw-w64-x86_64-make",          # GNU Make
+    "mingw-w64-x86_64-cmake",         # CMake for MinGW
+    "mingw-w64-x86_64-ninja",         # Ninja build system
+    "mingw-w64-x86_64-pkg-config",    # pkg-config
+    "mingw-w64-x86_64-toolchain",     # Complete toolchain
+    "mingw-w64-x86_64-libtool",       # GNU libtool
+    "mingw-w64-x86_64-autotools",     # Autotools
+]
+
+# Các development libraries bổ sung
+MINGW_DEV_PACKAGES = [
+    "mingw-w64-x86_64-zlib",          # zlib library
+    "mingw-w64-x86_64-openssl",       # OpenSSL library
+    "mingw-w64-x86_64-libiconv",      # iconv library
+    "mingw-w64-x86_64-gettext",       # gettext library
+]
+
+# Kích thước tối đa mặc định của pacman cache chung (--prune-pacman-cache)
+DEFAULT_PACMAN_CACHE_MAX_SIZE = '10G'
+
+# Cấu hình tăng tốc package manager (--accelerate)
+DEFAULT_PARALLEL_DOWNLOADS = 10
+CONFIG_BACKUP_SUFFIX = '.cppdeps.bak'
+MIRRORLIST_RANKED_MARKER = '# Ranked by CppDepsInstaller'
+
+# vcpkg shim (--lazy-vcpkg): marker nhận diện shim và thời gian chờ lock bootstrap (giây)
+VCPKG_SHIM_MARKER = 'vcpkg shim generated by CppDepsInstaller'
+VCPKG_BOOTSTRAP_LOCK_TIMEOUT = 30 * 60
+
+# Các thư mục thông thường để tìm tool thủ công trên Windows
+TOOL_SEARCH_PATHS = [
+    # MSYS2/MinGW paths
+    'C:\\msys64\\usr\\bin',
+    'C:\\msys64\\mingw64\\bin',
+    'C:\\msys64\\mingw32\\bin',
+    'C:\\msys64\\clang64\\bin',
+    'C:\\msys64\\ucrt64\\bin',
+
+    # Git for Windows (có MinGW)
+    'C:\\Program Files\\Git\\bin',
+    'C:\\Program Files\\Git\\mingw64\\bin',
+    'C:\\Program Files\\Git\\usr\\bin',
+    'C:\\Program Files (x86)\\Git\\bin',
+    'C:\\Program Files (x86)\\Git\\mingw64\\bin',
+    'C:\\Program Files (x86)\\Git\\usr\\bin',
+
+    # CMake
+    'C:\\Program Files\\CMake\\bin',
+    'C:\\Program Files (x86)\\CMake\\bin',
+
+    # Ninja
+    'C:\\Program Files\\ninja',
+    'C:\\ninja',
+
+    # MSBuild
+    'C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\MSBuild\\Current\\Bin',
+    'C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\MSBuild\\Current\\Bin',
+    'C:\\Program Files\\Microsoft Visual Studio\\2019\\BuildTools\\MSBuild\\Current\\Bin',
+    'C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\BuildTools\\MSBuild\\Current\\Bin',
+
+    # MSVC Compiler
+    'C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSVC',
+    'C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSVC',
+    'C:\\Program Files\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSVC',
+    'C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSVC',
+
+    # vcpkg
+    'C:\\vcpkg',
+    'C:\\Program Files\\vcpkg',
+
+    # LLVM/Clang
+    'C:\\Program Files\\LLVM\\bin',
+    'C:\\Program Files (x86)\\LLVM\\bin',
+]
+
+# Visual Studio: năm phát hành -> major version, và thứ tự ưu tiên Host/target của cl.exe
+VS_YEAR_TO_MAJOR = {2017: 15, 2019: 16, 2022: 17}
+MSVC_HOST_TARGET_PREFERENCE = [
+    ('hostx64', 'x64'),
+    ('hostx86', 'x64'),
+    ('hostx86', 'x86'),
+    ('hostx64', 'x86'),
+    ('hostarm64', 'arm64')
+]
+
+# Các thư mục Windows SDK thông thường
+WINDOWS_SDK_SEARCH_PATHS = [
+    "C:\\Program Files (x86)\\Windows Kits\\10",
+    "C:\\Program Files\\Windows Kits\\10",
+    "C:\\Program Files (x86)\\Microsoft SDKs\\Windows\\v10.0A",
+    "C:\\Program Files\\Microsoft SDKs\\Windows\\v10.0A"
+]
+
+# Các thư mục con chứa header trong Include/<phiên bản> của Windows SDK (theo thứ tự ưu tiên)
+WINDOWS_SDK_INCLUDE_SUBDIRS = ('ucrt', 'um', 'shared')
+
+# Các Windows header quan trọng cần kiểm tra mặc định
+WINDOWS_HEADERS = [
+    'windows.h',
+    'winuser.h',
+    'wingdi.h',
+    'winbase.h',
+    'winnt.h',
+    'winsock2.h',
+    'ws2tcpip.h',
+    'shlobj.h',
+    'shellapi.h'
+]
+
+# Các thư mục thông thường của CMake và Ninja (ngoài PATH)
+CMAKE_SEARCH_PATHS = [
+    'C:\\Program Files\\CMake\\bin',
+    'C:\\Program Files (x86)\\CMake\\bin',
+    'C:\\CMake\\bin',
+    'C:\\msys64\\mingw64\\bin',
+    'C:\\msys64\\usr\\bin'
+]
+NINJA_SEARCH_PATHS = [
+    'C:\\Program Files\\ninja',
+    'C:\\ninja',
+    'C:\\msys64\\mingw64\\bin',
+    'C:\\msys64\\usr\\bin'
+]
+
+# Các shell rc file (trong thư mục home) source env script do installer quản lý trên Unix
+SHELL_CONFIG_FILES = ['.bashrc', '.bash_profile', '.zshrc', '.profile']
+SHELL_SOURCE_MARKER = '# CppDepsInstaller environment'
+# Marker của các khối export cũ (được chuyển vào env script rồi xóa khỏi rc file)
+SHELL_CONFIG_MARKER = '# Added by CppDepsInstaller'
+
+# Chế độ shim (--shim-bin): một thư mục trong install_dir chứa shim cho mọi executable trong các thư mục
+# nguồn (symlink trên Unix; hardlink/bản sao .exe hoặc launcher .cmd trên Windows), chỉ nó nằm trên PATH
+SHIM_BIN_DIR = 'cppdeps-bin'
+SHIM_LAUNCHER_MARKER = 'rem CppDepsInstaller shim'
+SHIM_MANIFEST_FILE = 'shims.json'
+# Tool tìm resource/DLL theo đường dẫn của chính nó: trên Windows chỉ dùng launcher .cmd
+SHIM_LAUNCHER_ONLY_TOOLS = [
+    'gcc', 'g++', 'cc', 'c++', 'gdb', 'clang', 'clang++', 'cmake', 'ctest', 'cpack',
+    'vcpkg', 'git', 'msbuild', 'cl', 'link', 'lib'
+]
+
+# Backend lưu environment (--env-backend) và broadcast WM_SETTINGCHANGE có timeout
+ENV_BACKENDS = ['registry', 'shell', 'memory']
+HWND_BROADCAST = 0xFFFF
+WM_SETTINGCHANGE = 0x001A
+SMTO_ABORTIFHUNG = 0x0002
+ENV_BROADCAST_TIMEOUT_MS = 5000
+
+# Độ dài tối đa của một biến môi trường trên Windows (PATH của user + machine)
+WINDOWS_PATH_MAX_LENGTH = 32767
+
+# Env script (PATH và biến môi trường đã gộp) và trạng thái dùng để tạo lại nó
+ENV_SCRIPT_FILE = 'env.sh'
+ENV_STATE_FILE = 'env.json'
+
+# Kết quả discovery phụ thuộc lẫn nhau: invalidate một loại thì invalidate cả các loại phụ thuộc
+DISCOVERY_DEPENDENTS = {
+    'visual_studio': ('msbuild', 'msvc', 'msys2_roots', 'windows_sdks'),
+    'windows_sdks': ('windows_sdk',),
+    'msvc': ('cl',),
+    'msys2_roots': ('msys2', 'cmake', 'ninja')
+}
+
+# Kiểm tra cài đặt: arguments lấy version, số probe chạy song song và timeout mặc định (giây)
+VERSION_ARGS = {
+    'cl': [],
+    'vcpkg': ['version'],
+    'msbuild': ['-version']
+}
+VERIFY_MAX_WORKERS = 8
+DEFAULT_PROBE_TIMEOUT = 15
+
+# Probe cache: kết quả chạy --version theo định danh executable (--no-probe-cache để tắt)
+PROBE_CACHE_FILE = 'probe-cache.json'
+PROBE_CACHE_MAX_OUTPUT = 4096
+
+# Phiên bản Conan tối thiểu (Conan 2.x)
+MIN_CONAN_VERSION = (2, 0)
+
+# File thống kê cache hit trong vcpkg binary cache (--vcpkg-cache-stats) và thời gian chờ lock (giây)
+VCPKG_CACHE_STATS_FILE = 'cppdeps-stats.json'
+VCPKG_STATS_LOCK_TIMEOUT = 60
+
+# run_command: output được stream vào log từng dòng, chỉ giữ phần cuối (ký tự) để báo lỗi
+COMMAND_OUTPUT_TAIL_SIZE = 64 * 1024
+DEFAULT_COMMAND_LOG_LEVEL = 'INFO'
+
+def parse_size(size):
+    """Chuyển kích thước dạng '10G', '500M', '1024' sang bytes"""
+    if isinstance(size, int):
+        return size
+    size = str(size).strip().upper().rstrip('B')
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+def parse_log_level(level):
+    """Chuyển mức log dạng 'debug', 'INFO', '20' sang số của module logging"""
+    if isinstance(level, int):
+        return level
+    level = str(level).strip().upper()
+    if level.isdigit():
+        return int(level)
+    value = logging.getLevelName(level)
+    if not isinstance(value, int):
+        raise ValueError(f"Mức log không hợp lệ: {level}")
+    return value
+
+def log_event(event, message, level=logging.INFO, **fields):
+    """Ghi log kèm tên event và các field trong LOG_EVENT_FIELDS (dùng cho --log-format=json)"""
+    logger.log(level, message, extra={'event': event, 'event_fields': fields})
+
+class JsonLogFormatter(logging.Formatter):
+    """Mỗi record là một dòng JSON: time, level, event, message và các field cố định"""
+
+    def format(self, record):
+        import json
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'event': getattr(record, 'event', 'log'),
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'event_fields', {})
+        for name in LOG_EVENT_FIELDS:
+            entry[name] = fields.get(name)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+def prepare_queued_record(record):
+    """Thay cho QueueHandler.prepare: ghép args vào message nhưng giữ traceback riêng trong exc_text
+    (QueueHandler mặc định gộp traceback vào message), để formatter ở listener tự định dạng"""
+    import copy
+    record = copy.copy(record)
+    record.msg = record.getMessage()
+    record.args = None
+    if record.exc_info:
+        record.exc_text = logging.Formatter().formatException(record.exc_info)
+    record.exc_info = None
+    return record
+
+def setup_logging(log_format='text', log_file=None, log_file_max_size=DEFAULT_LOG_FILE_MAX_SIZE,
+                  level=logging.INFO):
+    """Ghi log qua queue: thread gọi logger chỉ đẩy record vào queue, QueueListener ghi ra
+    console (và file xoay vòng nếu có log_file) ở thread riêng
+    """
+    import queue
+    import logging.handlers
+    global log_listener, log_atexit_registered
+
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Log format không hợp lệ: {log_format} (hỗ trợ: {', '.join(LOG_FORMATS)})")
+    formatter = JsonLogFormatter() if log_format == 'json' else logging.Formatter(LOG_FORMAT)
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=parse_size(log_file_max_size),
+            backupCount=LOG_FILE_BACKUP_COUNT, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if not log_atexit_registered:
+        atexit.register(stop_logging)
+        log_atexit_registered = True
+    stop_logging()
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.prepare = prepare_queued_record
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    log_listener.start()
+    return log_listener
+
+def stop_logging():
+    """Dừng QueueListener sau khi ghi hết các record còn trong queue"""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        for handler in log_listener.handlers:
+            handler.close()
+        log_listener = None
+
+def get_command_tool(command):
+    """Tên tool của command (vd: '"C:\\msys64\\usr\\bin\\bash.exe" -lc ...' -> 'bash'), bỏ qua sudo/env và option của chúng"""
+    if isinstance(command, (list, tuple)):
+        parts = [str(part) for part in command]
+    else:
+        command = command.strip()
+        if command.startswith('"'):
+            first, _, rest = command[1:].partition('"')
+            parts = [first] + rest.split()
+        else:
+            parts = command.split()
+    while parts and parts[0] in COMMAND_WRAPPER_OPTIONS:
+        options_with_value = COMMAND_WRAPPER_OPTIONS[parts.pop(0)]
+        # Bỏ option (kèm giá trị, vd: sudo -u root) và biến môi trường (VAR=value) đứng trước command
+        while parts and (parts[0].startswith('-') or '=' in parts[0]):
+            part = parts.pop(0)
+            if part == '--':
+                break
+            if part in options_with_value and parts:
+                parts.pop(0)
+    if not parts:
+        return ''
+    return os.path.splitext(ntpath.basename(parts[0]))[0]
+
+class OutputTail:
+    """Ring buffer giữ các dòng output cuối cùng, tổng cộng không quá max_size ký tự"""
+
+    def __init__(self, max_size=COMMAND_OUTPUT_TAIL_SIZE):
+        self.max_size = max_size
+        self.lines = collections.deque()
+        self.size = 0
+        self.dropped = 0    # Số dòng đã bị bỏ khỏi buffer
+
+    def append(self, line):
+        """Thêm một dòng, bỏ các dòng cũ nhất khi vượt quá max_size"""
+        if len(line) > self.max_size:
+            line = line[-self.max_size:]
+        self.lines.append(line)
+        self.size += len(line)
+        while self.size > self.max_size:
+            self.size -= len(self.lines.popleft())
+            self.dropped += 1
+
+    def getvalue(self):
+        """Nội dung hiện có trong buffer"""
+        return ''.join(self.lines)
+
+class ExecutableIndex:
+    """Chỉ mục executable trong PATH và các thư mục cài đặt thông thường
+
+    Mỗi thư mục chỉ được liệt kê một lần bằng os.scandir, sau đó việc tìm tool
+    chỉ là tra cứu dict thay vì stat từng thư mục x từng extension như shutil.which.
+    """
+
+    def __init__(self, system, path_dirs=()):
+        self.system = system
+        if system == 'windows':
+            self.extensions = [ext.lower() for ext in
+                               os.environ.get('PATHEXT', '.COM;.EXE;.BAT;.CMD').split(';') if ext]
+        else:
+            self.extensions = []
+        self.path_dirs = []     # Thư mục trong PATH theo thứ tự
+        self.tools = {}         # Tên tool -> [đường dẫn] theo thứ tự PATH
+        self.scanned = {}       # Thư mục (đã chuẩn hóa) -> (thư mục, mtime, {tên tool: đường dẫn})
+
+        for directory in path_dirs:
+            self.add_path_directory(directory)
+
+    def normalize(self, name):
+        """Chuẩn hóa tên tool/thư mục (không phân biệt hoa thường trên Windows)"""
+        return name.lower() if self.system == 'windows' else name
+
+    def scan_directory(self, directory):
+        """Liệt kê executable trong thư mục (chỉ một lần, trừ khi thư mục thay đổi)"""
+        key = self.normalize(os.path.normpath(directory))
+        if key in self.scanned:
+            return self.scanned[key][2]
+
+        tools = {}
+        priorities = {}
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+
+                    name = self.normalize(entry.name)
+                    if self.system != 'windows':
+                        tools.setdefault(name, entry.path)
+                        continue
+
+                    # Trên Windows chỉ file có extension trong PATHEXT mới chạy được từ PATH:
+                    # "cl.exe" trỏ tới chính nó, "cl" trỏ tới cl.exe/cl.bat... theo thứ tự PATHEXT
+                    stem, ext = os.path.splitext(name)
+                    if ext in self.extensions:
+                        tools.setdefault(name, entry.path)
+                        priority = self.extensions.index(ext)
+                        if stem not in priorities or priority < priorities[stem]:
+                            priorities[stem] = priority
+                            tools[stem] = entry.path
+        except OSError:
+            mtime = None
+
+        self.scanned[key] = (directory, mtime, tools)
+        return tools
+
+    def add_path_directory(self, directory, prepend=False):
+        """Thêm thư mục vào PATH của chỉ mục (cập nhật incremental)"""
+        if not directory:
+            return
+        key = self.normalize(os.path.normpath(directory))
+        if key in (self.normalize(os.path.normpath(path_dir)) for path_dir in self.path_dirs):
+            return
+
+        for name, path in self.scan_directory(directory).items():
+            candidates = self.tools.setdefault(name, [])
+            if prepend:
+                candidates.insert(0, path)
+            else:
+                candidates.append(path)
+
+        if prepend:
+            self.path_dirs.insert(0, directory)
+        else:
+            self.path_dirs.append(directory)
+
+    def is_executable(self, path):
+        """Kiểm tra quyền thực thi (Windows dựa vào extension)"""
+        return self.system == 'windows' or os.access(path, os.X_OK)
+
+    def which(self, tool):
+        """Tìm tool trong PATH giống shutil.which"""
+        for path in self.tools.get(self.normalize(tool), []):
+            if self.is_executable(path):
+                return path
+        return None
+
+    def find_all(self, tool, directories):
+        """Tìm tool trong các thư mục cho trước, trả về [(thư mục, đường dẫn)] theo thứ tự"""
+        found = []
+        for directory in directories:
+            path = self.scan_directory(directory).get(self.normalize(tool))
+            if path and self.is_executable(path):
+                found.append((directory, path))
+        return found
+
+    def find(self, tool, directories):
+        """Tìm tool trong thư mục đầu tiên có nó, trả về (thư mục, đường dẫn) hoặc (None, None)"""
+        found = self.find_all(tool, directories)
+        return found[0] if found else (None, None)
+
+    def refresh(self):
+        """Quét lại các thư mục đã thay đổi (vd: sau khi cài đặt package)"""
+        changed = []
+        for key, (directory, mtime, tools) in self.scanned.items():
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                changed.append(key)
+
+        if not changed:
+            return False
+
+        for key in changed:
+            del self.scanned[key]
+        path_dirs = self.path_dirs
+        self.path_dirs = []
+        self.tools = {}
+        for directory in path_dirs:
+            self.add_path_directory(directory)
+        return True
+
+    def measure_lookup(self, directories, names):
+        """Đo chi phí tìm names theo thứ tự directories như shell (stat từng thư mục x extension)
+
+        Trả về (số lần stat, thời gian giây).
+        """
+        suffixes = self.extensions if self.system == 'windows' else ['']
+        probes = 0
+        start = time.perf_counter()
+        for name in names:
+            found = False
+            for directory in directories:
+                for suffix in suffixes:
+                    probes += 1
+                    if os.path.isfile(os.path.join(directory, name + suffix)):
+                        found = True
+                        break
+                if found:
+                    break
+        return probes, time.perf_counter() - start
+
+    def executable_names(self, directories):
+        """Tên các executable (không có extension trên Windows) trong các thư mục"""
+        names = set()
+        for directory in directories:
+            for name in self.scan_directory(directory):
+                if self.system != 'windows' or os.path.splitext(name)[1] not in self.extensions:
+                    names.add(name)
+        return sorted(names)
+
+def split_path(path_value, system):
+    """Tách PATH thành các entry (bỏ entry rỗng và dấu nháy bao quanh)"""
+    separator = ';' if system == 'windows' else ':'
+    entries = []
+    for entry in path_value.split(separator):
+        entry = entry.strip().strip('"')
+        if entry:
+            entries.append(entry)
+    return entries
+
+def path_entry_key(entry, system):
+    """Khóa so sánh entry PATH: mở rộng biến, chuẩn hóa separator, bỏ dấu / cuối, hoa thường trên Windows"""
+    expanded = os.path.expandvars(str(entry))
+    if system == 'windows':
+        return ntpath.normpath(expanded.replace('/', '\\')).rstrip('\\').lower()
+    normalized = os.path.normpath(expanded)
+    return normalized if normalized == '/' else normalized.rstrip('/')
+
+def optimize_path(path_value, system, priority_dirs=(), shadowed=(), max_length=None, exists=None):
+    """Tối ưu PATH: bỏ trùng, bỏ thư mục không tồn tại, đưa priority_dirs lên đầu
+
+    shadowed: các entry đã có ở nơi khác (vd: machine PATH khi tối ưu user PATH).
+    max_length: giới hạn độ dài, entry ưu tiên thấp nhất bị bỏ trước.
+    Trả về dict gồm 'path', 'entries', 'duplicates', 'missing', 'dropped', 'moved'.
+    """
+    exists = exists or (lambda entry: os.path.isdir(os.path.expandvars(entry)))
+    separator = ';' if system == 'windows' else ':'
+
+    seen = {path_entry_key(entry, system) for entry in shadowed}
+    entries = []
+    duplicates = []
+    missing = []
+    for entry in split_path(path_value, system):
+        key = path_entry_key(entry, system)
+        if key in seen:
+            duplicates.append(entry)
+        elif not exists(entry):
+            missing.append(entry)
+        else:
+            seen.add(key)
+            entries.append(entry)
+
+    # Thư mục toolchain của installer lên đầu theo thứ tự ưu tiên, các entry khác giữ nguyên thứ tự
+    priority = {}
+    for directory in priority_dirs:
+        priority.setdefault(path_entry_key(directory, system), len(priority))
+    ordered = sorted(entries, key=lambda entry: priority.get(path_entry_key(entry, system), len(priority)))
+    moved = sum(1 for before, after in zip(entries, ordered) if before != after)
+
+    dropped = []
+    if max_length is not None:
+        while ordered and len(separator.join(ordered)) > max_length:
+            dropped.insert(0, ordered.pop())
+
+    return {
+        'path': separator.join(ordered),
+        'entries': ordered,
+        'duplicates': duplicates,
+        'missing': missing,
+        'dropped': dropped,
+        'moved': moved
+    }
+
+def version_key(text):
+    """Chuyển chuỗi phiên bản ('14.38.33130', 'v4.0.30319') thành tuple số để so sánh đúng"""
+    return tuple(int(part) for part in re.findall(r'\d+', str(text)))
+
+class VisualStudioLocator:
+    """Tìm Visual Studio, MSBuild và cl.exe mà không cần os.walk
+
+    Nguồn chính là metadata của Visual Studio setup (state.json trong
+    ProgramData/Microsoft/VisualStudio/Packages/_Instances, giống vswhere), sau đó
+    mới đến cấu trúc thư mục mặc định. Thư mục gốc và ProgramData có thể thay đổi
+    để chạy trên cây thư mục giả lập.
+    """
+
+    def __init__(self, root=None, program_data=None):
+        self.root = Path(root or os.environ.get('SystemDrive', 'C:') + os.sep)
+        if program_data:
+            self.program_data = Path(program_data)
+        elif root:
+            self.program_data = self.root / 'ProgramData'
+        else:
+            self.program_data = Path(os.environ.get('ProgramData', self.root / 'ProgramData'))
+        self.instances_cache = None
+
+    def instances_dir(self):
+        """Thư mục chứa metadata của các Visual Studio instance"""
+        return self.program_data / 'Microsoft' / 'VisualStudio' / 'Packages' / '_Instances'
+
+    def read_instance(self, state_file, instance_id):
+        """Đọc một state.json, trả về dict mô tả instance hoặc None"""
+        import json
+        try:
+            with open(state_file, 'r', encoding='utf-8-sig') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not state.get('installationPath'):
+            return None
+
+        components = set()
+        for package in state.get('selectedPackages', []) + state.get('packages', []):
+            if isinstance(package, dict) and package.get('id'):
+                components.add(package['id'])
+
+        return {
+            'instance_id': instance_id,
+            'path': Path(state['installationPath']),
+            'version': state.get('installationVersion', ''),
+            'product': (state.get('product') or {}).get('id', ''),
+            'product_line': (state.get('catalogInfo') or {}).get('productLineVersion', ''),
+            'components': components
+        }
+
+    def instances(self):
+        """Các Visual Studio instance đã cài đặt, phiên bản mới nhất trước"""
+        if self.instances_cache is not None:
+            return self.instances_cache
+
+        instances = []
+        try:
+            with os.scandir(self.instances_dir()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        instance = self.read_instance(os.path.join(entry.path, 'state.json'), entry.name)
+                        if instance:
+                            instances.append(instance)
+        except OSError:
+            pass
+
+        instances.sort(key=lambda instance: version_key(instance['version']), reverse=True)
+        self.instances_cache = instances
+        return instances
+
+    def invalidate(self):
+        """Đọc lại instance metadata ở lần tra cứu sau (sau khi cài đặt Visual Studio)"""
+        self.instances_cache = None
+
+    def find_instances(self, component=None):
+        """Các instance có component (vd: Microsoft.VisualStudio.Component.VC.Tools.x86.x64)"""
+        return [instance for instance in self.instances()
+                if component is None or component in instance['components']]
+
+    def vs_install_roots(self):
+        """Các thư mục 'Microsoft Visual Studio' có tồn tại"""
+        roots = [self.root / 'Program Files' / 'Microsoft Visual Studio',
+                 self.root / 'Program Files (x86)' / 'Microsoft Visual Studio']
+        return [root for root in roots if root.is_dir()]
+
+    def vs_major_version(self, folder):
+        """'2022' -> 17, '18' -> 18 (VS 2026 trở đi dùng số phiên bản)"""
+        key = version_key(folder)
+        if not key:
+            return 0
+        return VS_YEAR_TO_MAJOR.get(key[0], key[0])
+
+    def installation_dirs(self):
+        """[(major version, thư mục cài đặt)]: instance metadata trước, sau đó cấu trúc mặc định"""
+        dirs = []
+        seen = set()
+        for instance in self.instances():
+            key = os.path.normcase(str(instance['path']))
+            if key not in seen:
+                seen.add(key)
+                dirs.append((version_key(instance['version'])[:1] or (0,), instance['path']))
+
+        # <năm>/<edition> trong các thư mục mặc định
+        for vs_root in self.vs_install_roots():
+            for edition_dir in vs_root.glob('*/*'):
+                key = os.path.normcase(str(edition_dir))
+                if key not in seen and edition_dir.is_dir():
+                    seen.add(key)
+                    dirs.append(((self.vs_major_version(edition_dir.parent.name),), edition_dir))
+
+        return [(major[0], path) for major, path in dirs]
+
+    def find_msbuild_candidates(self, installation_dirs=None):
+        """Danh sách MSBuild.exe, mới nhất trước (installation_dirs: kết quả installation_dirs() đã có)"""
+        if installation_dirs is None:
+            installation_dirs = self.installation_dirs()
+
+        candidates = []
+        for major, install_dir in installation_dirs:
+            # MSBuild/<Current|15.0>/Bin[/amd64]/MSBuild.exe, thư mục MSBuild chỉ liệt kê một lần
+            for bin_dir in install_dir.glob('MSBuild/*/Bin'):
+                version_name = bin_dir.parent.name
+                msbuild_version = (sys.maxsize,) if version_name == 'Current' else version_key(version_name)
+                for is_amd64, msbuild_exe in ((False, bin_dir / 'MSBuild.exe'),
+                                              (True, bin_dir / 'amd64' / 'MSBuild.exe')):
+                    if msbuild_exe.is_file():
+                        candidates.append(((major, msbuild_version, not is_amd64), msbuild_exe))
+
+        # MSBuild standalone và .NET Framework chỉ dùng khi không có Visual Studio
+        if not candidates:
+            fallbacks = [
+                (self.root / 'Program Files (x86)' / 'MSBuild', '*/Bin/MSBuild.exe'),
+                (self.root / 'Program Files' / 'MSBuild', '*/Bin/MSBuild.exe'),
+                (self.root / 'Windows' / 'Microsoft.NET' / 'Framework64', 'v*/MSBuild.exe'),
+                (self.root / 'Windows' / 'Microsoft.NET' / 'Framework', 'v*/MSBuild.exe')
+            ]
+            for base, pattern in fallbacks:
+                if base.is_dir():
+                    for msbuild_exe in base.glob(pattern):
+                        candidates.append(((0, version_key(msbuild_exe.parent.name), True), msbuild_exe))
+                if candidates:
+                    break
+
+        return [path for key, path in sorted(candidates, key=lambda item: item[0], reverse=True)]
+
+    def find_msbuild(self):
+        """MSBuild.exe mới nhất hoặc None"""
+        candidates = self.find_msbuild_candidates()
+        return candidates[0] if candidates else None
+
+    def find_msvc_tools_dirs(self, installation_dirs=None):
+        """Các thư mục VC/Tools/MSVC/<phiên bản>, MSVC mới nhất trước"""
+        if installation_dirs is None:
+            installation_dirs = self.installation_dirs()
+
+        candidates = []
+        for major, install_dir in installation_dirs:
+            msvc_base = install_dir / 'VC' / 'Tools' / 'MSVC'
+            if msvc_base.is_dir():
+                for version_dir in msvc_base.iterdir():
+                    if version_dir.is_dir():
+                        candidates.append(((version_key(version_dir.name), major), version_dir))
+
+        return [path for key, path in sorted(candidates, key=lambda item: item[0], reverse=True)]
+
+    def find_cl_candidates(self, msvc_dirs=None):
+        """Danh sách cl.exe, MSVC mới nhất và host/target ưu tiên trước"""
+        if msvc_dirs is None:
+            msvc_dirs = self.find_msvc_tools_dirs()
+
+        candidates = []
+        for index, msvc_dir in enumerate(msvc_dirs):
+            # bin/Host<arch>/<arch>/cl.exe
+            for cl_exe in msvc_dir.glob('bin/Host*/*/cl.exe'):
+                host_target = (cl_exe.parent.parent.name.lower(), cl_exe.parent.name.lower())
+                preference = (MSVC_HOST_TARGET_PREFERENCE.index(host_target)
+                              if host_target in MSVC_HOST_TARGET_PREFERENCE
+                              else len(MSVC_HOST_TARGET_PREFERENCE))
+                candidates.append(((index, preference), cl_exe))
+
+        return [path for key, path in sorted(candidates, key=lambda item: item[0])]
+
+    def find_cl(self):
+        """cl.exe mới nhất hoặc None"""
+        candidates = self.find_cl_candidates()
+        return candidates[0] if candidates else None
+
+class ToolchainDiscovery:
+    """Tìm các toolchain root một lần mỗi lần chạy và ghi nhớ kết quả
+
+    Các loại: visual_studio, msbuild, msvc, cl, windows_sdks, windows_sdk, msys2_roots, msys2,
+    cmake, ninja. Bước cài đặt nào thay đổi toolchain thì gọi invalidate() cho loại
+    tương ứng, các loại phụ thuộc (DISCOVERY_DEPENDENTS) cũng được tìm lại.
+    """
+
+    def __init__(self, get_index, vs_locator, run_probe):
+        self.get_index = get_index
+        self.vs_locator = vs_locator
+        self.run_probe = run_probe
+        self.results = {}
+        self.listings = {}
+
+    def get(self, kind):
+        """Kết quả discovery của một loại (chỉ tìm ở lần gọi đầu tiên)"""
+        if kind not in self.results:
+            self.results[kind] = getattr(self, f'discover_{kind}')()
+        return self.results[kind]
+
+    def invalidate(self, *kinds):
+        """Xóa kết quả đã ghi nhớ của các loại (không truyền gì = xóa tất cả)
+
+        Các thư mục đã thay đổi trong chỉ mục executable cũng được quét lại, để cmake/ninja
+        vừa cài (vd: từ MinGW packages) không bị bỏ sót do dùng danh sách file cũ.
+        """
+        self.get_index().refresh()
+        if not kinds:
+            self.results.clear()
+            self.listings.clear()
+            self.vs_locator.invalidate()
+            return
+
+        pending = list(kinds)
+        while pending:
+            kind = pending.pop()
+            self.results.pop(kind, None)
+            if kind == 'visual_studio':
+                self.vs_locator.invalidate()
+            elif kind == 'windows_sdks':
+                self.listings.clear()
+            pending.extend(DISCOVERY_DEPENDENTS.get(kind, ()))
+
+    def discover_visual_studio(self):
+        """[(major version, thư mục cài đặt)] của các Visual Studio instance"""
+        return self.vs_locator.installation_dirs()
+
+    def discover_msbuild(self):
+        """Danh sách MSBuild.exe, mới nhất trước"""
+        return self.vs_locator.find_msbuild_candidates(self.get('visual_studio'))
+
+    def discover_msvc(self):
+        """Các thư mục VC/Tools/MSVC/<phiên bản>, mới nhất trước"""
+        return self.vs_locator.find_msvc_tools_dirs(self.get('visual_studio'))
+
+    def discover_cl(self):
+        """Danh sách cl.exe, MSVC mới nhất và host/target ưu tiên trước"""
+        return self.vs_locator.find_cl_candidates(self.get('msvc'))
+
+    def list_directory(self, path):
+        """Tên các file trong thư mục (chữ thường, quét một lần bằng os.scandir)"""
+        key = os.path.normcase(path)
+        if key not in self.listings:
+            try:
+                with os.scandir(path) as entries:
+                    self.listings[key] = {entry.name.lower() for entry in entries}
+            except OSError:
+                self.listings[key] = set()
+        return self.listings[key]
+
+    def discover_windows_sdks(self):
+        """Tất cả Windows SDK đã cài [{'root', 'version', 'include_dir', 'lib_dir'}], mới nhất trước"""
+        sdks = []
+        for sdk_root in WINDOWS_SDK_SEARCH_PATHS:
+            include_base = os.path.join(sdk_root, "Include")
+            try:
+                versions = [entry.name for entry in os.scandir(include_base) if entry.is_dir()]
+            except OSError:
+                continue
+
+            for version in versions:
+                include_dir = os.path.join(include_base, version)
+                if any(os.path.isdir(os.path.join(include_dir, subdir)) for subdir in WINDOWS_SDK_INCLUDE_SUBDIRS):
+                    sdks.append({
+                        'root': sdk_root,
+                        'version': version,
+                        'include_dir': include_dir,
+                        'lib_dir': os.path.join(sdk_root, "Lib", version)
+                    })
+
+        # Sắp xếp theo số (10.0.22621 mới hơn 10.0.9), SDK trong thư mục ưu tiên trước khi trùng phiên bản
+        sdks.sort(key=lambda sdk: version_key(sdk['version']), reverse=True)
+        return sdks
+
+    def discover_windows_sdk(self):
+        """Windows SDK mới nhất hoặc None"""
+        sdks = self.get('windows_sdks')
+        return sdks[0] if sdks else None
+
+    def find_windows_headers(self, headers):
+        """{header: {'version', 'subdir', 'path'} hoặc None}, tìm trong mọi SDK (mới nhất trước)
+
+        Mỗi thư mục Include/<phiên bản>/<subdir> chỉ được liệt kê một lần, mỗi header
+        chỉ là một lần tra cứu trong set nên chi phí không tăng theo số lần gọi.
+        """
+        result = {header: None for header in headers}
+        pending = list(result)
+
+        for sdk in self.get('windows_sdks'):
+            if not pending:
+                break
+            for subdir in WINDOWS_SDK_INCLUDE_SUBDIRS:
+                subdir_path = os.path.join(sdk['include_dir'], subdir)
+                still_pending = []
+                for header in pending:
+                    # Header có thể nằm trong thư mục con, vd: sys/stat.h, winrt/wrl.h
+                    relative = header.replace('\\', '/')
+                    directory, _, name = relative.rpartition('/')
+                    header_dir = os.path.join(subdir_path, *directory.split('/')) if directory else subdir_path
+                    if name.lower() in self.list_directory(header_dir):
+                        result[header] = {
+                            'version': sdk['version'],
+                            'subdir': subdir,
+                            'path': os.path.join(header_dir, name)
+                        }
+                    else:
+                        still_pending.append(header)
+                pending = still_pending
+
+        return result
+
+    def discover_msys2_roots(self):
+        """Các MSYS2 root có bash.exe: thư mục thông thường và MSYS2 đi kèm Visual Studio"""
+        candidates = list(MSYS2_SEARCH_PATHS)
+        candidates += [str(install_dir / 'VC' / 'Tools' / 'MSYS2')
+                       for major, install_dir in self.get('visual_studio')]
+
+        roots = []
+        seen = set()
+        for path in candidates:
+            key = os.path.normcase(os.path.normpath(path))
+            if key not in seen:
+                seen.add(key)
+                if os.path.exists(os.path.join(path, "usr", "bin", "bash.exe")):
+                    roots.append(path)
+        return roots
+
+    def discover_msys2(self):
+        """{'root', 'working', 'bin_dirs'}: MSYS2 root hoạt động đầu tiên (probe pacman một lần)"""
+        fallback = None
+        for root in self.get('msys2_roots'):
+            bin_dirs = [path for path in (os.path.join(root, "usr", "bin"),
+                                          os.path.join(root, "mingw64", "bin"),
+                                          os.path.join(root, "mingw32", "bin"))
+                        if os.path.isdir(path)]
+            info = {'root': root, 'working': False, 'bin_dirs': bin_dirs}
+
+            pacman_path = os.path.join(root, "usr", "bin", "pacman.exe")
+            if os.path.exists(pacman_path):
+                try:
+                    info['working'] = self.run_probe(pacman_path, ['--version']).returncode == 0
+                except (OSError, subprocess.SubprocessError) as e:
+                    logger.warning(f"Lỗi khi kiểm tra MSYS2 tại {root}: {e}")
+
+            if info['working']:
+                return info
+            fallback = fallback or info
+        return fallback
+
+    def discover_cmake(self):
+        """(thư mục, executable) của CMake ngoài PATH hoặc (None, None)"""
+        return self.get_index().find('cmake', CMAKE_SEARCH_PATHS)
+
+    def discover_ninja(self):
+        """(thư mục, executable) của Ninja ngoài PATH hoặc (None, None)"""
+        return self.get_index().find('ninja', NINJA_SEARCH_PATHS)
+
+
+class EnvironmentJournal:
+    """Ghi nhận các thay đổi PATH và biến môi trường trong bộ nhớ
+
+    Các thay đổi được gộp và bỏ trùng, sau đó ghi ra một lần (flush_environment):
+    mỗi rc file được ghi lại một lần, trên Windows là một lần ghi registry và một broadcast.
+    """
+
+    def __init__(self, system):
+        self.system = system
+        self.path_entries = []
+        self.variables = {}
+
+    def normalize(self, path):
+        """Khóa so sánh đường dẫn (không phân biệt hoa thường trên Windows)"""
+        return path_entry_key(path, self.system)
+
+    def add_path(self, path):
+        """Ghi nhận thư mục cần thêm vào PATH, trả về False nếu đã có trong journal"""
+        key = self.normalize(path)
+        if any(self.normalize(entry) == key for entry in self.path_entries):
+            return False
+        self.path_entries.append(str(path))
+        return True
+
+    def set_variable(self, name, value):
+        """Ghi nhận biến môi trường (giá trị sau cùng được giữ)"""
+        self.variables[name] = str(value)
+
+    def is_empty(self):
+        return not self.path_entries and not self.variables
+
+    def clear(self):
+        self.path_entries = []
+        self.variables = {}
+
+
+def write_file_atomically(file_path, content):
+    """Ghi file qua temp file + rename, giữ quyền truy cập của file cũ"""
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = file_path.with_name(f'{file_path.name}.{os.getpid()}.tmp')
+    with open(temp_file, 'w', newline='\n') as f:
+        f.write(content)
+    if file_path.exists():
+        shutil.copymode(file_path, temp_file)
+    os.replace(temp_file, file_path)
+
+@contextlib.contextmanager
+def lock_file(path, timeout, poll_interval=1.0):
+    """Lock giữa các process/máy (kể cả trên network share) bằng file tạo với O_EXCL
+
+    Lock cũ hơn timeout giây được coi là bị bỏ lại bởi process đã chết.
+    Raise TimeoutError nếu không lấy được lock sau timeout giây.
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                # Lock bị bỏ lại bởi process đã chết
+                if time.time() - os.path.getmtime(path) > timeout:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Hết thời gian chờ lock: {path}")
+            time.sleep(poll_interval)
+
+    try:
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def shell_quote(value):
+    """Đặt value trong dấu nháy kép cho sh (escape \\, ", $, `)"""
+    for char in ('\\', '"', '$', '`'):
+        value = value.replace(char, '\\' + char)
+    return f'"{value}"'
+
+def merge_path_entries(system, *path_lists):
+    """Gộp các danh sách PATH theo thứ tự, bỏ entry trùng"""
+    merged = []
+    seen = set()
+    for entries in path_lists:
+        for entry in entries:
+            key = path_entry_key(entry, system)
+            if key not in seen:
+                seen.add(key)
+                merged.append(entry)
+    return merged
+
+def expand_windows_variables(value, variables):
+    """Mở rộng %VAR% theo variables (không phân biệt hoa thường), giữ nguyên biến không biết"""
+    lookup = {name.upper(): val for name, val in variables.items()}
+    return re.sub(r'%([^%;]+)%', lambda match: lookup.get(match.group(1).upper(), match.group(0)), value)
+
+def render_env_script(state, shell='sh'):
+    """Tạo nội dung env script (sh) hoặc các lệnh set (cmd) từ env state"""
+    if shell == 'cmd':
+        lines = [f'set "{name}={value}"' for name, value in state['variables'].items()]
+        if state['path']:
+            lines.append(f'set "PATH={";".join(state["path"])};%PATH%"')
+        return '\n'.join(lines) + '\n'
+
+    lines = ['# Managed by CppDepsInstaller - file được tạo lại mỗi lần chạy, không sửa trực tiếp']
+    lines += [f'export {name}={shell_quote(value)}' for name, value in state['variables'].items()]
+    # Thêm vào đầu PATH theo thứ tự đã cài đặt, bỏ qua nếu PATH đã có (source nhiều lần)
+    for path in state['path']:
+        quoted = shell_quote(path)
+        lines.append(f'case ":$PATH:" in *:{quoted}:*) ;; *) PATH={quoted[:-1]}:$PATH" ;; esac')
+    if state['path']:
+        lines.append('export PATH')
+    return '\n'.join(lines) + '\n'
+
+
+class EnvironmentBackend(abc.ABC):
+    """Lưu PATH và biến môi trường bền vững của user
+
+    write() ghi cả lô thay đổi một lần, broadcast() chỉ thông báo cho hệ thống một lần
+    khi có thay đổi. Env state (env.json) ghi nhận những gì installer quản lý (--print-env).
+    """
+
+    # True nếu backend có User PATH riêng (optimize_path ghi trực tiếp vào đó)
+    persistent_path = False
+
+    def __init__(self, system, config_dir=None):
+        self.system = system
+        self.config_dir = Path(config_dir) if config_dir else None
+        self.pending_broadcast = False
+
+    def load_state(self):
+        """Đọc PATH và biến môi trường đã ghi ở các lần chạy trước"""
+        import json
+        try:
+            with open(self.config_dir / ENV_STATE_FILE, 'r') as f:
+                state = json.load(f)
+            return {'path': list(state.get('path', [])), 'variables': dict(state.get('variables', {}))}
+        except (OSError, TypeError, ValueError):
+            return {'path': [], 'variables': {}}
+
+    def save_state(self, state):
+        """Ghi env state (temp file + rename)"""
+        import json
+        write_file_atomically(self.config_dir / ENV_STATE_FILE, json.dumps(state, indent=2))
+
+    def merge_state(self, state, path_entries, variables):
+        """Gộp thêm PATH (bỏ trùng, giữ thứ tự) và biến môi trường (giá trị mới thắng)"""
+        state['path'] = merge_path_entries(self.system, state['path'], path_entries)
+        state['variables'].update(variables)
+        return state
+
+    @abc.abstractmethod
+    def write(self, path_entries, variables):
+        """Ghi các thư mục PATH và biến môi trường, trả về True nếu thành công"""
+
+    def read_effective(self):
+        """Environment bền vững hiệu lực: ({tên: giá trị}, [PATH entries theo thứ tự tìm kiếm])"""
+        state = self.load_state()
+        return state['variables'], list(state['path'])
+
+    def read_user_path(self):
+        """User PATH; backend không có User PATH riêng (persistent_path = False) dùng PATH của process"""
+        return os.environ.get('PATH', '')
+
+    def read_machine_path(self):
+        """Machine PATH (chỉ backend có persistent_path)"""
+        return ''
+
+    def write_user_path(self, path_value):
+        """Ghi đè User PATH; backend không có User PATH riêng chỉ cập nhật PATH của process"""
+        os.environ['PATH'] = path_value
+
+    def broadcast(self):
+        """Thông báo thay đổi environment (nhiều lần ghi chỉ một lần thông báo)"""
+        if self.pending_broadcast:
+            self.pending_broadcast = False
+            self.send_broadcast()
+
+    def send_broadcast(self):
+        pass
+
+
+class MemoryEnvironmentBackend(EnvironmentBackend):
+    """Backend trong bộ nhớ (giả lập registry) để test và benchmark trên mọi hệ điều hành"""
+
+    persistent_path = True
+
+    def __init__(self, system, user_path='', machine_path='', variables=None, machine_variables=None):
+        super().__init__(system)
+        self.separator = ';' if system == 'windows' else ':'
+        self.user_path = user_path
+        self.machine_path = machine_path
+        self.variables = dict(variables or {})
+        self.machine_variables = dict(machine_variables or {})
+        self.state = {'path': [], 'variables': {}}
+        self.writes = 0
+        self.broadcasts = 0
+
+    def load_state(self):
+        return {'path': list(self.state['path']), 'variables': dict(self.state['variables'])}
+
+    def save_state(self, state):
+        self.state = state
+
+    def write(self, path_entries, variables):
+        entries = split_path(self.user_path, self.system)
+        self.user_path = self.separator.join(merge_path_entries(self.system, entries, path_entries))
+        self.variables.update(variables)
+        self.save_state(self.merge_state(self.load_state(), path_entries, variables))
+        self.writes += 1
+        self.pending_broadcast = True
+        return True
+
+    def read_effective(self):
+        variables = dict(self.machine_variables)
+        variables.update(self.variables)
+        return variables, split_path(self.machine_path, self.system) + split_path(self.user_path, self.system)
+
+    def read_user_path(self):
+        return self.user_path
+
+    def read_machine_path(self):
+        return self.machine_path
+
+    def write_user_path(self, path_value):
+        self.user_path = path_value
+        self.writes += 1
+        self.pending_broadcast = True
+
+    def send_broadcast(self):
+        self.broadcasts += 1
+
+
+class WindowsRegistryBackend(EnvironmentBackend):
+    """HKCU\\Environment (ghi) và HKLM Session Manager\\Environment (chỉ đọc)"""
+
+    persistent_path = True
+    USER_KEY = 'Environment'
+    MACHINE_KEY = r'SYSTEM\CurrentControlSet\Control\Session Manager\Environment'
+
+    def __init__(self, system, config_dir=None, broadcast_timeout=ENV_BROADCAST_TIMEOUT_MS):
+        super().__init__(system, config_dir)
+        self.broadcast_timeout = broadcast_timeout
+
+    def read_values(self, root, subkey):
+        """Đọc tất cả biến môi trường trong một registry key: {tên: (giá trị, kiểu)}"""
+        import winreg
+        values = {}
+        try:
+            key = winreg.OpenKey(root, subkey, 0, winreg.KEY_READ)
+        except OSError:
+            return values
+
+        try:
+            index = 0
+            while True:
+                try:
+                    name, value, value_type = winreg.EnumValue(key, index)
+                except OSError:
+                    break
+                if isinstance(value, str):
+                    values[name] = (value, value_type)
+                index += 1
+        finally:
+            winreg.CloseKey(key)
+        return values
+
+    def read_path_value(self, root, subkey):
+        for name, (value, value_type) in self.read_values(root, subkey).items():
+            if name.upper() == 'PATH':
+                return value
+        return ''
+
+    def read_user_path(self):
+        import winreg
+        return self.read_path_value(winreg.HKEY_CURRENT_USER, self.USER_KEY)
+
+    def read_machine_path(self):
+        import winreg
+        return self.read_path_value(winreg.HKEY_LOCAL_MACHINE, self.MACHINE_KEY)
+
+    def write(self, path_entries, variables):
+        import winreg
+        try:
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.USER_KEY, 0, winreg.KEY_ALL_ACCESS)
+            changed = False
+            try:
+                if path_entries:
+                    current_path = self.query_value(key, 'PATH') or ''
+                    entries = split_path(current_path, self.system)
+                    merged = merge_path_entries(self.system, entries, path_entries)
+                    if len(merged) > len(entries):
+                        winreg.SetValueEx(key, 'PATH', 0, winreg.REG_EXPAND_SZ, ';'.join(merged))
+                        changed = True
+                        for path in merged[len(entries):]:
+                            logger.info(f"Đã thêm {path} vào User PATH")
+
+                for name, value in variables.items():
+                    # Giá trị không đổi thì không ghi (và không cần broadcast)
+                    if self.query_value(key, name) != value:
+                        winreg.SetValueEx(key, name, 0, winreg.REG_SZ, value)
+                        changed = True
+            finally:
+                winreg.CloseKey(key)
+            if changed:
+                self.pending_broadcast = True
+        except OSError as e:
+            logger.error(f"Lỗi khi cập nhật Windows environment: {e}")
+            return False
+
+        if self.config_dir:
+            try:
+                self.save_state(self.merge_state(self.load_state(), path_entries, variables))
+            except OSError as e:
+                logger.warning(f"Không thể lưu env state: {e}")
+        return True
+
+    def query_value(self, key, name):
+        """Giá trị hiện tại của một biến trong key đã mở, None nếu chưa có"""
+        import winreg
+        try:
+            value, _ = winreg.QueryValueEx(key, name)
+        except FileNotFoundError:
+            return None
+        return value
+
+    def read_effective(self):
+        """Biến machine + user (user ghi đè, mở rộng REG_EXPAND_SZ), PATH = machine PATH + user PATH"""
+        import winreg
+        variables = {}
+        expandable = set()
+        path_lists = []
+        for root, subkey in ((winreg.HKEY_LOCAL_MACHINE, self.MACHINE_KEY),
+                             (winreg.HKEY_CURRENT_USER, self.USER_KEY)):
+            values = self.read_values(root, subkey)
+            # Biến thường trước để mở rộng được %VAR% trong PATH
+            for name, (value, value_type) in values.items():
+                if name.upper() != 'PATH':
+                    variables[name] = value
+                    if value_type == winreg.REG_EXPAND_SZ:
+                        expandable.add(name)
+                    else:
+                        expandable.discard(name)
+            for name, (value, value_type) in values.items():
+                if name.upper() == 'PATH':
+                    path_lists.append((value, value_type == winreg.REG_EXPAND_SZ))
+
+        registry_variables = dict(variables)
+        for name in expandable:
+            variables[name] = self.expand_value(variables[name], registry_variables)
+        registry_variables.update(variables)
+        path_entries = []
+        for value, is_expandable in path_lists:
+            if is_expandable:
+                value = self.expand_value(value, registry_variables)
+            path_entries.extend(split_path(value, self.system))
+        return variables, path_entries
+
+    def expand_value(self, value, registry_variables):
+        """Mở rộng giá trị REG_EXPAND_SZ: biến trong registry (process chưa có giá trị mới) trước,
+        phần còn lại (SystemRoot, USERPROFILE, ...) qua ExpandEnvironmentStringsW"""
+        value = expand_windows_variables(value, registry_variables)
+        try:
+            import ctypes
+            from ctypes import wintypes
+            expand = ctypes.windll.kernel32.ExpandEnvironmentStringsW
+            expand.argtypes = [wintypes.LPCWSTR, wintypes.LPWSTR, wintypes.DWORD]
+            expand.restype = wintypes.DWORD
+            size = len(value) + 1
+            while True:
+                buffer = ctypes.create_unicode_buffer(size)
+                # Kết quả là số ký tự cần (kể cả ký tự kết thúc), 0 nếu lỗi
+                needed = expand(value, buffer, size)
+                if not needed:
+                    raise ctypes.WinError()
+                if needed <= size:
+                    return buffer.value
+                size = needed
+        except (AttributeError, ImportError, OSError):
+            return expand_windows_variables(value, os.environ)
+
+    def write_user_path(self, path_value):
+        import winreg
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.USER_KEY, 0, winreg.KEY_ALL_ACCESS)
+        try:
+            if self.query_value(key, 'PATH') == path_value:
+                return
+            winreg.SetValueEx(key, 'PATH', 0, winreg.REG_EXPAND_SZ, path_value)
+        finally:
+            winreg.CloseKey(key)
+        self.pending_broadcast = True
+
+    def send_broadcast(self):
+        """WM_SETTINGCHANGE tới mọi cửa sổ, bỏ qua cửa sổ bị treo thay vì chờ vô hạn"""
+        try:
+            import ctypes
+            from ctypes import wintypes
+            send_message = ctypes.windll.user32.SendMessageTimeoutW
+            # lpdwResult là PDWORD_PTR (8 byte trên x64), không phải DWORD
+            send_message.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPCWSTR,
+                                     wintypes.UINT, wintypes.UINT, ctypes.POINTER(ctypes.c_size_t)]
+            send_message.restype = wintypes.LPARAM
+            result = ctypes.c_size_t()
+            sent = send_message(HWND_BROADCAST, WM_SETTINGCHANGE, 0, 'Environment',
+                                SMTO_ABORTIFHUNG, self.broadcast_timeout, ctypes.byref(result))
+            if not sent:
+                logger.warning("Không phải mọi cửa sổ đã nhận thông báo thay đổi environment (timeout)")
+        except Exception as e:
+            logger.warning(f"Không thể broadcast thay đổi environment: {e}")
+
+
+class ShellRcEnvironmentBackend(EnvironmentBackend):
+    """Env script dùng chung (env.sh), mỗi shell rc file chỉ có một dòng source env script"""
+
+    def __init__(self, system, config_dir, home=None):
+        super().__init__(system, config_dir)
+        self.home = Path(home) if home else Path.home()
+        self.env_script = self.config_dir / ENV_SCRIPT_FILE
+
+    def get_source_line(self):
+        """Dòng source env script (có guard) dùng trong rc file"""
+        script = str(self.env_script)
+        home = str(self.home)
+        if script.startswith(home + os.sep):
+            script = '$HOME' + script[len(home):]
+        return f'[ -f "{script}" ] && . "{script}"'
+
+    def extract_legacy_exports(self, content):
+        """Tách các khối '# Added by CppDepsInstaller' cũ khỏi rc file
+
+        Trả về (content mới, PATH entries, biến môi trường) của các khối đó.
+        """
+        path_entries = []
+        variables = {}
+        kept = []
+        in_block = False
+        for line in content.split('\n'):
+            stripped = line.strip()
+            if stripped == SHELL_CONFIG_MARKER:
+                in_block = True
+                continue
+            if in_block:
+                match = re.match(r'^export ([A-Za-z_][A-Za-z0-9_]*)="(.*)"$', stripped)
+                if match:
+                    name, value = match.groups()
+                    if name == 'PATH' and value.endswith(':$PATH'):
+                        path_entries.append(value[:-len(':$PATH')])
+                    else:
+                        variables[name] = value
+                    continue
+                in_block = False
+            kept.append(line)
+
+        new_content = '\n'.join(kept)
+        # Bỏ dòng trống thừa do các khối cũ để lại
+        new_content = re.sub(r'\n{3,}', '\n\n', new_content)
+        return new_content, path_entries, variables
+
+    def write(self, path_entries, variables):
+        source_line = self.get_source_line()
+        state = self.load_state()
+        success = True
+
+        # Chuyển các khối export cũ vào env script, thêm dòng source (mỗi rc file ghi tối đa một lần)
+        for name in SHELL_CONFIG_FILES:
+            config_file = self.home / name
+            if not config_file.exists():
+                continue
+
+            try:
+                # Ghi vào file thật nếu rc file là symlink (dotfiles)
+                config_file = config_file.resolve()
+                with open(config_file, 'r') as f:
+                    content = f.read()
+
+                new_content, legacy_paths, legacy_variables = self.extract_legacy_exports(content)
+                self.merge_state(state, legacy_paths, {name: value for name, value in legacy_variables.items()
+                                                       if name not in state['variables']})
+
+                if source_line not in new_content:
+                    if new_content and not new_content.endswith('\n'):
+                        new_content += '\n'
+                    new_content += f'\n{SHELL_SOURCE_MARKER}\n{source_line}\n'
+
+                if new_content != content:
+                    write_file_atomically(config_file, new_content)
+                    logger.info(f"Đã cập nhật {config_file}")
+            except Exception as e:
+                logger.error(f"Lỗi khi cập nhật {config_file}: {e}")
+                success = False
+
+        self.merge_state(state, path_entries, variables)
+        try:
+            self.save_state(state)
+            write_file_atomically(self.env_script, render_env_script(state))
+            logger.info(f"Đã cập nhật {self.env_script} ({len(state['path'])} thư mục PATH, "
+                        f"{len(state['variables'])} biến môi trường)")
+        except OSError as e:
+            logger.error(f"Lỗi khi ghi {self.env_script}: {e}")
+            success = False
+        return success
+
+    def read_effective(self):
+        # Env script thêm vào đầu PATH: thư mục thêm sau cùng đứng đầu
+        state = self.load_state()
+        return state['variables'], list(reversed(state['path']))
+
+
 class CppDepsInstaller:
-    def __init__(self):
-        self.system = platform.system().lower()
+    """Installer dùng chung cho mọi hệ điều hành
+
+    CppDepsInstaller() trả về installer của hệ điều hành hiện tại (xem PLATFORM_INSTALLERS),
+    các bước riêng của từng hệ điều hành nằm trong lớp con tương ứng.
+    """
+
+    # Tên hệ điều hành của lớp con (None: theo platform.system())
+    platform_system = None
+    # Environment backend mặc định
+    default_env_backend = 'shell'
+    # Quy ước của hệ điều hành: extension của executable, thư mục script trong venv,
+    # định dạng archive của CMake, shell của env script, separator và cách thêm vào PATH
+    executable_suffix = ''
+    venv_bin_dir = 'bin'
+    cmake_archive_format = 'tar.gz'
+    env_script_shell = 'sh'
+    path_separator = ':'
+    prepend_path = True
+    # Thư mục tìm tool thủ công khi không có trong PATH (verify_installation)
+    tool_search_paths = []
+    # Biến môi trường hiển thị trong debug_path_info
+    debug_env_vars = ['VCPKG_ROOT']
+
+    def __new__(cls, *args, **kwargs):
+        if cls is CppDepsInstaller:
+            cls = get_platform_installer_class(platform.system().lower())
+        return super().__new__(cls)
+
+    def __init__(self, package_index_max_age=None, accelerate=False,
+                 parallel_downloads=DEFAULT_PARALLEL_DOWNLOADS, pacman_cache_dir=None,
+                 vcpkg_reference=None, vcpkg_shallow=False, vcpkg_binary_cache=None,
+                 conan_wheelhouse=None, conan_download_cache=None, lazy_vcpkg=False,
+                 probe_timeout=DEFAULT_PROBE_TIMEOUT, probe_cache=True,
+                 shim_bin=False, env_backend=None, command_log_level=None):
+        self.system = self.platform_system or platform.system().lower()
         self.architecture = platform.machine().lower()
-        self.is_admin = self.check_admin_privileges()
-        self.temp_dir = tempfile.mkdtemp()
-        self.install_dir = self.get_install_directory()
+        # Quyền admin, thư mục cài đặt (phụ thuộc quyền admin) và thư mục tạm chỉ được xác định
+        # khi cần lần đầu, để khởi tạo installer (vd: --help, --print-env) không có side effect
+        self._is_admin = None
+        self._temp_dir = None
+        self._install_dir = None
+
+        # Mức log cho output của command (stream từng dòng trong run_command)
+        if command_log_level:
+            self.command_log_level = parse_log_level(command_log_level)
+        else:
+            env_level = os.environ.get('CPPDEPS_COMMAND_LOG_LEVEL') or DEFAULT_COMMAND_LOG_LEVEL
+            try:
+                self.command_log_level = parse_log_level(env_level)
+            except ValueError:
+                logger.warning(f"⚠️  CPPDEPS_COMMAND_LOG_LEVEL không hợp lệ: {env_level}, "
+                               f"dùng mặc định {DEFAULT_COMMAND_LOG_LEVEL}")
+                self.command_log_level = parse_log_level(DEFAULT_COMMAND_LOG_LEVEL)
+
+        # Tuổi tối đa của package index (apt/dnf/yum/pacman/zypper) trước khi refresh
+        if package_index_max_age is None:
+            package_index_max_age = DEFAULT_PACKAGE_INDEX_MAX_AGE
+            env_max_age = os.environ.get('CPPDEPS_PACKAGE_INDEX_MAX_AGE')
+            if env_max_age:
+                try:
+                    package_index_max_age = int(env_max_age)
+                except ValueError:
+                    logger.warning(f"⚠️  CPPDEPS_PACKAGE_INDEX_MAX_AGE không hợp lệ: {env_max_age}, "
+                                   f"dùng mặc định {DEFAULT_PACKAGE_INDEX_MAX_AGE} giây")
+        self.package_index_max_age = package_index_max_age
+
+        # Tăng tốc package manager: tải song song, xếp hạng mirror (opt-in)
+        self.accelerate = accelerate
+        self.parallel_downloads = parallel_downloads
+
+        # Thư mục pacman cache dùng chung cho mọi MSYS2 root (local hoặc network share)
+        self.pacman_cache_dir = pacman_cache_dir or os.environ.get('CPPDEPS_PACMAN_CACHE')
+
+        # vcpkg: git object store dùng chung giữa các prefix và chế độ shallow clone
+        self.vcpkg_reference = vcpkg_reference or os.environ.get('CPPDEPS_VCPKG_REFERENCE')
+        self.vcpkg_shallow = vcpkg_shallow
+
+        # vcpkg binary cache dạng files (VCPKG_BINARY_SOURCES)
+        self.vcpkg_binary_cache = vcpkg_binary_cache or os.environ.get('CPPDEPS_VCPKG_BINARY_CACHE')
+        self.vcpkg_stats_lock = threading.Lock()
+
+        # Chỉ đặt vcpkg shim, bootstrap khi dùng lần đầu
+        self.lazy_vcpkg = lazy_vcpkg
+
+        # Chế độ shim: các thư mục tool được gom vào một thư mục shim duy nhất trên PATH
+        self.shim_bin = shim_bin
+        self.shim_source_dirs = []
+
+        # Timeout cho mỗi probe trong verify_installation và kết quả lần kiểm tra gần nhất
+        self.probe_timeout = probe_timeout
+        self.verify_results = {}
+
+        # Cache kết quả probe trên đĩa, đọc khi dùng lần đầu
+        self.probe_cache_enabled = probe_cache
+        self.probe_cache = None
+        self.probe_cache_dirty = False
+        self.probe_cache_lock = threading.Lock()
+
+        # Thay đổi PATH/biến môi trường, ghi ra một lần ở cuối (flush_environment)
+        self.env_journal = EnvironmentJournal(self.system)
+
+        # Nơi lưu environment bền vững: registry (Windows), shell rc (Unix) hoặc memory (test)
+        if isinstance(env_backend, EnvironmentBackend):
+            self.env_backend = env_backend
+        else:
+            self.env_backend = self.create_env_backend(env_backend)
+
+        # Chỉ mục executable trong PATH (tạo khi dùng lần đầu)
+        self.executable_index = None
+
+        # Conan: venv riêng (conan_venv), wheelhouse để cài offline và download cache dùng chung
+        self.conan_wheelhouse = conan_wheelhouse or os.environ.get('CPPDEPS_CONAN_WHEELHOUSE')
+        self.conan_download_cache = conan_download_cache or os.environ.get('CPPDEPS_CONAN_DOWNLOAD_CACHE')
         
         # URLs cho các công cụ
         self.tools_urls = {
@@ -48,75 +1697,1757 @@ class CppDepsInstaller:
             }
         }
 
-    def check_admin_privileges(self):
-        """Kiểm tra quyền admin/root"""
+    def get_executable_index(self):
+        """Chỉ mục executable dùng chung cho mọi detect_*/verify (tạo khi dùng lần đầu)"""
+        if self.executable_index is None:
+            path_dirs = os.environ.get('PATH', '').split(os.pathsep)
+            self.executable_index = ExecutableIndex(self.system, path_dirs)
+        return self.executable_index
+
+    def which(self, tool):
+        """Tìm tool trong PATH qua chỉ mục executable"""
+        return self.get_executable_index().which(tool)
+
+    def check_admin_privileges(self):
+        """Kiểm tra quyền admin/root"""
+        try:
+            return os.geteuid() == 0
+        except:
+            return False
+
+    @property
+    def is_admin(self):
+        """Quyền admin/root (kiểm tra lần đầu khi truy cập)"""
+        if self._is_admin is None:
+            self._is_admin = bool(self.check_admin_privileges())
+        return self._is_admin
+
+    @is_admin.setter
+    def is_admin(self, value):
+        self._is_admin = value
+
+    @property
+    def temp_dir(self):
+        """Thư mục tạm của lần chạy (chỉ tạo khi cần lần đầu)"""
+        if self._temp_dir is None:
+            import tempfile
+            self._temp_dir = tempfile.mkdtemp()
+        return self._temp_dir
+
+    @temp_dir.setter
+    def temp_dir(self, value):
+        self._temp_dir = value
+
+    @property
+    def install_dir(self):
+        """Thư mục cài đặt (xác định khi cần lần đầu, xem get_install_directory)"""
+        if self._install_dir is None:
+            self._install_dir = self.get_install_directory()
+        return self._install_dir
+
+    @install_dir.setter
+    def install_dir(self, value):
+        self._install_dir = value
+
+    @property
+    def conan_venv(self):
+        """venv riêng của Conan trong thư mục cài đặt"""
+        return self.install_dir / 'conan-venv'
+
+    def get_install_directory(self):
+        """Lấy thư mục cài đặt phù hợp"""
+        return Path('/usr/local') if self.is_admin else Path.home() / '.local'
+
+    def run_command(self, command, shell=True, check=True, line_filter=None, log_level=None):
+        """Chạy command với error handling
+
+        Output được ghi vào log từng dòng khi command đang chạy (mức log_level, mặc định
+        self.command_log_level). result.stdout/stderr chỉ giữ COMMAND_OUTPUT_TAIL_SIZE ký tự cuối;
+        nếu có line_filter, result.stdout là tất cả các dòng stdout thỏa line_filter.
+        """
+        level = self.command_log_level if log_level is None else parse_log_level(log_level)
+        tool = get_command_tool(command)
+        log_event('command.start', f"Đang chạy: {command}", tool=tool)
+        start = time.perf_counter()
+        process = subprocess.Popen(command, shell=shell, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, text=True, errors='replace')
+
+        stdout_tail = OutputTail()
+        stderr_tail = OutputTail()
+        matched_lines = []
+
+        def read_stderr():
+            for line in process.stderr:
+                log_event('command.output', line.rstrip('\r\n'), level, tool=tool)
+                stderr_tail.append(line)
+
+        # Đọc stderr ở thread riêng để hai pipe không chặn nhau
+        stderr_reader = threading.Thread(target=read_stderr, daemon=True)
+        stderr_reader.start()
+        for line in process.stdout:
+            log_event('command.output', line.rstrip('\r\n'), level, tool=tool)
+            stdout_tail.append(line)
+            if line_filter and line_filter(line):
+                matched_lines.append(line)
+        stderr_reader.join()
+        returncode = process.wait()
+        duration_ms = round((time.perf_counter() - start) * 1000)
+        log_event('command.end', f"Kết thúc {tool} (exit code: {returncode}, {duration_ms} ms)",
+                  logging.INFO if returncode == 0 else logging.WARNING,
+                  tool=tool, exit_code=returncode, duration_ms=duration_ms)
+
+        stdout = ''.join(matched_lines) if line_filter else stdout_tail.getvalue()
+        result = subprocess.CompletedProcess(command, returncode, stdout, stderr_tail.getvalue())
+        if check and returncode != 0:
+            error = subprocess.CalledProcessError(returncode, command, result.stdout, result.stderr)
+            logger.error(f"Lỗi khi chạy command: {error}")
+            logger.error(f"Stderr: {error.stderr}")
+            raise error
+        return result
+
+    def download_file(self, url, dest_path):
+        """Tải file từ URL"""
+        import urllib.request
+        log_event('download.start', f"Đang tải xuống: {url}")
+        start = time.perf_counter()
+        try:
+            urllib.request.urlretrieve(url, dest_path)
+            log_event('download.end', f"Đã tải xuống: {dest_path}",
+                      bytes=os.path.getsize(dest_path),
+                      duration_ms=round((time.perf_counter() - start) * 1000))
+            return True
+        except Exception as e:
+            log_event('download.failed', f"Lỗi khi tải xuống {url}: {e}", logging.ERROR,
+                      duration_ms=round((time.perf_counter() - start) * 1000))
+            return False
+
+    def extract_archive(self, archive_path, extract_to):
+        """Giải nén file archive"""
+        import tarfile
+        import zipfile
+        logger.info(f"Đang giải nén: {archive_path}")
+        try:
+            if archive_path.endswith('.zip'):
+                with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+                    zip_ref.extractall(extract_to)
+            elif archive_path.endswith(('.tar.gz', '.tgz')):
+                with tarfile.open(archive_path, 'r:gz') as tar_ref:
+                    tar_ref.extractall(extract_to)
+            logger.info(f"Đã giải nén thành công")
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi khi giải nén: {e}")
+            return False
+
+    def install_compiler(self):
+        """Cài đặt compiler phù hợp với hệ điều hành"""
+        logger.info("Đang cài đặt compiler...")
+        self.install_platform_compiler()
+
+    def install_platform_compiler(self):
+        """Cài đặt compiler của hệ điều hành (lớp con override)"""
+        logger.warning(f"Chưa hỗ trợ cài đặt compiler trên {self.system}")
+
+    def install_platform_build_tools(self):
+        """Cài đặt build tools riêng của hệ điều hành trước CMake/Ninja (lớp con override)"""
+
+    def get_platform_tools(self):
+        """Các công cụ riêng của hệ điều hành cần kiểm tra thêm trong verify_installation"""
+        return []
+
+    def verify_platform_environment(self):
+        """Kiểm tra môi trường riêng của hệ điều hành sau khi kiểm tra công cụ (lớp con override)"""
+
+    def backup_config_file(self, config_path):
+        """Sao lưu file cấu hình gốc (chỉ lần đầu tiên)"""
+        backup_path = f"{config_path}{CONFIG_BACKUP_SUFFIX}"
+        if os.path.exists(backup_path) or not os.path.exists(config_path):
+            return backup_path
+
+        try:
+            shutil.copy2(config_path, backup_path)
+        except PermissionError:
+            self.copy_file_privileged(config_path, backup_path, preserve=True)
+        logger.info(f"Đã sao lưu {config_path} -> {backup_path}")
+        return backup_path
+
+    def write_config_file(self, config_path, content):
+        """Ghi file cấu hình (sao lưu bản gốc, dùng sudo nếu cần)"""
+        self.backup_config_file(config_path)
+        try:
+            with open(config_path, 'w', newline='\n') as f:
+                f.write(content)
+        except PermissionError:
+            temp_file = Path(self.temp_dir) / Path(config_path).name
+            with open(temp_file, 'w', newline='\n') as f:
+                f.write(content)
+            self.copy_file_privileged(temp_file, config_path)
+        logger.info(f"Đã cập nhật {config_path}")
+
+    def copy_file_privileged(self, source, destination, preserve=False):
+        """Copy file tới nơi không có quyền ghi (sudo cp)"""
+        self.run_command(f'sudo cp {"-p " if preserve else ""}"{source}" "{destination}"')
+
+    def set_config_option(self, content, section, key, value, separator=' = '):
+        """Đặt option trong section kiểu INI (thay thế dòng có sẵn, kể cả dòng bị comment)
+
+        value là list thì ghi mỗi giá trị một dòng (option lặp lại, vd: CacheDir của pacman).
+        """
+        lines = content.splitlines()
+        values = value if isinstance(value, (list, tuple)) else [value]
+        new_lines = [f"{key}{separator}{item}" for item in values]
+        section_start = None
+        section_end = len(lines)
+
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped.startswith('[') and stripped.endswith(']'):
+                if section_start is not None:
+                    section_end = i
+                    break
+                if stripped == f'[{section}]':
+                    section_start = i
+
+        if section_start is None:
+            lines.extend(([''] if lines else []) + [f'[{section}]'] + new_lines)
+            return '\n'.join(lines) + '\n'
+
+        # Dòng đầu tiên của option được thay bằng các dòng mới, các dòng còn lại của option bị bỏ
+        matches = [i for i in range(section_start + 1, section_end)
+                   if lines[i].strip().lstrip('#').split('=', 1)[0].strip() == key]
+        if matches:
+            for i in reversed(matches[1:]):
+                del lines[i]
+            lines[matches[0]:matches[0] + 1] = new_lines
+            return '\n'.join(lines) + '\n'
+
+        lines[section_start + 1:section_start + 1] = new_lines
+        return '\n'.join(lines) + '\n'
+
+    def enable_pacman_parallel_downloads(self, pacman_conf):
+        """Bật ParallelDownloads trong pacman.conf"""
+        if not os.path.exists(pacman_conf):
+            logger.warning(f"Không tìm thấy {pacman_conf}")
+            return False
+
+        with open(pacman_conf, 'r') as f:
+            content = f.read()
+
+        new_content = self.set_config_option(content, 'options', 'ParallelDownloads',
+                                             self.parallel_downloads)
+        if new_content != content:
+            self.write_config_file(pacman_conf, new_content)
+        logger.info(f"Đã bật ParallelDownloads = {self.parallel_downloads} cho pacman")
+        return True
+
+    def measure_mirror_latency(self, url, timeout=3):
+        """Đo độ trễ kết nối TCP tới mirror (giây), None nếu không kết nối được"""
+        import socket
+        import urllib.parse
+        parsed = urllib.parse.urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((parsed.hostname, port), timeout=timeout):
+                return time.perf_counter() - start
+        except OSError:
+            return None
+
+    def install_cmake(self):
+        """Cài đặt CMake"""
+        logger.info("Cài đặt CMake...")
+        
+        if self.system in self.tools_urls['cmake']:
+            cmake_url = self.tools_urls['cmake'][self.system]
+            cmake_archive = Path(self.temp_dir) / f"cmake.{self.cmake_archive_format}"
+            
+            if self.download_file(cmake_url, cmake_archive):
+                cmake_dir = self.install_dir / 'cmake'
+                cmake_dir.mkdir(parents=True, exist_ok=True)
+                
+                if self.extract_archive(str(cmake_archive), str(cmake_dir)):
+                    # Tìm thư mục cmake sau khi giải nén
+                    for item in cmake_dir.iterdir():
+                        if item.is_dir() and 'cmake' in item.name.lower():
+                            cmake_bin = item / 'bin'
+                            if cmake_bin.exists():
+                                self.add_to_path(str(cmake_bin))
+                                logger.info("Đã cài đặt CMake thành công")
+                                return True
+        
+        logger.warning("Không thể cài đặt CMake")
+        return False
+
+    def install_ninja(self):
+        """Cài đặt Ninja"""
+        logger.info("Cài đặt Ninja...")
+        
+        if self.system in self.tools_urls['ninja']:
+            ninja_url = self.tools_urls['ninja'][self.system]
+            ninja_archive = Path(self.temp_dir) / "ninja.zip"
+            
+            if self.download_file(ninja_url, ninja_archive):
+                ninja_dir = self.install_dir / 'ninja'
+                ninja_dir.mkdir(parents=True, exist_ok=True)
+                
+                if self.extract_archive(str(ninja_archive), str(ninja_dir)):
+                    self.add_to_path(str(ninja_dir))
+                    logger.info("Đã cài đặt Ninja thành công")
+                    return True
+        
+        logger.warning("Không thể cài đặt Ninja")
+        return False
+
+    def update_vcpkg_reference(self):
+        """Tạo hoặc cập nhật git object store dùng chung cho các vcpkg checkout"""
+        reference_dir = Path(self.vcpkg_reference)
+        try:
+            if (reference_dir / 'objects').exists():
+                # Các checkout mượn object qua alternates: không xóa ref (kể cả khi fetch.prune được bật),
+                # nếu không gc sau đó có thể xóa object mà các checkout vẫn cần
+                self.run_command(f'git -C "{reference_dir}" fetch --no-prune origin')
+            else:
+                reference_dir.parent.mkdir(parents=True, exist_ok=True)
+                self.run_command(f'git clone --mirror {self.tools_urls["vcpkg"]["all"]} "{reference_dir}"')
+            return True
+        except Exception as e:
+            logger.warning(f"Không thể cập nhật vcpkg object store dùng chung: {e}")
+            return False
+
+    def clone_or_update_vcpkg(self, vcpkg_dir):
+        """Clone vcpkg (partial/shallow) hoặc cập nhật incremental checkout có sẵn"""
+        if (vcpkg_dir / '.git').exists():
+            logger.info(f"vcpkg đã có tại {vcpkg_dir}, cập nhật incremental...")
+            self.run_command(f'git -C "{vcpkg_dir}" pull --ff-only')
+            return True
+
+        if vcpkg_dir.exists() and any(vcpkg_dir.iterdir()):
+            raise RuntimeError(f"{vcpkg_dir} đã tồn tại nhưng không phải git checkout của vcpkg")
+
+        clone_options = []
+        if self.vcpkg_reference and self.update_vcpkg_reference():
+            # Object đã có trong store dùng chung, không cần tải lại
+            clone_options.append(f'--reference-if-able "{self.vcpkg_reference}"')
+        elif self.vcpkg_shallow:
+            # Shallow clone không dùng được với builtin-baseline của manifest mode
+            clone_options.append('--depth 1')
+        else:
+            # Partial clone: đủ history cho versioning, blob chỉ tải khi cần
+            clone_options.append('--filter=blob:none')
+
+        self.run_command(f'git clone {" ".join(clone_options)} {self.tools_urls["vcpkg"]["all"]} "{vcpkg_dir}"')
+        return True
+
+    def get_vcpkg_tool_release(self, vcpkg_dir):
+        """Đọc phiên bản vcpkg tool mà checkout yêu cầu"""
+        metadata_file = vcpkg_dir / 'scripts' / 'vcpkg-tool-metadata.txt'
+        try:
+            with open(metadata_file, 'r') as f:
+                for line in f:
+                    if line.startswith('VCPKG_TOOL_RELEASE_TAG='):
+                        return line.split('=', 1)[1].strip()
+        except OSError:
+            pass
+        return None
+
+    def is_vcpkg_bootstrap_current(self, vcpkg_dir, vcpkg_exe):
+        """Kiểm tra vcpkg binary có khớp với phiên bản tool của checkout không"""
+        if not vcpkg_exe.exists():
+            return False
+
+        tool_release = self.get_vcpkg_tool_release(vcpkg_dir)
+        if not tool_release:
+            return False
+
+        try:
+            result = subprocess.run([str(vcpkg_exe), 'version'], capture_output=True,
+                                    text=True, check=False, timeout=30)
+        except Exception:
+            return False
+        return result.returncode == 0 and tool_release in result.stdout
+
+    def install_vcpkg(self):
+        """Cài đặt vcpkg package manager"""
+        logger.info("Cài đặt vcpkg...")
+        
+        vcpkg_dir = self.install_dir / 'vcpkg'
+        
+        try:
+            # Clone hoặc cập nhật vcpkg repository
+            self.clone_or_update_vcpkg(vcpkg_dir)
+            
+            # Build vcpkg (bỏ qua nếu binary đã khớp với checkout)
+            vcpkg_exe = vcpkg_dir / f'vcpkg{self.executable_suffix}'
+            if self.is_vcpkg_bootstrap_current(vcpkg_dir, vcpkg_exe):
+                logger.info("vcpkg binary đã khớp với phiên bản tool, bỏ qua bootstrap")
+            else:
+                self.run_vcpkg_bootstrap(vcpkg_dir)
+            
+            # Integrate vcpkg
+            self.run_command(f'"{vcpkg_exe}" integrate install')
+            
+            # Add to PATH
+            self.add_to_path(str(vcpkg_dir))
+            
+            # Set environment variable
+            self.set_environment_variable('VCPKG_ROOT', str(vcpkg_dir))
+            
+            # Cấu hình binary cache dùng chung
+            if self.vcpkg_binary_cache:
+                self.configure_vcpkg_binary_cache()
+            
+            logger.info("Đã cài đặt vcpkg thành công")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Lỗi khi cài đặt vcpkg: {e}")
+            return False
+
+    def run_vcpkg_bootstrap(self, vcpkg_dir):
+        """Build vcpkg bằng bootstrap script trong vcpkg_dir"""
+        bootstrap_script = vcpkg_dir / 'bootstrap-vcpkg.sh'
+        self.run_command(f'chmod +x "{bootstrap_script}" && "{bootstrap_script}"')
+
+    def get_vcpkg_shim_args(self):
+        """Các option cần truyền lại cho installer khi shim bootstrap vcpkg"""
+        args = [f'--bootstrap-vcpkg={self.install_dir}']
+        if self.vcpkg_reference:
+            args.append(f'--vcpkg-reference={self.vcpkg_reference}')
+        if self.vcpkg_shallow:
+            args.append('--vcpkg-shallow')
+        if self.vcpkg_binary_cache:
+            args.append(f'--vcpkg-binary-cache={self.vcpkg_binary_cache}')
+        return ' '.join(f'"{arg}"' for arg in args)
+
+    def install_vcpkg_shim(self):
+        """Đặt vcpkg shim lên PATH, clone/bootstrap chỉ chạy khi vcpkg được gọi lần đầu"""
+        logger.info("Cài đặt vcpkg shim (lazy bootstrap)...")
+
+        shim_dir = self.install_dir / 'vcpkg-shim'
+        vcpkg_dir = self.install_dir / 'vcpkg'
+        script = os.path.abspath(__file__)
+
+        try:
+            shim_dir.mkdir(parents=True, exist_ok=True)
+            shim_path = self.write_vcpkg_shim(shim_dir, vcpkg_dir / f'vcpkg{self.executable_suffix}', script)
+            self.add_to_path(str(shim_dir))
+            logger.info(f"Đã cài đặt vcpkg shim tại: {shim_path}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Lỗi khi cài đặt vcpkg shim: {e}")
+            return False
+
+    def write_vcpkg_shim(self, shim_dir, vcpkg_exe, script):
+        """Ghi vcpkg shim (shell script), trả về đường dẫn shim"""
+        shim_path = shim_dir / 'vcpkg'
+        shim_content = (
+            "#!/bin/sh\n"
+            f"# {VCPKG_SHIM_MARKER}\n"
+            f'if [ ! -x "{vcpkg_exe}" ]; then\n'
+            f'    "{sys.executable}" "{script}" {self.get_vcpkg_shim_args()} >&2 || exit 1\n'
+            "fi\n"
+            f'exec "{vcpkg_exe}" "$@"\n'
+        )
+        with open(shim_path, 'w', newline='') as f:
+            f.write(shim_content)
+        os.chmod(shim_path, 0o755)
+        return shim_path
+
+    def is_vcpkg_shim(self, tool_path):
+        """Kiểm tra tool_path có phải vcpkg shim do installer tạo không"""
+        try:
+            with open(tool_path, 'r', errors='replace') as f:
+                return VCPKG_SHIM_MARKER in f.read(256)
+        except OSError:
+            return False
+
+    def is_lazy_vcpkg_shim(self, tool_path):
+        """Kiểm tra tool_path có phải vcpkg shim chưa được bootstrap không"""
+        vcpkg_exe = self.install_dir / 'vcpkg' / f'vcpkg{self.executable_suffix}'
+        return self.is_vcpkg_shim(tool_path) and not vcpkg_exe.exists()
+
+    def bootstrap_vcpkg_locked(self, timeout=VCPKG_BOOTSTRAP_LOCK_TIMEOUT):
+        """Clone/bootstrap vcpkg dưới lock (được gọi bởi vcpkg shim)"""
+        vcpkg_exe = self.install_dir / 'vcpkg' / f'vcpkg{self.executable_suffix}'
+        self.install_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            with lock_file(self.install_dir / 'vcpkg-bootstrap.lock', timeout):
+                # Process khác có thể đã bootstrap xong trong lúc chờ lock
+                if vcpkg_exe.exists():
+                    return True
+                return self.install_vcpkg()
+        except TimeoutError as e:
+            logger.error(str(e))
+            return False
+
+    def get_vcpkg_executable(self):
+        """Tìm vcpkg executable (thư mục cài đặt, VCPKG_ROOT hoặc PATH)"""
+        exe_name = f'vcpkg{self.executable_suffix}'
+        for vcpkg_root in (self.install_dir / 'vcpkg', os.environ.get('VCPKG_ROOT')):
+            if vcpkg_root and (Path(vcpkg_root) / exe_name).exists():
+                return Path(vcpkg_root) / exe_name
+        vcpkg_path = self.which('vcpkg')
+        return Path(vcpkg_path) if vcpkg_path else None
+
+    def get_vcpkg_binary_sources(self):
+        """Giá trị VCPKG_BINARY_SOURCES cho binary cache dạng files"""
+        # Trong binary source, ',' và ';' là separator, '`' là ký tự escape
+        cache_path = re.sub(r'([`,;])', r'`\1', str(self.vcpkg_binary_cache))
+        return f"clear;files,{cache_path},readwrite"
+
+    def configure_vcpkg_binary_cache(self):
+        """Tạo và cấu hình vcpkg binary cache (local hoặc shared path)"""
+        logger.info(f"Cấu hình vcpkg binary cache tại: {self.vcpkg_binary_cache}")
+        try:
+            Path(self.vcpkg_binary_cache).mkdir(parents=True, exist_ok=True)
+            binary_sources = self.get_vcpkg_binary_sources()
+            self.set_environment_variable('VCPKG_BINARY_SOURCES', binary_sources)
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi khi cấu hình vcpkg binary cache: {e}")
+            return False
+
+    def record_vcpkg_cache_stats(self, output):
+        """Ghi nhận số package restore từ cache / build từ source dựa trên output của vcpkg"""
+        import json
+        restored = sum(int(count) for count in re.findall(r'Restored (\d+) package', output))
+        built = len(re.findall(r'^Building \S+', output, re.MULTILINE))
+        stats_file = Path(self.vcpkg_binary_cache) / VCPKG_CACHE_STATS_FILE
+
+        # Cache có thể dùng chung giữa nhiều máy: read-modify-write dưới lock file,
+        # ghi qua temp file + rename để không để lại file bị cắt dở
+        try:
+            with self.vcpkg_stats_lock, lock_file(f'{stats_file}.lock', VCPKG_STATS_LOCK_TIMEOUT, 0.1):
+                try:
+                    with open(stats_file, 'r') as f:
+                        stats = json.load(f)
+                except (OSError, ValueError):
+                    stats = {'runs': 0, 'restored': 0, 'built': 0}
+                stats['runs'] += 1
+                stats['restored'] += restored
+                stats['built'] += built
+                write_file_atomically(stats_file, json.dumps(stats, indent=2))
+        except (OSError, TimeoutError) as e:
+            logger.warning(f"Không thể cập nhật thống kê vcpkg cache: {e}")
+
+        return restored, built
+
+    def warm_vcpkg_binary_cache(self, ports, jobs=None):
+        """Build trước danh sách ports song song để điền vcpkg binary cache"""
+        import concurrent.futures
+        vcpkg_exe = self.get_vcpkg_executable()
+        if not vcpkg_exe:
+            logger.error("Không tìm thấy vcpkg để làm nóng binary cache")
+            return False
+
+        self.configure_vcpkg_binary_cache()
+        jobs = jobs or min(4, os.cpu_count() or 1)
+        logger.info(f"Làm nóng vcpkg binary cache với {len(ports)} ports ({jobs} jobs song song)...")
+
+        def is_vcpkg_stats_line(line):
+            # Chỉ giữ các dòng record_vcpkg_cache_stats cần đếm
+            return line.startswith('Building ') or 'Restored ' in line
+
+        def build_port(index, port):
+            # Mỗi job dùng install/buildtrees/packages root riêng để chạy song song được
+            work_dir = Path(self.temp_dir) / f'vcpkg-warm-{index}'
+            build_cmd = (f'"{vcpkg_exe}" install {port}'
+                         f' --x-install-root="{work_dir / "installed"}"'
+                         f' --x-buildtrees-root="{work_dir / "buildtrees"}"'
+                         f' --x-packages-root="{work_dir / "packages"}"'
+                         f' "--binarysource={self.get_vcpkg_binary_sources()}"')
+            result = self.run_command(build_cmd, check=False, line_filter=is_vcpkg_stats_line)
+            restored, built = self.record_vcpkg_cache_stats(result.stdout or '')
+            if result.returncode == 0:
+                logger.info(f"✅ {port}: {restored} restore từ cache, {built} build từ source")
+            else:
+                logger.warning(f"⚠️ Không thể build {port} (exit code: {result.returncode})")
+            return result.returncode == 0
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(build_port, range(len(ports)), ports))
+
+        logger.info(f"Đã làm nóng vcpkg binary cache ({sum(results)}/{len(ports)} ports thành công)")
+        return all(results)
+
+    def vcpkg_cache_stats(self):
+        """Báo cáo kích thước và tỉ lệ cache hit của vcpkg binary cache"""
+        import json
+        total_size = 0
+        entries = 0
+        for root, dirs, files in os.walk(self.vcpkg_binary_cache):
+            for name in files:
+                if name.endswith('.zip'):
+                    entries += 1
+                    total_size += os.path.getsize(os.path.join(root, name))
+
+        try:
+            with open(Path(self.vcpkg_binary_cache) / VCPKG_CACHE_STATS_FILE, 'r') as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {'runs': 0, 'restored': 0, 'built': 0}
+
+        lookups = stats['restored'] + stats['built']
+        stats.update({
+            'entries': entries,
+            'size_bytes': total_size,
+            'hit_rate': stats['restored'] / lookups if lookups else None
+        })
+
+        logger.info(f"vcpkg binary cache: {self.vcpkg_binary_cache}")
+        logger.info(f"  Số package: {entries}")
+        logger.info(f"  Kích thước: {total_size / 1024 ** 2:.1f} MB")
+        logger.info(f"  Số lần chạy: {stats['runs']}")
+        logger.info(f"  Restore từ cache: {stats['restored']}, build từ source: {stats['built']}")
+        if stats['hit_rate'] is not None:
+            logger.info(f"  Tỉ lệ cache hit: {stats['hit_rate'] * 100:.1f}%")
+        return stats
+
+    def get_conan_version(self, conan_exe):
+        """Lấy phiên bản Conan dạng tuple (vd: (2, 0, 14)), None nếu không chạy được"""
+        try:
+            result = subprocess.run([str(conan_exe), '--version'], capture_output=True,
+                                    text=True, check=False, timeout=60)
+        except Exception:
+            return None
+
+        match = re.search(r'(\d+)\.(\d+)(?:\.(\d+))?', result.stdout)
+        if result.returncode != 0 or not match:
+            return None
+        return tuple(int(part) for part in match.groups() if part)
+
+    def get_conan_home(self):
+        """Thư mục CONAN_HOME (mặc định ~/.conan2)"""
+        return Path(os.environ.get('CONAN_HOME', Path.home() / '.conan2'))
+
+    def find_suitable_conan(self):
+        """Tìm Conan đủ phiên bản trong venv riêng hoặc trong PATH"""
+        venv_conan = self.conan_venv / self.venv_bin_dir / f'conan{self.executable_suffix}'
+        path_conan = self.which('conan')
+
+        for conan_exe in (venv_conan, path_conan):
+            if not conan_exe or not os.path.exists(conan_exe):
+                continue
+            version = self.get_conan_version(conan_exe)
+            if version and version >= MIN_CONAN_VERSION:
+                logger.info(f"Conan {'.'.join(map(str, version))} đã có tại: {conan_exe}")
+                return Path(conan_exe)
+        return None
+
+    def install_conan_venv(self):
+        """Cài đặt Conan vào venv riêng (dùng wheelhouse local nếu có)"""
+        venv_bin = self.conan_venv / self.venv_bin_dir
+        venv_python = venv_bin / f'python{self.executable_suffix}'
+
+        if not venv_python.exists():
+            self.run_command(f'"{sys.executable}" -m venv "{self.conan_venv}"')
+
+        conan_requirement = f"conan>={'.'.join(map(str, MIN_CONAN_VERSION))}"
+        if self.conan_wheelhouse:
+            wheelhouse = Path(self.conan_wheelhouse)
+            wheelhouse.mkdir(parents=True, exist_ok=True)
+
+            # Chỉ build wheel khi wheelhouse chưa có, các lần sau cài offline. Conan chỉ có sdist
+            # trên PyPI nên dùng pip wheel: lưu wheel đã build của conan và mọi dependency
+            if not any(wheelhouse.glob('conan-*.whl')):
+                self.run_command(f'"{venv_python}" -m pip wheel "{conan_requirement}" -w "{wheelhouse}"')
+            self.run_command(f'"{venv_python}" -m pip install --no-index --find-links "{wheelhouse}" '
+                             f'"{conan_requirement}"')
+        else:
+            # pip cache mặc định giúp các lần cài lại không phải tải lại
+            self.run_command(f'"{venv_python}" -m pip install "{conan_requirement}"')
+
+        return venv_bin / f'conan{self.executable_suffix}'
+
+    def configure_conan_download_cache(self):
+        """Cấu hình download cache dùng chung cho Conan trong global.conf"""
+        cache_dir = Path(self.conan_download_cache)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        global_conf = self.get_conan_home() / 'global.conf'
+        global_conf.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            lines = global_conf.read_text().splitlines()
+        except FileNotFoundError:
+            lines = []
+
+        for key in ('core.download:download_cache', 'core.sources:download_cache'):
+            new_line = f"{key}={cache_dir}"
+            lines = [line for line in lines if not line.strip().startswith(f"{key}=")]
+            lines.append(new_line)
+
+        global_conf.write_text('\n'.join(lines) + '\n')
+        logger.info(f"Đã cấu hình Conan download cache: {cache_dir}")
+
+    def install_conan(self):
+        """Cài đặt Conan package manager"""
+        logger.info("Cài đặt Conan...")
+        
+        try:
+            # Bỏ qua nếu đã có Conan phù hợp, nếu không cài vào venv riêng
+            conan_exe = self.find_suitable_conan()
+            if not conan_exe:
+                conan_exe = self.install_conan_venv()
+            if self.conan_venv in conan_exe.parents:
+                self.add_to_path(str(conan_exe.parent))
+            
+            # Chỉ tạo profile mặc định khi chưa có
+            if (self.get_conan_home() / 'profiles' / 'default').exists():
+                logger.info("Conan profile mặc định đã tồn tại")
+            else:
+                self.run_command(f'"{conan_exe}" profile detect')
+
+            # Download cache dùng chung giữa các project
+            if self.conan_download_cache:
+                self.configure_conan_download_cache()
+            
+            logger.info("Đã cài đặt Conan thành công")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Lỗi khi cài đặt Conan: {e}")
+            return False
+
+    def add_to_path(self, path_to_add):
+        """Thêm đường dẫn vào PATH (áp dụng ngay cho process, ghi ra khi flush_environment)"""
+        logger.info(f"Thêm vào PATH: {path_to_add}")
+        
+        try:
+            path_to_add = str(path_to_add)
+            if self.shim_bin and self.env_journal.normalize(path_to_add) != self.env_journal.normalize(self.get_shim_directory()):
+                # Chỉ ghi nhận nguồn cho shim, thư mục shim thay thế thư mục này trên PATH
+                if path_to_add not in self.shim_source_dirs:
+                    self.shim_source_dirs.append(path_to_add)
+            else:
+                self.env_journal.add_path(path_to_add)
+
+            # Unix thêm vào đầu PATH, Windows thêm vào cuối (prepend_path)
+            prepend = self.prepend_path
+            current_entries = [entry for entry in os.environ.get('PATH', '').split(os.pathsep) if entry]
+            key = self.env_journal.normalize(path_to_add)
+            if not any(self.env_journal.normalize(entry) == key for entry in current_entries):
+                if prepend:
+                    current_entries.insert(0, path_to_add)
+                else:
+                    current_entries.append(path_to_add)
+                os.environ['PATH'] = os.pathsep.join(current_entries)
+
+            self.get_executable_index().add_path_directory(path_to_add, prepend=prepend)
+        except Exception as e:
+            logger.error(f"Lỗi khi thêm vào PATH: {e}")
+
+    def set_environment_variable(self, name, value):
+        """Thiết lập environment variable (áp dụng ngay cho process, ghi ra khi flush_environment)"""
+        logger.info(f"Thiết lập biến môi trường: {name}={value}")
+        self.env_journal.set_variable(name, value)
+        os.environ[name] = str(value)
+
+    def get_path_priority_dirs(self, entries):
+        """Các thư mục toolchain của installer (ưu tiên đầu PATH) theo thứ tự"""
+        priority_dirs = []
+        if self.shim_bin:
+            priority_dirs.append(str(self.get_shim_directory()))
+        priority_dirs += self.env_journal.path_entries + self.env_backend.load_state()['path']
+        priority_dirs += self.shim_source_dirs
+
+        # Các entry nằm trong install_dir (CMake, Ninja, vcpkg, ...)
+        install_key = path_entry_key(self.install_dir, self.system)
+        priority_dirs += [entry for entry in entries
+                          if path_entry_key(entry, self.system).startswith(install_key + os.sep)]
+        return priority_dirs
+
+    def report_path_optimization(self, name, before_entries, result, lookup_prefix=()):
+        """Log kết quả tối ưu PATH và thời gian tìm executable trước/sau
+
+        Số liệu thư mục tính trên before_entries/result; phép đo lookup chạy trên lookup_prefix
+        (vd: Machine PATH đứng trước User PATH) cộng với các entry trước/sau.
+        """
+        logger.info(f"{name}: {len(before_entries)} -> {len(result['entries'])} thư mục, "
+                    f"bỏ {len(result['duplicates'])} trùng lặp, {len(result['missing'])} không tồn tại, "
+                    f"{len(result['dropped'])} vượt giới hạn độ dài, {result['moved']} được sắp xếp lại")
+        for entry in result['duplicates']:
+            logger.info(f"  trùng lặp: {entry}")
+        for entry in result['missing']:
+            logger.info(f"  không tồn tại: {entry}")
+        for entry in result['dropped']:
+            logger.warning(f"  vượt giới hạn độ dài: {entry}")
+
+        # Đo trên các executable có trong PATH cũ (cả những tool không còn tìm thấy)
+        index = ExecutableIndex(self.system)
+        prefix = list(lookup_prefix)
+        expanded_before = [os.path.expandvars(entry) for entry in prefix + before_entries]
+        expanded_after = [os.path.expandvars(entry) for entry in prefix + result['entries']]
+        names = index.executable_names(expanded_before)
+        probes_before, time_before = index.measure_lookup(expanded_before, names)
+        probes_after, time_after = index.measure_lookup(expanded_after, names)
+        saved = (1 - probes_after / probes_before) * 100 if probes_before else 0
+        logger.info(f"Tìm {len(names)} executable: {probes_before} -> {probes_after} lần stat "
+                    f"({saved:.0f}% ít hơn), {time_before * 1000:.1f} ms -> {time_after * 1000:.1f} ms")
+        result['lookup'] = {
+            'executables': len(names),
+            'probes_before': probes_before,
+            'probes_after': probes_after,
+            'seconds_before': time_before,
+            'seconds_after': time_after
+        }
+        return result
+
+    def optimize_path(self, apply=False):
+        """Tối ưu PATH (User PATH của backend nếu có, vd: registry; nếu không thì PATH của process)
+
+        apply=False chỉ báo cáo. Trả về kết quả của optimize_path() kèm số liệu lookup.
+        """
+        if not self.env_backend.persistent_path:
+            current_path = os.environ.get('PATH', '')
+            before_entries = split_path(current_path, self.system)
+            result = optimize_path(current_path, self.system, self.get_path_priority_dirs(before_entries))
+            self.report_path_optimization('PATH', before_entries, result)
+            if apply:
+                os.environ['PATH'] = result['path']
+                self.executable_index = None
+            return result
+
+        # Tối ưu User PATH, bỏ các entry đã có trong Machine PATH
+        machine_path = self.env_backend.read_machine_path()
+        user_path = self.env_backend.read_user_path()
+        before_entries = split_path(user_path, self.system)
+        machine_entries = split_path(machine_path, self.system)
+        result = optimize_path(user_path, self.system, self.get_path_priority_dirs(before_entries),
+                               shadowed=machine_entries, max_length=self.get_user_path_max_length(machine_path))
+        self.report_path_optimization('User PATH', before_entries, result, lookup_prefix=machine_entries)
+
+        if apply:
+            if result['path'] != user_path:
+                self.env_backend.write_user_path(result['path'])
+                logger.info("Đã ghi User PATH đã tối ưu")
+            self.refresh_environment()
+        return result
+
+    def get_user_path_max_length(self, machine_path):
+        """Độ dài tối đa của User PATH (None: không giới hạn)"""
+        return None
+
+    def get_shim_directory(self):
+        """Thư mục shim duy nhất trên PATH ở chế độ --shim-bin"""
+        return self.install_dir / SHIM_BIN_DIR
+
+    def read_shim_manifest(self, shim_dir):
+        """Manifest của các shim không tự mô tả được đích (None: không dùng manifest, vd: symlink)"""
+        return None
+
+    def read_shim_target(self, shim_path, manifest=None):
+        """Đích của một shim do installer tạo, None nếu không phải shim của installer"""
+        return os.readlink(shim_path) if os.path.islink(shim_path) else None
+
+    def write_shim(self, shim_dir, tool, target, manifest=None):
+        """Tạo hoặc cập nhật shim (symlink), trả về (đường dẫn shim, True nếu có thay đổi)"""
+        shim_path = shim_dir / tool
+        if self.read_shim_target(shim_path) == target:
+            return shim_path, False
+        temp_link = shim_dir / f'.{tool}.{os.getpid()}.tmp'
+        if os.path.lexists(temp_link):
+            os.remove(temp_link)
+        os.symlink(target, temp_link)
+        os.replace(temp_link, shim_path)
+        return shim_path, True
+
+    def update_shim_bin(self):
+        """Tạo lại shim cho mọi executable trong các thư mục nguồn (chỉ ghi shim thay đổi)
+
+        Chỉ thư mục shim được thêm vào PATH, các thư mục nguồn không bao giờ nằm trên PATH.
+        """
+        import json
+        shim_dir = self.get_shim_directory()
+        try:
+            shim_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Không thể tạo thư mục shim {shim_dir}: {e}")
+            return False
+
+        # Cùng thứ tự ưu tiên như PATH: thêm vào đầu thì nguồn thêm sau thắng
+        source_dirs = list(self.shim_source_dirs)
+        if self.prepend_path:
+            source_dirs.reverse()
+
+        index = self.get_executable_index()
+        manifest = self.read_shim_manifest(shim_dir)
+        original_manifest = dict(manifest or {})
+        created = unchanged = removed = 0
+        # Windows: tên không có extension (cl, cmake, ...), đích chọn theo thứ tự PATHEXT
+        for tool in index.executable_names(source_dirs):
+            tool_dir, tool_path = index.find(tool, source_dirs)
+            if not tool_path:
+                continue
+            try:
+                shim_path, changed = self.write_shim(shim_dir, tool, str(tool_path), manifest)
+            except OSError as e:
+                logger.warning(f"Không thể tạo shim cho {tool}: {e}")
+                continue
+            if changed:
+                created += 1
+            else:
+                unchanged += 1
+
+        # Xóa shim có đích không còn tồn tại
+        for entry in os.scandir(shim_dir):
+            target = self.read_shim_target(entry.path, manifest)
+            if target and not os.path.exists(target):
+                os.remove(entry.path)
+                if manifest is not None:
+                    manifest.pop(entry.name.lower(), None)
+                removed += 1
+
+        if manifest is not None and manifest != original_manifest:
+            write_file_atomically(shim_dir / SHIM_MANIFEST_FILE, json.dumps(manifest, indent=2))
+
+        logger.info(f"Thư mục shim {shim_dir}: {created} tạo/cập nhật, "
+                    f"{unchanged} không đổi, {removed} đã xóa")
+        self.add_to_path(str(shim_dir))
+        return True
+
+    def flush_environment(self):
+        """Ghi tất cả thay đổi trong journal qua environment backend (một lần ghi)"""
+        if self.shim_bin and self.shim_source_dirs:
+            self.update_shim_bin()
+
+        if self.env_journal.is_empty():
+            return True
+
+        logger.info(f"Ghi {len(self.env_journal.path_entries)} thư mục PATH và "
+                    f"{len(self.env_journal.variables)} biến môi trường...")
+        success = self.env_backend.write(self.env_journal.path_entries, self.env_journal.variables)
+        if success:
+            self.env_journal.clear()
+        return success
+
+    def create_env_backend(self, name=None):
+        """Tạo environment backend theo tên (mặc định theo hệ điều hành)"""
+        name = name or self.default_env_backend
+        if name == 'registry':
+            return WindowsRegistryBackend(self.system, self.get_config_directory())
+        if name == 'shell':
+            return ShellRcEnvironmentBackend(self.system, self.get_config_directory())
+        if name == 'memory':
+            return MemoryEnvironmentBackend(self.system, user_path=os.environ.get('PATH', ''))
+        raise ValueError(f"Environment backend không hợp lệ: {name} (hỗ trợ: {', '.join(ENV_BACKENDS)})")
+
+    def get_config_directory(self):
+        """Thư mục cấu hình của installer (XDG_CONFIG_HOME)"""
+        return Path(os.environ.get('XDG_CONFIG_HOME', Path.home() / '.config')) / 'cppdeps'
+
+    def print_environment(self):
+        """In các export cuối cùng (theo env_script_shell) ra stdout, dùng cho CI"""
+        state = self.env_backend.merge_state(self.env_backend.load_state(),
+                                             self.env_journal.path_entries, self.env_journal.variables)
+        sys.stdout.write(render_env_script(state, self.env_script_shell))
+
+    def install_additional_tools(self):
+        """Cài đặt các công cụ bổ sung"""
+        logger.info("Cài đặt các công cụ bổ sung...")
+        self.install_platform_additional_tools()
+
+    def install_platform_additional_tools(self):
+        """Cài đặt các công cụ bổ sung riêng của hệ điều hành (lớp con override)"""
+
+    def verify_installation(self):
+        """Kiểm tra các công cụ đã được cài đặt"""
+        logger.info("Kiểm tra cài đặt...")
+
+        # Hiển thị thông tin debug về PATH
+        self.debug_path_info()
+
+        tools_to_check = ['gcc', 'g++', 'cmake', 'ninja', 'git'] + self.get_platform_tools()
+
+        # Quét lại các thư mục đã thay đổi từ lần quét trước
+        self.get_executable_index().refresh()
+
+        # Chạy các probe song song, mỗi probe có timeout riêng
+        start = time.perf_counter()
+        results = self.probe_tools(tools_to_check)
+
+        for tool in tools_to_check:
+            if results[tool]['status'] == 'missing':
+                logger.warning(f"  Không tìm thấy {tool} trong PATH")
+                # Thử tìm thủ công trong các thư mục thông thường
+                manual_path = self.manual_tool_check(tool)
+                if manual_path:
+                    logger.info(f"  Đã thêm {tool} vào PATH từ: {manual_path}")
+                    # Thử kiểm tra lại sau khi thêm vào PATH
+                    results[tool] = self.probe_tool(tool)
+            self.log_probe_result(results[tool])
+
+        self.verify_results = results
+        logger.info(f"Đã kiểm tra {len(tools_to_check)} công cụ trong {time.perf_counter() - start:.2f} giây")
+
+        installed_tools = [tool for tool in tools_to_check if results[tool]['status'] == 'ok']
+        missing_tools = [tool for tool in tools_to_check if results[tool]['status'] != 'ok']
+
+        self.verify_platform_environment()
+
+        logger.info(f"Đã cài đặt: {', '.join(installed_tools)}")
+        if missing_tools:
+            logger.warning(f"Chưa cài đặt hoặc không tìm thấy: {', '.join(missing_tools)}")
+            logger.info("Gợi ý: Kiểm tra PATH environment variable và thử restart terminal")
+
+        return len(missing_tools) == 0
+
+    def get_cache_directory(self):
+        """Thư mục cache của installer (XDG_CACHE_HOME)"""
+        return Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'cppdeps'
+
+    def get_executable_identity(self, tool_path):
+        """Định danh executable: (đường dẫn thật, [size, mtime, inode/file-id, device])"""
+        real_path = os.path.realpath(tool_path)
+        stat = os.stat(real_path)
+        return real_path, [stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_dev]
+
+    def load_probe_cache(self):
+        """Đọc probe cache từ đĩa"""
+        import json
+        try:
+            with open(self.get_cache_directory() / PROBE_CACHE_FILE, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_probe_cache(self):
+        """Ghi probe cache xuống đĩa (temp file + rename), chỉ khi có kết quả mới"""
+        import json
+        with self.probe_cache_lock:
+            if not self.probe_cache_dirty:
+                return
+            self.probe_cache_dirty = False
+            probe_cache = dict(self.probe_cache)
+
+        cache_file = self.get_cache_directory() / PROBE_CACHE_FILE
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = cache_file.with_name(f'{cache_file.name}.{os.getpid()}.tmp')
+            with open(temp_file, 'w') as f:
+                json.dump(probe_cache, f)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"Không thể ghi probe cache: {e}")
+
+    def run_probe(self, tool_path, args, timeout=None, use_cache=True):
+        """Chạy tool với args (không qua shell), dùng probe cache nếu executable không đổi
+
+        Trả về subprocess.CompletedProcess, raise subprocess.TimeoutExpired khi quá timeout
+        """
+        import json
+        timeout = timeout or self.probe_timeout
+        command = [str(tool_path)] + list(args)
+
+        cache_key = identity = None
+        if self.probe_cache_enabled and use_cache:
+            try:
+                real_path, identity = self.get_executable_identity(tool_path)
+                cache_key = json.dumps([real_path] + list(args))
+            except OSError:
+                pass
+
+        if cache_key:
+            with self.probe_cache_lock:
+                if self.probe_cache is None:
+                    self.probe_cache = self.load_probe_cache()
+                entry = self.probe_cache.get(cache_key)
+            if entry and entry['identity'] == identity and entry['returncode'] == 0:
+                return subprocess.CompletedProcess(command, entry['returncode'],
+                                                   entry['stdout'], entry['stderr'])
+
+        result = subprocess.run(command, capture_output=True, text=True, errors='replace',
+                                check=False, timeout=timeout)
+
+        # Chỉ cache kết quả thành công: lỗi tạm thời (thiếu DLL, PATH sai...) không được giữ lại
+        if cache_key and result.returncode == 0:
+            with self.probe_cache_lock:
+                self.probe_cache[cache_key] = {
+                    'identity': identity,
+                    'returncode': result.returncode,
+                    'stdout': result.stdout[:PROBE_CACHE_MAX_OUTPUT],
+                    'stderr': result.stderr[:PROBE_CACHE_MAX_OUTPUT]
+                }
+                self.probe_cache_dirty = True
+        return result
+
+    def get_version_args(self, tool):
+        """Trả về arguments để kiểm tra version của tool (không qua shell)"""
+        return VERSION_ARGS.get(tool, ['--version'])
+
+    def probe_tool(self, tool, timeout=None):
+        """Kiểm tra một tool: trả về dict gồm tool, path, version, duration (giây) và status
+
+        status: 'ok', 'missing' (không có trong PATH), 'failed' hoặc 'timeout'
+        """
+        timeout = timeout or self.probe_timeout
+        start = time.perf_counter()
+        result = {'tool': tool, 'path': self.which(tool), 'version': None,
+                  'duration': 0.0, 'status': 'missing'}
+
+        if result['path'] and tool == 'vcpkg' and self.is_lazy_vcpkg_shim(result['path']):
+            # Không chạy shim để tránh kích hoạt bootstrap
+            result['status'] = 'ok'
+            result['version'] = 'vcpkg shim (bootstrap khi dùng lần đầu)'
+        elif result['path']:
+            try:
+                process = self.run_probe(result['path'], self.get_version_args(tool), timeout,
+                                         use_cache=not self.is_vcpkg_shim(result['path']))
+                output = process.stdout.strip() or process.stderr.strip()
+                if tool == 'cl':
+                    # cl không có --version, chỉ kiểm tra banner của MSVC
+                    success = 'Microsoft' in process.stdout + process.stderr
+                else:
+                    success = process.returncode == 0
+                result['status'] = 'ok' if success else 'failed'
+                if output:
+                    result['version'] = output.splitlines()[0][:100]
+            except subprocess.TimeoutExpired:
+                result['status'] = 'timeout'
+            except OSError as e:
+                result['status'] = 'failed'
+                result['version'] = str(e)
+
+        result['duration'] = time.perf_counter() - start
+        return result
+
+    def probe_tools(self, tools, timeout=None):
+        """Kiểm tra nhiều tool song song, trả về dict tool -> kết quả của probe_tool"""
+        import concurrent.futures
+        if not tools:
+            return {}
+        workers = min(len(tools), VERIFY_MAX_WORKERS)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda tool: self.probe_tool(tool, timeout), tools))
+
+        # Ghi probe cache một lần cho cả lượt kiểm tra
+        self.save_probe_cache()
+        return {result['tool']: result for result in results}
+
+    def log_probe_result(self, result):
+        """Ghi log kết quả probe của một tool"""
+        tool = result['tool']
+        duration_ms = result['duration'] * 1000
+        fields = {'tool': tool, 'duration_ms': round(duration_ms)}
+        if result['status'] == 'ok':
+            log_event('probe.ok', f"✓ {tool} đã được cài đặt ({duration_ms:.0f} ms)", **fields)
+            logger.info(f"  Tìm thấy {tool} tại: {result['path']}")
+            if result['version']:
+                logger.info(f"  Version: {result['version']}")
+        elif result['status'] == 'timeout':
+            log_event('probe.timeout', f"  {tool} tại {result['path']} không phản hồi sau {self.probe_timeout} giây",
+                      logging.WARNING, **fields)
+        elif result['status'] == 'failed':
+            log_event('probe.failed', f"  {tool} tồn tại nhưng không thể chạy: {result['path']}",
+                      logging.WARNING, **fields)
+        else:
+            log_event('probe.missing', f"  Không tìm thấy {tool}", logging.WARNING, **fields)
+
+    def debug_path_info(self):
+        """Hiển thị thông tin debug về PATH và environment"""
+        logger.info("=== DEBUG PATH INFORMATION ===")
+
+        # Hiển thị PATH hiện tại
+        current_path = os.environ.get('PATH', '')
+        path_dirs = current_path.split(os.pathsep)
+        logger.info(f"PATH có {len(path_dirs)} thư mục:")
+        for i, path_dir in enumerate(path_dirs[:10]):  # Chỉ hiển thị 10 thư mục đầu
+            logger.info(f"  [{i+1}] {path_dir}")
+
+        if len(path_dirs) > 10:
+            logger.info(f"  ... và {len(path_dirs) - 10} thư mục khác")
+
+        # Kiểm tra các biến môi trường quan trọng
+        for var in self.debug_env_vars:
+            value = os.environ.get(var, 'NOT SET')
+            logger.info(f"  {var}: {value}")
+
+        # Kiểm tra các thư mục toolchain thông thường của hệ điều hành
+        common_paths = self.get_debug_check_paths()
+        if common_paths:
+            logger.info("Kiểm tra các thư mục thông thường:")
+        for path in common_paths:
+            exists = os.path.exists(path)
+            logger.info(f"  {'✓' if exists else '✗'} {path}")
+
+        logger.info("=== END DEBUG INFO ===")
+
+    def get_debug_check_paths(self):
+        """Các thư mục toolchain thông thường hiển thị trong debug_path_info (lớp con override)"""
+        return []
+
+    def check_tool_with_special_handling(self, tool, tool_path):
+        """Kiểm tra tool với xử lý đặc biệt cho từng loại"""
         try:
-            if self.system == 'windows':
-                import ctypes
-                return ctypes.windll.shell32.IsUserAnAdmin()
+            if tool == 'cl':
+                # MSVC compiler - thử compile một file trống để kiểm tra
+                result = self.run_probe(tool_path, ['/?'])
+                return result.returncode == 0
+            elif tool in ['gcc', 'g++', 'mingw32-make']:
+                # MinGW tools - kiểm tra --version
+                result = self.run_probe(tool_path, ['--version'])
+                return result.returncode == 0
+            elif tool == 'cmake':
+                # CMake - kiểm tra --version
+                result = self.run_probe(tool_path, ['--version'])
+                return result.returncode == 0
+            elif tool == 'msbuild':
+                # MSBuild - kiểm tra -version
+                result = self.run_probe(tool_path, ['-version'])
+                return result.returncode == 0
+            elif tool == 'vcpkg':
+                # vcpkg - kiểm tra version
+                result = self.run_probe(tool_path, ['version'])
+                return result.returncode == 0
             else:
-                return os.geteuid() == 0
+                # Default: thử --version
+                result = self.run_probe(tool_path, ['--version'])
+                return result.returncode == 0
         except:
             return False
 
-    def get_install_directory(self):
-        """Lấy thư mục cài đặt phù hợp"""
-        if self.system == 'windows':
-            return Path(os.environ.get('PROGRAMFILES', 'C:\\Program Files')) / 'CppDeps'
-        else:
-            return Path('/usr/local') if self.is_admin else Path.home() / '.local'
+    def manual_tool_check(self, tool):
+        """Kiểm tra thủ công tool bằng cách tìm trong các đường dẫn thông thường"""
+        logger.info(f"Tìm kiếm {tool} thủ công...")
+
+        # Một số tool có thể không có .exe extension, chỉ mục xử lý theo PATHEXT
+        for base_path, tool_path in self.get_executable_index().find_all(tool, self.tool_search_paths):
+            logger.info(f"Tìm thấy {tool} tại: {tool_path}")
+
+            # Kiểm tra xem tool có hoạt động không
+            if self.check_tool_with_special_handling(tool, tool_path):
+                logger.info(f"  {tool} hoạt động tốt")
+                # Thử thêm vào PATH tạm thời
+                self.add_to_path(base_path)
+                return tool_path
+            else:
+                logger.warning(f"  {tool} tồn tại nhưng không hoạt động")
+
+        tool_path = self.find_platform_tool(tool)
+        if tool_path:
+            return tool_path
+
+        logger.warning(f"Không tìm thấy {tool} trong các đường dẫn thông thường")
+        return None
+
+    def find_platform_tool(self, tool):
+        """Tìm tool theo cấu trúc cài đặt riêng của hệ điều hành, thêm vào PATH nếu thấy (lớp con override)"""
+        return None
+
+    def discover_tool(self, tool):
+        """(thư mục, executable) của cmake/ninja ở vị trí cài đặt thông thường ngoài PATH"""
+        return None, None
+
+    def detect_existing_cmake(self):
+        """Phát hiện CMake có sẵn trên hệ thống"""
+        logger.info("Tìm kiếm CMake có sẵn...")
+
+        # Kiểm tra trong PATH
+        if self.which('cmake'):
+            logger.info("CMake đã có trong PATH")
+            return True
+
+        # Tìm kiếm trong các thư mục thông thường
+        cmake_path, cmake_exe = self.discover_tool('cmake')
+        if cmake_exe:
+            logger.info(f"Tìm thấy CMake tại: {cmake_exe}")
+            self.add_to_path(cmake_path)
+            return True
+
+        return False
+
+    def detect_existing_ninja(self):
+        """Phát hiện Ninja có sẵn trên hệ thống"""
+        logger.info("Tìm kiếm Ninja có sẵn...")
+
+        # Kiểm tra trong PATH
+        if self.which('ninja'):
+            logger.info("Ninja đã có trong PATH")
+            return True
+
+        # Tìm kiếm trong các thư mục thông thường
+        ninja_path, ninja_exe = self.discover_tool('ninja')
+        if ninja_exe:
+            logger.info(f"Tìm thấy Ninja tại: {ninja_exe}")
+            self.add_to_path(ninja_path)
+            return True
+
+        return False
+
+    def refresh_environment(self):
+        """Tính lại environment hiệu lực ngay trong process (không chạy process con)
+
+        Đọc environment bền vững từ backend (Windows: machine + user trong registry,
+        Unix: env state) và áp dụng vào os.environ. Các thư mục đã thêm vào PATH
+        của process trong lần chạy này được giữ lại.
+        """
+        logger.info("Đang refresh environment variables...")
 
-    def run_command(self, command, shell=True, check=True):
-        """Chạy command với error handling"""
         try:
-            logger.info(f"Đang chạy: {command}")
-            result = subprocess.run(command, shell=shell, check=check, 
-                                  capture_output=True, text=True)
-            if result.stdout:
-                logger.info(result.stdout)
-            return result
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Lỗi khi chạy command: {e}")
-            logger.error(f"Stderr: {e.stderr}")
+            variables, path_entries = self.env_backend.read_effective()
+            for name, value in variables.items():
+                if name.upper() != 'PATH':
+                    os.environ[name] = value
+
+            current_entries = split_path(os.environ.get('PATH', ''), self.system)
+            new_entries = merge_path_entries(self.system, path_entries, current_entries)
+
+            os.environ['PATH'] = self.path_separator.join(new_entries)
+
+            # Chỉ mục executable được tạo lại theo PATH mới khi dùng lần sau
+            self.executable_index = None
+            logger.info(f"Đã refresh environment ({len(new_entries)} thư mục trong PATH)")
+            return True
+
+        except Exception as e:
+            logger.warning(f"Không thể refresh environment: {e}")
+            return False
+
+    def force_path_refresh(self):
+        """Buộc refresh PATH environment variable (giữ để tương thích, dùng refresh_environment)"""
+        return self.refresh_environment()
+
+    def cleanup(self):
+        """Dọn dẹp các file tạm"""
+        # Ghi các thay đổi môi trường còn lại (vd: khi gọi từng install_* riêng lẻ),
+        # thông báo cho hệ thống một lần cho cả lần chạy
+        self.flush_environment()
+        self.env_backend.broadcast()
+        self.save_probe_cache()
+
+        if self._temp_dir is None:
+            return
+
+        try:
+            shutil.rmtree(self._temp_dir)
+            self._temp_dir = None
+            logger.info("Đã dọn dẹp các file tạm")
+        except Exception as e:
+            logger.error(f"Lỗi khi dọn dẹp: {e}")
+
+    @contextlib.contextmanager
+    def log_step(self, step):
+        """Ghi event step.start/step.end (hoặc step.failed) kèm duration_ms quanh một bước cài đặt"""
+        log_event('step.start', f"Bắt đầu bước: {step}", step=step)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            log_event('step.failed', f"Bước {step} thất bại", logging.ERROR, step=step,
+                      duration_ms=round((time.perf_counter() - start) * 1000))
             raise
+        duration_ms = round((time.perf_counter() - start) * 1000)
+        log_event('step.end', f"Hoàn tất bước: {step} ({duration_ms} ms)", step=step, duration_ms=duration_ms)
 
-    def download_file(self, url, dest_path):
-        """Tải file từ URL"""
-        logger.info(f"Đang tải xuống: {url}")
+    def run_full_installation(self):
+        """Chạy toàn bộ quá trình cài đặt"""
+        logger.info("Bắt đầu cài đặt C/C++ dependencies...")
+        logger.info(f"Hệ điều hành: {self.system}")
+        logger.info(f"Kiến trúc: {self.architecture}")
+        logger.info(f"Quyền admin: {self.is_admin}")
+        logger.info(f"Thư mục cài đặt: {self.install_dir}")
+        
         try:
-            urllib.request.urlretrieve(url, dest_path)
-            logger.info(f"Đã tải xuống: {dest_path}")
-            return True
+            # Tạo thư mục cài đặt
+            self.install_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Cài đặt compiler
+            with self.log_step('compiler'):
+                self.install_compiler()
+                self.get_executable_index().refresh()
+
+            # Build tools riêng của hệ điều hành (vd: MSBuild, MSYS2 trên Windows)
+            with self.log_step('platform_build_tools'):
+                self.install_platform_build_tools()
+
+            # Cài đặt CMake (đảm bảo được cài đặt)
+            with self.log_step('cmake'):
+                if not self.detect_existing_cmake():
+                    logger.info("CMake chưa được cài đặt, tiến hành cài đặt...")
+                    self.install_cmake()
+                else:
+                    logger.info("CMake đã được cài đặt")
+
+            # Cài đặt Ninja
+            with self.log_step('ninja'):
+                if not self.detect_existing_ninja():
+                    logger.info("Ninja chưa được cài đặt, tiến hành cài đặt...")
+                    self.install_ninja()
+                else:
+                    logger.info("Ninja đã được cài đặt")
+
+            # Cài đặt vcpkg (lazy: chỉ đặt shim, bootstrap khi dùng lần đầu)
+            with self.log_step('vcpkg'):
+                if self.lazy_vcpkg:
+                    self.install_vcpkg_shim()
+                else:
+                    self.install_vcpkg()
+
+            # Cài đặt Conan
+            with self.log_step('conan'):
+                self.install_conan()
+
+            # Cài đặt các công cụ bổ sung
+            with self.log_step('additional_tools'):
+                self.install_additional_tools()
+
+            # Ghi các thay đổi PATH/biến môi trường một lần, sau đó refresh trước khi kiểm tra
+            with self.log_step('environment'):
+                self.flush_environment()
+                self.refresh_environment()
+
+            # Kiểm tra cài đặt
+            with self.log_step('verify'):
+                success = self.verify_installation()
+
+            if success:
+                logger.info("🎉 Cài đặt hoàn tất thành công!")
+                logger.info("Tất cả công cụ đã được cài đặt và sẵn sàng sử dụng.")
+            else:
+                logger.warning("⚠️ Cài đặt hoàn tất nhưng một số công cụ có thể chưa sẵn sàng.")
+                logger.info("Gợi ý:")
+                logger.info("  1. Khởi động lại terminal/command prompt")
+                logger.info("  2. Kiểm tra PATH environment variable")
+                logger.info("  3. Chạy lại script với --verify-only để kiểm tra")
+                logger.info("  4. Cài đặt thủ công các công cụ còn thiếu")
+            
         except Exception as e:
-            logger.error(f"Lỗi khi tải xuống {url}: {e}")
+            logger.error(f"Lỗi trong quá trình cài đặt: {e}")
+        finally:
+            self.cleanup()
+
+
+class WindowsCppDepsInstaller(CppDepsInstaller):
+    """Installer cho Windows: Visual Studio Build Tools, MSBuild, Windows SDK, MSYS2/MinGW"""
+
+    platform_system = 'windows'
+    default_env_backend = 'registry'
+
+    executable_suffix = '.exe'
+    venv_bin_dir = 'Scripts'
+    cmake_archive_format = 'zip'
+    env_script_shell = 'cmd'
+    path_separator = ';'
+    prepend_path = False
+    tool_search_paths = TOOL_SEARCH_PATHS
+    debug_env_vars = ['MSYS2_ROOT', 'MSBuildPath', 'VCPKG_ROOT']
+
+    def __init__(self, *args, system_root=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Tìm Visual Studio toolchain theo cấu trúc thư mục (system_root thay đổi được để test)
+        self.vs_locator = VisualStudioLocator(system_root)
+
+        # Kết quả tìm MSYS2/MSBuild/MSVC/Windows SDK/CMake/Ninja, ghi nhớ trong một lần chạy
+        self.discovery = ToolchainDiscovery(self.get_executable_index, self.vs_locator, self.run_probe)
+
+    def get_config_directory(self):
+        """Thư mục cấu hình của installer (APPDATA)"""
+        return Path(os.environ.get('APPDATA', Path.home() / 'AppData' / 'Roaming')) / 'cppdeps'
+
+    def get_cache_directory(self):
+        """Thư mục cache của installer (LOCALAPPDATA)"""
+        return Path(os.environ.get('LOCALAPPDATA', Path.home() / 'AppData' / 'Local')) / 'cppdeps'
+
+    def copy_file_privileged(self, source, destination, preserve=False):
+        """Windows không có sudo: cần chạy installer với quyền Administrator"""
+        raise PermissionError(f"Không có quyền ghi {destination} (cần quyền Administrator)")
+
+    def get_user_path_max_length(self, machine_path):
+        """Machine PATH + ';' + User PATH không được vượt quá giới hạn độ dài của environment block"""
+        return WINDOWS_PATH_MAX_LENGTH - len(machine_path) - 1
+
+    def run_vcpkg_bootstrap(self, vcpkg_dir):
+        """Build vcpkg bằng bootstrap-vcpkg.bat"""
+        bootstrap_script = vcpkg_dir / 'bootstrap-vcpkg.bat'
+        self.run_command(f'"{bootstrap_script}"')
+
+    def write_vcpkg_shim(self, shim_dir, vcpkg_exe, script):
+        """Ghi vcpkg shim dạng vcpkg.cmd, trả về đường dẫn shim"""
+        shim_path = shim_dir / 'vcpkg.cmd'
+        shim_content = (
+            "@echo off\r\n"
+            f"rem {VCPKG_SHIM_MARKER}\r\n"
+            f'if not exist "{vcpkg_exe}" (\r\n'
+            f'    "{sys.executable}" "{script}" {self.get_vcpkg_shim_args()} 1>&2 || exit /b 1\r\n'
+            ")\r\n"
+            f'"{vcpkg_exe}" %*\r\n'
+        )
+        with open(shim_path, 'w', newline='') as f:
+            f.write(shim_content)
+        return shim_path
+
+    def read_shim_manifest(self, shim_dir):
+        """{tên file shim: đích} của các shim .exe (hardlink/bản sao) trên Windows"""
+        import json
+        try:
+            with open(Path(shim_dir) / SHIM_MANIFEST_FILE, 'r') as f:
+                return dict(json.load(f))
+        except (OSError, TypeError, ValueError):
+            return {}
+
+    def read_shim_target(self, shim_path, manifest=None):
+        """Đích của shim: launcher .cmd đọc từ nội dung, shim .exe tra trong manifest"""
+        shim_path = Path(shim_path)
+        if shim_path.suffix.lower() != '.cmd':
+            if manifest is None:
+                manifest = self.read_shim_manifest(shim_path.parent)
+            return manifest.get(shim_path.name.lower())
+        try:
+            with open(shim_path, 'r') as f:
+                content = f.read()
+        except OSError:
+            return None
+        match = re.search(r'^call "(.+)" %\*$', content, re.MULTILINE)
+        return match.group(1) if SHIM_LAUNCHER_MARKER in content and match else None
+
+    def can_link_shim(self, tool, target):
+        """Windows: shim dạng hardlink/bản sao .exe chỉ dùng được cho executable độc lập
+        (không có DLL cạnh nó và không tìm resource theo đường dẫn của chính nó)"""
+        if os.path.splitext(target)[1].lower() != '.exe' or tool in SHIM_LAUNCHER_ONLY_TOOLS:
+            return False
+        try:
+            with os.scandir(os.path.dirname(target)) as entries:
+                return not any(entry.name.lower().endswith('.dll') for entry in entries)
+        except OSError:
+            return False
+
+    def write_shim(self, shim_dir, tool, target, manifest=None):
+        """Tạo hoặc cập nhật shim, trả về (đường dẫn shim, True nếu có thay đổi)
+
+        Hardlink (bản sao nếu khác ổ đĩa) .exe khi can_link_shim, còn lại launcher .cmd.
+        manifest được cập nhật cho shim .exe.
+        """
+        if manifest is not None and self.can_link_shim(tool, target):
+            shim_path = shim_dir / f'{tool}.exe'
+            if manifest.get(shim_path.name) == target and shim_path.exists():
+                return shim_path, False
+            # Bỏ launcher .cmd cũ của tool (nếu có) để không còn hai shim trỏ tới hai nơi
+            launcher = shim_dir / f'{tool}.cmd'
+            if self.read_shim_target(launcher) is not None:
+                os.remove(launcher)
+            temp_path = shim_dir / f'.{tool}.{os.getpid()}.tmp'
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            try:
+                os.link(target, temp_path)
+            except OSError:
+                shutil.copy2(target, temp_path)
+            os.replace(temp_path, shim_path)
+            manifest[shim_path.name] = target
+            return shim_path, True
+
+        shim_path = shim_dir / f'{tool}.cmd'
+        if self.read_shim_target(shim_path) == target:
+            return shim_path, False
+        if manifest is not None and manifest.pop(f'{tool}.exe', None) is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(shim_dir / f'{tool}.exe')
+        write_file_atomically(shim_path, f'@echo off\n{SHIM_LAUNCHER_MARKER}\ncall "{target}" %*\n')
+        return shim_path, True
+
+    def get_debug_check_paths(self):
+        """Thư mục bin của MSYS2 và VC/Tools/MSVC của các Visual Studio instance"""
+        paths = []
+        for root in self.find_msys2_roots() or MSYS2_SEARCH_PATHS[:1]:
+            paths += [os.path.join(root, 'usr', 'bin'), os.path.join(root, 'mingw64', 'bin')]
+        paths += [str(install_dir / 'VC' / 'Tools' / 'MSVC')
+                  for major, install_dir in self.discovery.get('visual_studio')]
+        return paths
+
+    def find_platform_tool(self, tool):
+        """Tìm MSVC compiler theo cấu trúc VC/Tools/MSVC/<phiên bản>/bin/Host*/*"""
+        if tool != 'cl':
+            return None
+        logger.info("Tìm kiếm MSVC compiler (cl.exe) trong Visual Studio...")
+        for cl_path in self.discovery.get('cl'):
+            logger.info(f"Tìm thấy cl.exe tại: {cl_path}")
+            if self.check_tool_with_special_handling('cl', str(cl_path)):
+                self.add_to_path(str(cl_path.parent))
+                return str(cl_path)
+        return None
+
+    def discover_tool(self, tool):
+        """CMake/Ninja trong Program Files và MSYS2 (kết quả ghi nhớ trong discovery)"""
+        return self.discovery.get(tool)
+
+    def find_msys2_roots(self):
+        """Liệt kê tất cả MSYS2 root có trên hệ thống"""
+        return self.discovery.get('msys2_roots')
+
+    def to_msys2_path(self, path):
+        """Chuyển đường dẫn Windows (C:\\x, \\\\server\\share) sang dạng MSYS2 (/c/x, //server/share)"""
+        path = str(path).replace('\\', '/')
+        if len(path) >= 2 and path[1] == ':':
+            return f"/{path[0].lower()}{path[2:]}"
+        return path
+
+    def configure_pacman_cache(self, msys2_path):
+        """Cấu hình CacheDir của MSYS2 root dùng pacman cache chung"""
+        pacman_conf = os.path.join(msys2_path, 'etc', 'pacman.conf')
+        if not os.path.exists(pacman_conf):
+            logger.warning(f"Không tìm thấy {pacman_conf}")
             return False
 
-    def extract_archive(self, archive_path, extract_to):
-        """Giải nén file archive"""
-        logger.info(f"Đang giải nén: {archive_path}")
         try:
-            if archive_path.endswith('.zip'):
-                with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                    zip_ref.extractall(extract_to)
-            elif archive_path.endswith(('.tar.gz', '.tgz')):
-                with tarfile.open(archive_path, 'r:gz') as tar_ref:
-                    tar_ref.extractall(extract_to)
-            logger.info(f"Đã giải nén thành công")
+            os.makedirs(self.pacman_cache_dir, exist_ok=True)
+
+            # pacman tải vào CacheDir đầu tiên ghi được, cache local giữ lại làm dự phòng.
+            # Mỗi thư mục một dòng CacheDir (giá trị trên cùng một dòng được tách theo khoảng trắng)
+            shared_cache = f"{self.to_msys2_path(self.pacman_cache_dir).rstrip('/')}/"
+            if any(char.isspace() for char in shared_cache):
+                logger.warning(f"Đường dẫn pacman cache có khoảng trắng, pacman có thể không đọc đúng: {shared_cache}")
+            cache_dirs = [shared_cache, '/var/cache/pacman/pkg/']
+            with open(pacman_conf, 'r') as f:
+                content = f.read()
+
+            new_content = self.set_config_option(content, 'options', 'CacheDir', cache_dirs)
+            if new_content != content:
+                self.write_config_file(pacman_conf, new_content)
+            logger.info(f"MSYS2 tại {msys2_path} dùng pacman cache chung: {self.pacman_cache_dir}")
             return True
         except Exception as e:
-            logger.error(f"Lỗi khi giải nén: {e}")
+            logger.warning(f"Không thể cấu hình pacman cache chung cho {msys2_path}: {e}")
             return False
 
-    def install_compiler(self):
-        """Cài đặt compiler phù hợp với hệ điều hành"""
-        logger.info("Đang cài đặt compiler...")
-        
-        if self.system == 'windows':
-            self.install_windows_compiler()
-        elif self.system == 'linux':
-            self.install_linux_compiler()
-        elif self.system == 'darwin':
-            self.install_macos_compiler()
+    def configure_shared_pacman_cache(self):
+        """Cấu hình pacman cache chung cho tất cả MSYS2 root"""
+        roots = self.find_msys2_roots()
+        if not roots:
+            logger.warning("Không tìm thấy MSYS2 để cấu hình pacman cache")
+            return False
+        return all([self.configure_pacman_cache(root) for root in roots])
+
+    def seed_pacman_cache(self, packages=None):
+        """Tải trước packages vào pacman cache chung (không cài đặt)"""
+        packages = packages or MINGW_PACKAGES + MINGW_DEV_PACKAGES
+        roots = self.find_msys2_roots()
+        if not roots:
+            logger.error("Không tìm thấy MSYS2 để tải packages vào cache")
+            return False
+
+        self.configure_shared_pacman_cache()
+        logger.info(f"Tải trước {len(packages)} packages vào {self.pacman_cache_dir}...")
+
+        bash_exe = os.path.join(roots[0], "usr", "bin", "bash.exe")
+        cache_dir = self.to_msys2_path(self.pacman_cache_dir)
+        package_args = ' '.join(packages)
+        seed_cmd = f'"{bash_exe}" -lc "pacman -Syw --noconfirm --cachedir \'{cache_dir}\' {package_args}"'
+        result = self.run_command(seed_cmd, check=False)
+        if result.returncode != 0:
+            logger.warning(f"Không thể tải trước packages (exit code: {result.returncode})")
+            return False
+
+        logger.info("Đã tải trước packages vào pacman cache chung")
+        return True
+
+    def prune_pacman_cache(self, max_size=DEFAULT_PACMAN_CACHE_MAX_SIZE):
+        """Xóa các package cũ nhất để pacman cache chung không vượt quá max_size"""
+        max_bytes = parse_size(max_size)
+        packages = []
+        total_size = 0
+
+        with os.scandir(self.pacman_cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and '.pkg.tar' in entry.name and not entry.name.endswith('.sig'):
+                    stat = entry.stat()
+                    packages.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_size += stat.st_size
+
+        logger.info(f"pacman cache: {len(packages)} packages, {total_size / 1024 ** 2:.1f} MB "
+                    f"(giới hạn {max_bytes / 1024 ** 2:.1f} MB)")
+
+        removed = 0
+        freed = 0
+        for mtime, size, package_path in sorted(packages):
+            if total_size <= max_bytes:
+                break
+            for path in (package_path, f"{package_path}.sig"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total_size -= size
+            freed += size
+            removed += 1
+
+        logger.info(f"Đã xóa {removed} packages, giải phóng {freed / 1024 ** 2:.1f} MB")
+        return freed
+
+    def check_admin_privileges(self):
+        """Kiểm tra quyền Administrator"""
+        try:
+            import ctypes
+            return ctypes.windll.shell32.IsUserAnAdmin()
+        except:
+            return False
+
+    def get_install_directory(self):
+        """Lấy thư mục cài đặt phù hợp"""
+        return Path(os.environ.get('PROGRAMFILES', 'C:\\Program Files')) / 'CppDeps'
+
+    def install_platform_compiler(self):
+        """Cài đặt Visual Studio Build Tools và MinGW"""
+        self.install_windows_compiler()
+
+    def install_platform_build_tools(self):
+        """Kiểm tra và cài đặt MSBuild và MSYS2/MinGW"""
+        if not self.detect_existing_msbuild():
+            logger.info("MSBuild chưa được cài đặt, tiến hành cài đặt...")
+            self.setup_msbuild_path()  # Thử tìm lại sau khi cài VS Build Tools
+            if not self.detect_existing_msbuild():
+                self.install_msbuild_standalone()
+
+        # Kiểm tra và cài đặt MSYS2/MinGW
+        if not self.detect_existing_msys2():
+            logger.info("MSYS2/MinGW chưa được cài đặt, tiến hành cài đặt...")
+            self.setup_msys2_path()  # Thử tìm lại sau khi cài VS Build Tools
+            if not self.detect_existing_msys2():
+                self.install_msys2()
+
+    def install_platform_additional_tools(self):
+        """Cài đặt pkg-config và Git cho Windows"""
+        # Cài đặt pkg-config
+        pkgconfig_url = "https://download.gnome.org/binaries/win32/dependencies/pkg-config_0.26-1_win32.zip"
+        pkgconfig_archive = Path(self.temp_dir) / "pkg-config.zip"
+
+        if self.download_file(pkgconfig_url, pkgconfig_archive):
+            pkgconfig_dir = self.install_dir / 'pkg-config'
+            pkgconfig_dir.mkdir(parents=True, exist_ok=True)
+
+            if self.extract_archive(str(pkgconfig_archive), str(pkgconfig_dir)):
+                self.add_to_path(str(pkgconfig_dir / 'bin'))
+
+        # Cài đặt Git (nếu chưa có)
+        if not self.which('git'):
+            git_url = "https://github.com/git-for-windows/git/releases/latest/download/Git-2.42.0.2-64-bit.exe"
+            git_installer = Path(self.temp_dir) / "git-installer.exe"
+
+            if self.download_file(git_url, git_installer):
+                try:
+                    self.run_command(f'"{git_installer}" /VERYSILENT /NORESTART')
+                    logger.info("Đã cài đặt Git")
+                except:
+                    logger.warning("Không thể cài đặt Git tự động")
+
+    def get_platform_tools(self):
+        """MSVC, vcpkg, MSBuild và mingw32-make"""
+        logger.info("Kiểm tra Windows development environment...")
+        return ['cl', 'vcpkg', 'msbuild', 'mingw32-make']
+
+    def verify_platform_environment(self):
+        """Kiểm tra Windows headers, libraries và VC compiler includes"""
+        logger.info("Kiểm tra Windows SDK và headers...")
+        headers_ok = self.detect_windows_headers()
+        if headers_ok:
+            logger.info("✓ Windows headers có sẵn")
+        else:
+            logger.warning("⚠️ Một số Windows headers có thể thiếu")
+            logger.info("Gợi ý: Cài đặt Windows SDK mới nhất qua Visual Studio Installer")
+
+        # Thiết lập VC compiler includes
+        self.setup_vc_compiler_includes()
 
     def install_windows_compiler(self):
         """Cài đặt compiler trên Windows"""
@@ -132,6 +3463,7 @@ class CppDepsInstaller:
             try:
                 self.run_command(install_cmd)
                 logger.info("Đã cài đặt Visual Studio Build Tools với MSBuild và MSYS2")
+                self.discovery.invalidate('visual_studio')
 
                 # Cấu hình MSBuild PATH
                 self.setup_msbuild_path()
@@ -156,11 +3488,10 @@ class CppDepsInstaller:
             # Đảm bảo MinGW packages được cài đặt
             self.ensure_mingw_packages()
 
-        # Đảm bảo Windows SDK được cài đặt (Windows only)
-        if self.system == 'windows':
-            if not self.setup_windows_sdk_path():
-                logger.info("Cài đặt Windows SDK standalone...")
-                self.install_windows_sdk_standalone()
+        # Đảm bảo Windows SDK được cài đặt
+        if not self.setup_windows_sdk_path():
+            logger.info("Cài đặt Windows SDK standalone...")
+            self.install_windows_sdk_standalone()
 
     def install_msys2(self):
         """Cài đặt MSYS2"""
@@ -172,6 +3503,7 @@ class CppDepsInstaller:
             try:
                 # Cài đặt MSYS2 silent
                 self.run_command(f'"{msys2_installer}" --confirm-command --accept-messages --root C:\\msys64')
+                self.discovery.invalidate('msys2_roots')
                 
                 # Cập nhật và cài đặt các package cần thiết
                 msys2_cmd = 'C:\\msys64\\usr\\bin\\bash.exe -lc'
@@ -195,15 +3527,9 @@ class CppDepsInstaller:
         """Cấu hình MSBuild PATH sau khi cài đặt Visual Studio Build Tools"""
         logger.info("Cấu hình MSBuild PATH...")
         
-        # Các đường dẫn có thể có của MSBuild
-        possible_msbuild_paths = [
-            "C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\MSBuild\\Current\\Bin",
-            "C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\MSBuild\\Current\\Bin",
-            "C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\BuildTools\\MSBuild\\Current\\Bin",
-            "C:\\Program Files\\Microsoft Visual Studio\\2019\\BuildTools\\MSBuild\\Current\\Bin",
-            "C:\\Program Files (x86)\\MSBuild\\Current\\Bin",
-            "C:\\Program Files\\MSBuild\\Current\\Bin"
-        ]
+        # Các đường dẫn có thể có của MSBuild (từ Visual Studio instance metadata)
+        possible_msbuild_paths = [str(msbuild_exe.parent)
+                                  for msbuild_exe in self.discovery.get('msbuild')]
         
         for msbuild_path in possible_msbuild_paths:
             msbuild_exe = Path(msbuild_path) / "MSBuild.exe"
@@ -216,7 +3542,7 @@ class CppDepsInstaller:
                 
                 # Kiểm tra phiên bản
                 try:
-                    result = self.run_command(f'"{msbuild_exe}" -version', check=False)
+                    result = self.run_probe(msbuild_exe, ['-version'])
                     if result.returncode == 0:
                         logger.info("MSBuild đã được cấu hình thành công")
                         return True
@@ -243,6 +3569,7 @@ class CppDepsInstaller:
                 try:
                     self.run_command(install_cmd)
                     logger.info("Đã cài đặt MSBuild Tools")
+                    self.discovery.invalidate('visual_studio')
                     
                     # Cấu hình PATH
                     self.setup_msbuild_path()
@@ -296,28 +3623,20 @@ class CppDepsInstaller:
         logger.info("Tìm kiếm MSBuild có sẵn...")
         
         # Kiểm tra trong PATH
-        if shutil.which('msbuild'):
+        if self.which('msbuild'):
             logger.info("MSBuild đã có trong PATH")
             return True
         
-        # Tìm kiếm trong các thư mục thông thường
-        search_paths = [
-            "C:\\Program Files (x86)\\Microsoft Visual Studio",
-            "C:\\Program Files\\Microsoft Visual Studio",
-            "C:\\Program Files (x86)\\MSBuild",
-            "C:\\Program Files\\MSBuild",
-            "C:\\Windows\\Microsoft.NET\\Framework64",
-            "C:\\Windows\\Microsoft.NET\\Framework"
-        ]
-        
-        for base_path in search_paths:
-            if os.path.exists(base_path):
-                for root, dirs, files in os.walk(base_path):
-                    if 'MSBuild.exe' in files:
-                        msbuild_path = Path(root)
-                        logger.info(f"Tìm thấy MSBuild tại: {msbuild_path}")
-                        self.add_to_path(str(msbuild_path))
-                        return True
+        # Tìm theo Visual Studio instance metadata, sau đó cấu trúc thư mục / MSBuild standalone / .NET Framework
+        for instance in self.vs_locator.instances():
+            logger.info(f"Visual Studio {instance['version']} ({instance['product']}): {instance['path']}")
+
+        msbuild_candidates = self.discovery.get('msbuild')
+        if msbuild_candidates:
+            msbuild_path = msbuild_candidates[0].parent
+            logger.info(f"Tìm thấy MSBuild tại: {msbuild_path}")
+            self.add_to_path(str(msbuild_path))
+            return True
         
         return False
 
@@ -325,23 +3644,11 @@ class CppDepsInstaller:
         """Cấu hình MSYS2 PATH sau khi cài đặt Visual Studio Build Tools"""
         logger.info("Cấu hình MSYS2 PATH...")
 
-        # Các đường dẫn có thể có của MSYS2
-        possible_msys2_paths = [
-            "C:\\msys64",
-            "C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSYS2",
-            "C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSYS2",
-            "C:\\Program Files\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSYS2",
-            "C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSYS2"
-        ]
-
-        msys2_path = None
-        for path in possible_msys2_paths:
-            if os.path.exists(path):
-                msys2_path = path
-                logger.info(f"Tìm thấy MSYS2 tại: {msys2_path}")
-                break
+        msys2_info = self.discovery.get('msys2')
+        if msys2_info:
+            msys2_path = msys2_info['root']
+            logger.info(f"Tìm thấy MSYS2 tại: {msys2_path}")
 
-        if msys2_path:
             # Thêm MSYS2 bin vào PATH
             msys2_bin = os.path.join(msys2_path, "usr", "bin")
             mingw64_bin = os.path.join(msys2_path, "mingw64", "bin")
@@ -366,126 +3673,56 @@ class CppDepsInstaller:
         """Cấu hình Windows SDK PATH và environment variables"""
         logger.info("Cấu hình Windows SDK PATH...")
 
-        # Các đường dẫn có thể có của Windows SDK
-        possible_sdk_paths = [
-            "C:\\Program Files (x86)\\Windows Kits\\10",
-            "C:\\Program Files\\Windows Kits\\10",
-            "C:\\Program Files (x86)\\Microsoft SDKs\\Windows\\v10.0A",
-            "C:\\Program Files\\Microsoft SDKs\\Windows\\v10.0A"
-        ]
-
-        sdk_base_path = None
-        for path in possible_sdk_paths:
-            if os.path.exists(path):
-                sdk_base_path = path
-                logger.info(f"Tìm thấy Windows SDK tại: {sdk_base_path}")
-                break
+        sdk_info = self.discovery.get('windows_sdk')
+        if sdk_info:
+            sdk_base_path = sdk_info['root']
+            latest_version = sdk_info['version']
+            logger.info(f"Tìm thấy Windows SDK tại: {sdk_base_path} ({latest_version})")
 
-        if sdk_base_path:
-            # Tìm thư mục Include và Lib mới nhất
-            include_base = os.path.join(sdk_base_path, "Include")
-            lib_base = os.path.join(sdk_base_path, "Lib")
+            include_path = os.path.join(sdk_info['include_dir'], "ucrt")
+            lib_path = os.path.join(sdk_info['lib_dir'], "ucrt", "x64")
 
-            if os.path.exists(include_base):
-                # Tìm phiên bản SDK mới nhất
-                include_versions = [d for d in os.listdir(include_base) if os.path.isdir(os.path.join(include_base, d))]
-                if include_versions:
-                    latest_version = sorted(include_versions, reverse=True)[0]
-                    include_path = os.path.join(include_base, latest_version, "ucrt")
-                    lib_path = os.path.join(lib_base, latest_version, "ucrt", "x64") if os.path.exists(lib_base) else None
+            # Thêm include path vào environment
+            current_include = os.environ.get('INCLUDE', '')
+            if include_path not in current_include:
+                if current_include:
+                    new_include = f"{include_path};{current_include}"
+                else:
+                    new_include = include_path
+                os.environ['INCLUDE'] = new_include
+                self.set_environment_variable('INCLUDE', new_include)
+                logger.info(f"Đã thêm Windows SDK Include path: {include_path}")
+
+            # Thêm lib path vào environment
+            if lib_path and os.path.exists(lib_path):
+                current_lib = os.environ.get('LIB', '')
+                if lib_path not in current_lib:
+                    if current_lib:
+                        new_lib = f"{lib_path};{current_lib}"
+                    else:
+                        new_lib = lib_path
+                    os.environ['LIB'] = new_lib
+                    self.set_environment_variable('LIB', new_lib)
+                    logger.info(f"Đã thêm Windows SDK Lib path: {lib_path}")
 
-                    # Thêm include path vào environment
-                    current_include = os.environ.get('INCLUDE', '')
-                    if include_path not in current_include:
-                        if current_include:
-                            new_include = f"{include_path};{current_include}"
-                        else:
-                            new_include = include_path
-                        os.environ['INCLUDE'] = new_include
-                        self.set_environment_variable('INCLUDE', new_include)
-                        logger.info(f"Đã thêm Windows SDK Include path: {include_path}")
-
-                    # Thêm lib path vào environment
-                    if lib_path and os.path.exists(lib_path):
-                        current_lib = os.environ.get('LIB', '')
-                        if lib_path not in current_lib:
-                            if current_lib:
-                                new_lib = f"{lib_path};{current_lib}"
-                            else:
-                                new_lib = lib_path
-                            os.environ['LIB'] = new_lib
-                            self.set_environment_variable('LIB', new_lib)
-                            logger.info(f"Đã thêm Windows SDK Lib path: {lib_path}")
-
-                    # Thiết lập WindowsSDKDir
-                    self.set_environment_variable('WindowsSDKDir', sdk_base_path)
-                    self.set_environment_variable('WindowsSDKVersion', latest_version + "\\")
-
-                    logger.info("Đã cấu hình Windows SDK environment thành công")
-                    return True
+            # Thiết lập WindowsSDKDir
+            self.set_environment_variable('WindowsSDKDir', sdk_base_path)
+            self.set_environment_variable('WindowsSDKVersion', latest_version + "\\")
+
+            logger.info("Đã cấu hình Windows SDK environment thành công")
+            return True
 
         logger.warning("Không tìm thấy Windows SDK sau khi cài đặt")
         return False
 
-    def detect_windows_headers(self):
-        """Phát hiện các Windows header files quan trọng"""
+    def detect_windows_headers(self, headers=None):
+        """Phát hiện các Windows header files quan trọng (headers: danh sách header cần kiểm tra)"""
         logger.info("Kiểm tra Windows header files...")
 
-        # Các header files quan trọng cần kiểm tra
-        important_headers = [
-            'windows.h',
-            'winuser.h',
-            'wingdi.h',
-            'winbase.h',
-            'winnt.h',
-            'winsock2.h',
-            'ws2tcpip.h',
-            'shlobj.h',
-            'shellapi.h'
-        ]
-
-        # Tìm thư mục Include của Windows SDK
-        sdk_include_paths = [
-            "C:\\Program Files (x86)\\Windows Kits\\10\\Include",
-            "C:\\Program Files\\Windows Kits\\10\\Include",
-            "C:\\Program Files (x86)\\Microsoft SDKs\\Windows\\v10.0A\\Include",
-            "C:\\Program Files\\Microsoft SDKs\\Windows\\v10.0A\\Include"
-        ]
-
-        found_headers = []
-        missing_headers = []
-
-        for include_base in sdk_include_paths:
-            if os.path.exists(include_base):
-                # Tìm thư mục phiên bản mới nhất
-                try:
-                    versions = [d for d in os.listdir(include_base) if os.path.isdir(os.path.join(include_base, d))]
-                    if versions:
-                        latest_version = sorted(versions, reverse=True)[0]
-                        ucrt_path = os.path.join(include_base, latest_version, "ucrt")
-                        um_path = os.path.join(include_base, latest_version, "um")
-
-                        # Kiểm tra từng header
-                        for header in important_headers:
-                            header_found = False
-
-                            # Tìm trong ucrt
-                            if os.path.exists(os.path.join(ucrt_path, header)):
-                                found_headers.append(f"{header} (ucrt)")
-                                header_found = True
-
-                            # Tìm trong um (User Mode)
-                            elif os.path.exists(os.path.join(um_path, header)):
-                                found_headers.append(f"{header} (um)")
-                                header_found = True
-
-                            if not header_found:
-                                missing_headers.append(header)
-
-                        break  # Thoát sau khi tìm thấy phiên bản SDK
-                except Exception as e:
-                    logger.warning(f"Lỗi khi kiểm tra headers: {e}")
-                    continue
+        header_map = self.find_windows_headers(headers)
+        found_headers = [f"{header} ({info['version']}/{info['subdir']})"
+                         for header, info in header_map.items() if info]
+        missing_headers = [header for header, info in header_map.items() if not info]
 
         logger.info(f"Tìm thấy {len(found_headers)} Windows headers")
         for header in found_headers:
@@ -498,6 +3735,14 @@ class CppDepsInstaller:
 
         return len(missing_headers) == 0
 
+    def find_windows_headers(self, headers=None):
+        """Tìm headers trong mọi Windows SDK đã cài
+
+        Trả về {header: {'version', 'subdir', 'path'}} (None nếu không tìm thấy),
+        header có trong nhiều SDK thì lấy SDK mới nhất.
+        """
+        return self.discovery.find_windows_headers(headers or WINDOWS_HEADERS)
+
     def install_windows_sdk_standalone(self):
         """Cài đặt Windows SDK standalone nếu cần"""
         logger.info("Cài đặt Windows SDK standalone...")
@@ -513,6 +3758,7 @@ class CppDepsInstaller:
             # Thử cài đặt qua winget (nếu có)
             try:
                 self.run_command('winget install --id Microsoft.WindowsSDK.10.0.22621 --accept-package-agreements')
+                self.discovery.invalidate('windows_sdks')
                 logger.info("Đã cài đặt Windows SDK qua winget")
                 return True
             except:
@@ -521,6 +3767,7 @@ class CppDepsInstaller:
             # Thử cài đặt qua chocolatey (nếu có)
             try:
                 self.run_command('choco install windows-sdk-10.1 -y')
+                self.discovery.invalidate('windows_sdks')
                 logger.info("Đã cài đặt Windows SDK qua chocolatey")
                 return True
             except:
@@ -535,101 +3782,59 @@ class CppDepsInstaller:
         """Thiết lập include paths cho Visual C++ compiler"""
         logger.info("Thiết lập VC compiler include paths...")
 
-        # Tìm thư mục VC Tools
-        vc_base_paths = [
-            "C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSVC",
-            "C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSVC",
-            "C:\\Program Files\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSVC",
-            "C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSVC"
-        ]
-
-        for vc_base in vc_base_paths:
-            if os.path.exists(vc_base):
-                # Tìm thư mục phiên bản mới nhất
-                try:
-                    versions = [d for d in os.listdir(vc_base) if os.path.isdir(os.path.join(vc_base, d))]
-                    if versions:
-                        latest_version = sorted(versions, reverse=True)[0]
-                        vc_include = os.path.join(vc_base, latest_version, "include")
-
-                        if os.path.exists(vc_include):
-                            # Thêm VC include path
-                            current_include = os.environ.get('INCLUDE', '')
-                            if vc_include not in current_include:
-                                if current_include:
-                                    new_include = f"{vc_include};{current_include}"
-                                else:
-                                    new_include = vc_include
-                                os.environ['INCLUDE'] = new_include
-                                self.set_environment_variable('INCLUDE', new_include)
-                                logger.info(f"Đã thêm VC include path: {vc_include}")
-                                return True
-                except Exception as e:
-                    logger.warning(f"Lỗi khi thiết lập VC includes: {e}")
+        # Tìm thư mục VC Tools (từ Visual Studio instance metadata, phiên bản mới nhất trước)
+        for vc_tools_dir in self.discovery.get('msvc'):
+            try:
+                vc_include = os.path.join(vc_tools_dir, "include")
+
+                if os.path.exists(vc_include):
+                    # Thêm VC include path
+                    current_include = os.environ.get('INCLUDE', '')
+                    if vc_include not in current_include:
+                        if current_include:
+                            new_include = f"{vc_include};{current_include}"
+                        else:
+                            new_include = vc_include
+                        os.environ['INCLUDE'] = new_include
+                        self.set_environment_variable('INCLUDE', new_include)
+                        logger.info(f"Đã thêm VC include path: {vc_include}")
+                    return True
+            except Exception as e:
+                logger.warning(f"Lỗi khi thiết lập VC includes: {e}")
 
         logger.warning("Không tìm thấy VC Tools include path")
         return False
 
     def detect_existing_msys2(self):
         """Phát hiện MSYS2 đã có sẵn trên hệ thống"""
-        logger.info("Tìm kiếm MSYS2 có sẵn...")
-
-        # Kiểm tra trong PATH
-        if shutil.which('pacman'):
-            logger.info("MSYS2 đã có trong PATH")
-            return True
-
-        # Tìm kiếm trong các thư mục thông thường
-        search_paths = [
-            "C:\\msys64",
-            "C:\\msys2",
-            "C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSYS2",
-            "C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSYS2",
-            "C:\\Program Files\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSYS2",
-            "C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSYS2"
-        ]
-
-        for base_path in search_paths:
-            if os.path.exists(base_path):
-                pacman_path = os.path.join(base_path, "usr", "bin", "pacman.exe")
-                bash_path = os.path.join(base_path, "usr", "bin", "bash.exe")
-
-                if os.path.exists(pacman_path) and os.path.exists(bash_path):
-                    logger.info(f"Tìm thấy MSYS2 tại: {base_path}")
-
-                    # Kiểm tra xem MSYS2 có hoạt động không
-                    try:
-                        test_cmd = f'"{pacman_path}" --version'
-                        result = self.run_command(test_cmd, check=False)
-                        if result.returncode == 0:
-                            logger.info("MSYS2 hoạt động tốt")
+        logger.info("Tìm kiếm MSYS2 có sẵn...")
 
-                            # Thêm vào PATH
-                            msys2_bin = os.path.join(base_path, "usr", "bin")
-                            mingw64_bin = os.path.join(base_path, "mingw64", "bin")
-                            mingw32_bin = os.path.join(base_path, "mingw32", "bin")
+        # Kiểm tra trong PATH
+        if self.which('pacman'):
+            logger.info("MSYS2 đã có trong PATH")
+            return True
 
-                            if os.path.exists(msys2_bin):
-                                self.add_to_path(msys2_bin)
-                                logger.info(f"Đã thêm MSYS2 bin vào PATH: {msys2_bin}")
+        # Tìm kiếm trong các thư mục thông thường (pacman --version chỉ chạy một lần mỗi lần chạy)
+        msys2_info = self.discovery.get('msys2')
+        if not msys2_info:
+            logger.info("Không tìm thấy MSYS2 có sẵn")
+            return False
 
-                            if os.path.exists(mingw64_bin):
-                                self.add_to_path(mingw64_bin)
-                                logger.info(f"Đã thêm MinGW64 bin vào PATH: {mingw64_bin}")
+        base_path = msys2_info['root']
+        logger.info(f"Tìm thấy MSYS2 tại: {base_path}")
+        if not msys2_info['working']:
+            logger.warning(f"MSYS2 tại {base_path} không hoạt động đúng")
+            return False
 
-                            if os.path.exists(mingw32_bin):
-                                self.add_to_path(mingw32_bin)
-                                logger.info(f"Đã thêm MinGW32 bin vào PATH: {mingw32_bin}")
+        logger.info("MSYS2 hoạt động tốt")
 
-                            self.set_environment_variable('MSYS2_ROOT', base_path)
-                            return True
-                        else:
-                            logger.warning(f"MSYS2 tại {base_path} không hoạt động đúng")
-                    except Exception as e:
-                        logger.warning(f"Lỗi khi kiểm tra MSYS2: {e}")
+        # Thêm vào PATH
+        for bin_dir in msys2_info['bin_dirs']:
+            self.add_to_path(bin_dir)
+            logger.info(f"Đã thêm vào PATH: {bin_dir}")
 
-        logger.info("Không tìm thấy MSYS2 có sẵn")
-        return False
+        self.set_environment_variable('MSYS2_ROOT', base_path)
+        return True
 
     def install_msys2(self):
         """Cài đặt MSYS2 và MinGW packages"""
@@ -645,6 +3850,7 @@ class CppDepsInstaller:
                 install_cmd = f'"{msys2_installer}" --confirm-command --accept-messages --root "{msys2_install_path}"'
 
                 self.run_command(install_cmd)
+                self.discovery.invalidate('msys2_roots')
 
                 # Cập nhật package database và core packages
                 self.update_msys2_packages(msys2_install_path)
@@ -710,6 +3916,14 @@ class CppDepsInstaller:
             bash_exe = os.path.join(msys2_path, "usr", "bin", "bash.exe")
 
             if os.path.exists(bash_exe):
+                # Bật tải song song và chọn mirror nhanh nhất (opt-in)
+                if self.accelerate:
+                    self.accelerate_msys2(msys2_path)
+
+                # Dùng pacman cache chung nếu được cấu hình
+                if self.pacman_cache_dir:
+                    self.configure_pacman_cache(msys2_path)
+
                 # Khởi tạo MSYS2 trước
                 if not self.initialize_msys2(msys2_path):
                     logger.warning("Khởi tạo MSYS2 thất bại, thử tiếp tục...")
@@ -774,23 +3988,9 @@ class CppDepsInstaller:
                 available_packages = self.check_available_packages(msys2_path)
                 logger.info(f"Tìm thấy {len(available_packages)} packages mẫu")
 
-                # Danh sách MinGW packages cần thiết
-                mingw_packages = [
-                    "mingw-w64-x86_64-gcc",           # GCC compiler
-                    "mingw-w64-x86_64-g++",           # G++ compiler
-                    "mingw-w64-x86_64-gdb",           # GNU Debugger
-                    "mingw-w64-x86_64-make",          # GNU Make
-                    "mingw-w64-x86_64-cmake",         # CMake for MinGW
-                    "mingw-w64-x86_64-ninja",         # Ninja build system
-                    "mingw-w64-x86_64-pkg-config",    # pkg-config
-                    "mingw-w64-x86_64-toolchain",     # Complete toolchain
-                    "mingw-w64-x86_64-libtool",       # GNU libtool
-                    "mingw-w64-x86_64-autotools",     # Autotools
-                ]
-
                 # Thử cài đặt từng package với error handling tốt hơn
                 installed_count = 0
-                for package in mingw_packages:
+                for package in MINGW_PACKAGES:
                     try:
                         logger.info(f"Cài đặt {package}...")
                         install_cmd = f'"{bash_exe}" -lc "pacman -S --noconfirm --needed {package}"'
@@ -809,14 +4009,7 @@ class CppDepsInstaller:
                         continue
 
                 # Cài đặt các development libraries bổ sung
-                dev_packages = [
-                    "mingw-w64-x86_64-zlib",          # zlib library
-                    "mingw-w64-x86_64-openssl",       # OpenSSL library
-                    "mingw-w64-x86_64-libiconv",      # iconv library
-                    "mingw-w64-x86_64-gettext",       # gettext library
-                ]
-
-                for package in dev_packages:
+                for package in MINGW_DEV_PACKAGES:
                     try:
                         logger.info(f"Cài đặt {package}...")
                         install_cmd = f'"{bash_exe}" -lc "pacman -S --noconfirm --needed {package}"'
@@ -833,6 +4026,8 @@ class CppDepsInstaller:
                         continue
 
                 logger.info(f"Đã hoàn thành cài đặt MinGW packages ({installed_count} packages)")
+                if installed_count:
+                    self.discovery.invalidate('cmake', 'ninja')
 
             else:
                 logger.error(f"Không tìm thấy bash.exe tại {bash_exe}")
@@ -844,835 +4039,453 @@ class CppDepsInstaller:
         """Sửa chữa MSYS2 sau khi cài đặt để đảm bảo hoạt động tốt"""
         logger.info("Sửa chữa MSYS2 environment...")
 
-        try:
-            bash_exe = os.path.join(msys2_path, "usr", "bin", "bash.exe")
-
-            if os.path.exists(bash_exe):
-                # Đảm bảo database được cập nhật
-                logger.info("Cập nhật package database...")
-                update_cmd = f'"{bash_exe}" -lc "pacman -Sy --noconfirm"'
-                self.run_command(update_cmd, check=False)
-
-                # Kiểm tra và sửa chữa nếu cần
-                logger.info("Kiểm tra MSYS2 health...")
-                check_cmd = f'"{bash_exe}" -lc "pacman -Q"'
-                result = self.run_command(check_cmd, check=False)
-
-                if result.returncode == 0:
-                    logger.info("MSYS2 hoạt động tốt")
-                else:
-                    logger.warning("MSYS2 có thể cần sửa chữa")
-                    # Thử repair
-                    repair_cmd = f'"{bash_exe}" -lc "pacman -Scc --noconfirm"'
-                    self.run_command(repair_cmd, check=False)
-
-        except Exception as e:
-            logger.error(f"Lỗi khi sửa chữa MSYS2: {e}")
-
-    def ensure_mingw_packages(self):
-        """Đảm bảo MinGW packages được cài đặt trong MSYS2 có sẵn"""
-        logger.info("Đảm bảo MinGW packages được cài đặt...")
-
-        # Tìm đường dẫn MSYS2
-        msys2_paths = [
-            'C:\\msys64',
-            'C:\\msys2',
-            'C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSYS2',
-            'C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSYS2'
-        ]
-
-        msys2_path = None
-        for path in msys2_paths:
-            if os.path.exists(path) and os.path.exists(os.path.join(path, "usr", "bin", "bash.exe")):
-                msys2_path = path
-                logger.info(f"Tìm thấy MSYS2 tại: {msys2_path}")
-                break
-
-        if msys2_path:
-            # Cập nhật MSYS2 packages trước
-            self.update_msys2_packages(msys2_path)
-
-            # Cài đặt MinGW packages
-            self.install_mingw_packages(msys2_path)
-
-            # Sửa chữa MSYS2
-            self.fix_msys2_after_installation(msys2_path)
-
-            # Đảm bảo PATH được cập nhật
-            msys2_bin = os.path.join(msys2_path, "usr", "bin")
-            mingw64_bin = os.path.join(msys2_path, "mingw64", "bin")
-
-            if os.path.exists(msys2_bin):
-                self.add_to_path(msys2_bin)
-            if os.path.exists(mingw64_bin):
-                self.add_to_path(mingw64_bin)
-
-            self.set_environment_variable('MSYS2_ROOT', msys2_path)
-        else:
-            logger.warning("Không tìm thấy MSYS2 để cài đặt MinGW packages")
-
-    def install_linux_compiler(self):
-        """Cài đặt compiler trên Linux"""
-        logger.info("Cài đặt GCC và các công cụ cần thiết trên Linux...")
-        
-        # Phát hiện package manager
-        if shutil.which('apt'):
-            # Ubuntu/Debian
-            commands = [
-                'apt update',
-                'apt install -y build-essential gcc g++ gdb make',
-                'apt install -y cmake ninja-build',
-                'apt install -y git curl wget'
-            ]
-            for cmd in commands:
-                try:
-                    self.run_command(f'sudo {cmd}')
-                except:
-                    logger.warning(f"Lỗi khi chạy: {cmd}")
-                    
-        elif shutil.which('yum'):
-            # CentOS/RHEL/Fedora
-            commands = [
-                'yum groupinstall -y "Development Tools"',
-                'yum install -y gcc gcc-c++ gdb make cmake ninja-build',
-                'yum install -y git curl wget'
-            ]
-            for cmd in commands:
-                try:
-                    self.run_command(f'sudo {cmd}')
-                except:
-                    logger.warning(f"Lỗi khi chạy: {cmd}")
-                    
-        elif shutil.which('pacman'):
-            # Arch Linux
-            commands = [
-                'pacman -Syu --noconfirm',
-                'pacman -S --noconfirm base-devel gcc gdb make cmake ninja',
-                'pacman -S --noconfirm git curl wget'
-            ]
-            for cmd in commands:
-                try:
-                    self.run_command(f'sudo {cmd}')
-                except:
-                    logger.warning(f"Lỗi khi chạy: {cmd}")
-
-    def install_macos_compiler(self):
-        """Cài đặt compiler trên macOS"""
-        logger.info("Cài đặt Xcode Command Line Tools và Homebrew...")
-        
-        # Cài đặt Xcode Command Line Tools
-        try:
-            self.run_command('xcode-select --install')
-        except:
-            logger.info("Xcode Command Line Tools có thể đã được cài đặt")
-        
-        # Cài đặt Homebrew
-        if not shutil.which('brew'):
-            homebrew_install_script = '/bin/bash -c "$(curl -fsSL https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)"'
-            try:
-                self.run_command(homebrew_install_script)
-            except:
-                logger.warning("Không thể cài đặt Homebrew tự động")
-        
-        # Cài đặt các package cần thiết
-        if shutil.which('brew'):
-            packages = ['cmake', 'ninja', 'llvm', 'gdb']
-            for package in packages:
-                try:
-                    self.run_command(f'brew install {package}')
-                except:
-                    logger.warning(f"Không thể cài đặt {package}")
-
-    def install_cmake(self):
-        """Cài đặt CMake"""
-        logger.info("Cài đặt CMake...")
-        
-        if self.system in self.tools_urls['cmake']:
-            cmake_url = self.tools_urls['cmake'][self.system]
-            cmake_archive = Path(self.temp_dir) / f"cmake.{'zip' if self.system == 'windows' else 'tar.gz'}"
-            
-            if self.download_file(cmake_url, cmake_archive):
-                cmake_dir = self.install_dir / 'cmake'
-                cmake_dir.mkdir(parents=True, exist_ok=True)
-                
-                if self.extract_archive(str(cmake_archive), str(cmake_dir)):
-                    # Tìm thư mục cmake sau khi giải nén
-                    for item in cmake_dir.iterdir():
-                        if item.is_dir() and 'cmake' in item.name.lower():
-                            cmake_bin = item / 'bin'
-                            if cmake_bin.exists():
-                                self.add_to_path(str(cmake_bin))
-                                logger.info("Đã cài đặt CMake thành công")
-                                return True
-        
-        logger.warning("Không thể cài đặt CMake")
-        return False
-
-    def install_ninja(self):
-        """Cài đặt Ninja"""
-        logger.info("Cài đặt Ninja...")
-        
-        if self.system in self.tools_urls['ninja']:
-            ninja_url = self.tools_urls['ninja'][self.system]
-            ninja_archive = Path(self.temp_dir) / "ninja.zip"
-            
-            if self.download_file(ninja_url, ninja_archive):
-                ninja_dir = self.install_dir / 'ninja'
-                ninja_dir.mkdir(parents=True, exist_ok=True)
-                
-                if self.extract_archive(str(ninja_archive), str(ninja_dir)):
-                    self.add_to_path(str(ninja_dir))
-                    logger.info("Đã cài đặt Ninja thành công")
-                    return True
-        
-        logger.warning("Không thể cài đặt Ninja")
-        return False
-
-    def install_vcpkg(self):
-        """Cài đặt vcpkg package manager"""
-        logger.info("Cài đặt vcpkg...")
-        
-        vcpkg_dir = self.install_dir / 'vcpkg'
-        
-        try:
-            # Clone vcpkg repository
-            self.run_command(f'git clone {self.tools_urls["vcpkg"]["all"]} "{vcpkg_dir}"')
-            
-            # Build vcpkg
-            if self.system == 'windows':
-                bootstrap_script = vcpkg_dir / 'bootstrap-vcpkg.bat'
-                self.run_command(f'"{bootstrap_script}"')
-            else:
-                bootstrap_script = vcpkg_dir / 'bootstrap-vcpkg.sh'
-                self.run_command(f'chmod +x "{bootstrap_script}" && "{bootstrap_script}"')
-            
-            # Integrate vcpkg
-            vcpkg_exe = vcpkg_dir / ('vcpkg.exe' if self.system == 'windows' else 'vcpkg')
-            self.run_command(f'"{vcpkg_exe}" integrate install')
-            
-            # Add to PATH
-            self.add_to_path(str(vcpkg_dir))
-            
-            # Set environment variable
-            self.set_environment_variable('VCPKG_ROOT', str(vcpkg_dir))
-            
-            logger.info("Đã cài đặt vcpkg thành công")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Lỗi khi cài đặt vcpkg: {e}")
-            return False
-
-    def install_conan(self):
-        """Cài đặt Conan package manager"""
-        logger.info("Cài đặt Conan...")
-        
-        try:
-            # Cài đặt Conan qua pip
-            self.run_command(f'{sys.executable} -m pip install conan')
-            
-            # Tạo profile mặc định
-            self.run_command('conan profile detect --force')
-            
-            logger.info("Đã cài đặt Conan thành công")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Lỗi khi cài đặt Conan: {e}")
-            return False
-
-    def add_to_path(self, path_to_add):
-        """Thêm đường dẫn vào PATH environment variable"""
-        logger.info(f"Thêm vào PATH: {path_to_add}")
-        
-        try:
-            if self.system == 'windows':
-                self.add_to_windows_path(path_to_add)
-            else:
-                self.add_to_unix_path(path_to_add)
-        except Exception as e:
-            logger.error(f"Lỗi khi thêm vào PATH: {e}")
-
-    def add_to_windows_path(self, path_to_add):
-        """Thêm đường dẫn vào PATH trên Windows"""
-        try:
-            # Thêm vào User PATH
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                               'Environment', 0, winreg.KEY_ALL_ACCESS)
-            try:
-                current_path, _ = winreg.QueryValueEx(key, 'PATH')
-            except FileNotFoundError:
-                current_path = ''
-            
-            if path_to_add not in current_path:
-                new_path = f"{current_path};{path_to_add}" if current_path else path_to_add
-                winreg.SetValueEx(key, 'PATH', 0, winreg.REG_EXPAND_SZ, new_path)
-                logger.info(f"Đã thêm {path_to_add} vào User PATH")
-            
-            winreg.CloseKey(key)
-            
-            # Thông báo cho system về thay đổi environment
-            import ctypes
-            ctypes.windll.user32.SendMessageW(0xFFFF, 0x001A, 0, 'Environment')
-            
-        except Exception as e:
-            logger.error(f"Lỗi khi cập nhật Windows PATH: {e}")
-
-    def add_to_unix_path(self, path_to_add):
-        """Thêm đường dẫn vào PATH trên Unix/Linux/macOS"""
-        shell_config_files = [
-            Path.home() / '.bashrc',
-            Path.home() / '.bash_profile',
-            Path.home() / '.zshrc',
-            Path.home() / '.profile'
-        ]
-        
-        path_export = f'export PATH="{path_to_add}:$PATH"'
-        
-        for config_file in shell_config_files:
-            if config_file.exists():
-                try:
-                    with open(config_file, 'r') as f:
-                        content = f.read()
-                    
-                    if path_to_add not in content:
-                        with open(config_file, 'a') as f:
-                            f.write(f'\n# Added by CppDepsInstaller\n{path_export}\n')
-                        logger.info(f"Đã thêm PATH vào {config_file}")
-                except Exception as e:
-                    logger.error(f"Lỗi khi cập nhật {config_file}: {e}")
-
-    def set_environment_variable(self, name, value):
-        """Thiết lập environment variable"""
-        logger.info(f"Thiết lập biến môi trường: {name}={value}")
-        
-        if self.system == 'windows':
-            try:
-                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                                   'Environment', 0, winreg.KEY_ALL_ACCESS)
-                winreg.SetValueEx(key, name, 0, winreg.REG_SZ, value)
-                winreg.CloseKey(key)
-                
-                # Thông báo cho system
-                import ctypes
-                ctypes.windll.user32.SendMessageW(0xFFFF, 0x001A, 0, 'Environment')
-                
-            except Exception as e:
-                logger.error(f"Lỗi khi thiết lập biến môi trường: {e}")
-        else:
-            # Unix/Linux/macOS
-            shell_config_files = [
-                Path.home() / '.bashrc',
-                Path.home() / '.bash_profile',
-                Path.home() / '.zshrc',
-                Path.home() / '.profile'
-            ]
-            
-            env_export = f'export {name}="{value}"'
-            
-            for config_file in shell_config_files:
-                if config_file.exists():
-                    try:
-                        with open(config_file, 'r') as f:
-                            content = f.read()
-                        
-                        if f'{name}=' not in content:
-                            with open(config_file, 'a') as f:
-                                f.write(f'\n# Added by CppDepsInstaller\n{env_export}\n')
-                    except Exception as e:
-                        logger.error(f"Lỗi khi cập nhật {config_file}: {e}")
-
-    def install_additional_tools(self):
-        """Cài đặt các công cụ bổ sung"""
-        logger.info("Cài đặt các công cụ bổ sung...")
-        
-        # Cài đặt pkg-config
-        if self.system == 'windows':
-            # Tải pkg-config cho Windows
-            pkgconfig_url = "https://download.gnome.org/binaries/win32/dependencies/pkg-config_0.26-1_win32.zip"
-            pkgconfig_archive = Path(self.temp_dir) / "pkg-config.zip"
-            
-            if self.download_file(pkgconfig_url, pkgconfig_archive):
-                pkgconfig_dir = self.install_dir / 'pkg-config'
-                pkgconfig_dir.mkdir(parents=True, exist_ok=True)
-                
-                if self.extract_archive(str(pkgconfig_archive), str(pkgconfig_dir)):
-                    self.add_to_path(str(pkgconfig_dir / 'bin'))
-        
-        # Cài đặt Git (nếu chưa có)
-        if not shutil.which('git'):
-            if self.system == 'windows':
-                git_url = "https://github.com/git-for-windows/git/releases/latest/download/Git-2.42.0.2-64-bit.exe"
-                git_installer = Path(self.temp_dir) / "git-installer.exe"
-                
-                if self.download_file(git_url, git_installer):
-                    try:
-                        self.run_command(f'"{git_installer}" /VERYSILENT /NORESTART')
-                        logger.info("Đã cài đặt Git")
-                    except:
-                        logger.warning("Không thể cài đặt Git tự động")
-
-    def verify_installation(self):
-        """Kiểm tra các công cụ đã được cài đặt"""
-        logger.info("Kiểm tra cài đặt...")
-
-        # Hiển thị thông tin debug về PATH
-        self.debug_path_info()
-
-        tools_to_check = ['gcc', 'g++', 'cmake', 'ninja', 'git']
-        if self.system == 'windows':
-            tools_to_check.extend(['cl', 'vcpkg', 'msbuild', 'mingw32-make'])
-            logger.info("Kiểm tra Windows development environment...")
+        try:
+            bash_exe = os.path.join(msys2_path, "usr", "bin", "bash.exe")
 
-        installed_tools = []
-        missing_tools = []
+            if os.path.exists(bash_exe):
+                # Đảm bảo database được cập nhật
+                logger.info("Cập nhật package database...")
+                update_cmd = f'"{bash_exe}" -lc "pacman -Sy --noconfirm"'
+                self.run_command(update_cmd, check=False)
 
-        for tool in tools_to_check:
-            logger.info(f"Đang kiểm tra {tool}...")
-            tool_path = shutil.which(tool)
+                # Kiểm tra và sửa chữa nếu cần
+                logger.info("Kiểm tra MSYS2 health...")
+                check_cmd = f'"{bash_exe}" -lc "pacman -Q"'
+                result = self.run_command(check_cmd, check=False)
 
-            if tool_path:
-                logger.info(f"  Tìm thấy {tool} tại: {tool_path}")
-                try:
-                    # Sử dụng command phù hợp cho từng tool
-                    version_cmd = self.get_version_command(tool)
-                    result = self.run_command(version_cmd, check=False)
+                if result.returncode == 0:
+                    logger.info("MSYS2 hoạt động tốt")
+                else:
+                    logger.warning("MSYS2 có thể cần sửa chữa")
+                    # Thử repair
+                    repair_cmd = f'"{bash_exe}" -lc "pacman -Scc --noconfirm"'
+                    self.run_command(repair_cmd, check=False)
 
-                    if result.returncode == 0:
-                        installed_tools.append(tool)
-                        logger.info(f"✓ {tool} đã được cài đặt")
-                        # Hiển thị version info (dòng đầu tiên)
-                        version_lines = result.stdout.strip().split('\n')
-                        if version_lines:
-                            logger.info(f"  Version: {version_lines[0][:100]}...")
-                    else:
-                        logger.warning(f"  {tool} tồn tại nhưng không thể chạy (return code: {result.returncode})")
-                        missing_tools.append(tool)
-                except Exception as e:
-                    logger.warning(f"  Lỗi khi kiểm tra {tool}: {e}")
-                    missing_tools.append(tool)
-            else:
-                logger.warning(f"  Không tìm thấy {tool} trong PATH")
-                # Thử tìm thủ công trong các thư mục thông thường
-                manual_path = self.manual_tool_check(tool)
-                if manual_path:
-                    logger.info(f"  Đã thêm {tool} vào PATH từ: {manual_path}")
-                    # Thử kiểm tra lại sau khi thêm vào PATH
-                    tool_path = shutil.which(tool)
-                    if tool_path:
-                        logger.info(f"  Bây giờ tìm thấy {tool} tại: {tool_path}")
-                        try:
-                            version_cmd = self.get_version_command(tool)
-                            result = self.run_command(version_cmd, check=False)
-                            if result.returncode == 0:
-                                installed_tools.append(tool)
-                                logger.info(f"✓ {tool} đã được cài đặt")
-                                continue
-                        except:
-                            pass
-
-                missing_tools.append(tool)
-
-        # Kiểm tra Windows headers và libraries (chỉ trên Windows)
-        if self.system == 'windows':
-            logger.info("Kiểm tra Windows SDK và headers...")
-            headers_ok = self.detect_windows_headers()
-            if headers_ok:
-                logger.info("✓ Windows headers có sẵn")
-            else:
-                logger.warning("⚠️ Một số Windows headers có thể thiếu")
-                logger.info("Gợi ý: Cài đặt Windows SDK mới nhất qua Visual Studio Installer")
+        except Exception as e:
+            logger.error(f"Lỗi khi sửa chữa MSYS2: {e}")
 
-            # Thiết lập VC compiler includes
-            self.setup_vc_compiler_includes()
+    def ensure_mingw_packages(self):
+        """Đảm bảo MinGW packages được cài đặt trong MSYS2 có sẵn"""
+        logger.info("Đảm bảo MinGW packages được cài đặt...")
 
-        logger.info(f"Đã cài đặt: {', '.join(installed_tools)}")
-        if missing_tools:
-            logger.warning(f"Chưa cài đặt hoặc không tìm thấy: {', '.join(missing_tools)}")
-            logger.info("Gợi ý: Kiểm tra PATH environment variable và thử restart terminal")
+        # Tìm đường dẫn MSYS2
+        msys2_info = self.discovery.get('msys2')
+        msys2_path = msys2_info['root'] if msys2_info else None
 
-        return len(missing_tools) == 0
+        if msys2_path:
+            logger.info(f"Tìm thấy MSYS2 tại: {msys2_path}")
 
-    def debug_path_info(self):
-        """Hiển thị thông tin debug về PATH và environment"""
-        logger.info("=== DEBUG PATH INFORMATION ===")
+            # Cập nhật MSYS2 packages trước
+            self.update_msys2_packages(msys2_path)
 
-        # Hiển thị PATH hiện tại
-        current_path = os.environ.get('PATH', '')
-        path_dirs = current_path.split(os.pathsep)
-        logger.info(f"PATH có {len(path_dirs)} thư mục:")
-        for i, path_dir in enumerate(path_dirs[:10]):  # Chỉ hiển thị 10 thư mục đầu
-            logger.info(f"  [{i+1}] {path_dir}")
+            # Cài đặt MinGW packages
+            self.install_mingw_packages(msys2_path)
 
-        if len(path_dirs) > 10:
-            logger.info(f"  ... và {len(path_dirs) - 10} thư mục khác")
+            # Sửa chữa MSYS2
+            self.fix_msys2_after_installation(msys2_path)
 
-        # Kiểm tra các biến môi trường quan trọng
-        env_vars = ['MSYS2_ROOT', 'MSBuildPath', 'VCPKG_ROOT']
-        for var in env_vars:
-            value = os.environ.get(var, 'NOT SET')
-            logger.info(f"  {var}: {value}")
+            # Đảm bảo PATH được cập nhật
+            msys2_bin = os.path.join(msys2_path, "usr", "bin")
+            mingw64_bin = os.path.join(msys2_path, "mingw64", "bin")
 
-        # Kiểm tra các thư mục MSYS2/MinGW thông thường
-        common_paths = [
-            'C:\\msys64\\usr\\bin',
-            'C:\\msys64\\mingw64\\bin',
-            'C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSVC',
-            'C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSVC'
-        ]
+            if os.path.exists(msys2_bin):
+                self.add_to_path(msys2_bin)
+            if os.path.exists(mingw64_bin):
+                self.add_to_path(mingw64_bin)
 
-        logger.info("Kiểm tra các thư mục thông thường:")
-        for path in common_paths:
-            exists = os.path.exists(path)
-            logger.info(f"  {'✓' if exists else '✗'} {path}")
+            self.set_environment_variable('MSYS2_ROOT', msys2_path)
+        else:
+            logger.warning("Không tìm thấy MSYS2 để cài đặt MinGW packages")
 
-        logger.info("=== END DEBUG INFO ===")
+    def rank_msys2_mirrors(self, msys2_path):
+        """Sắp xếp mirror của MSYS2 theo độ trễ đo được"""
+        import concurrent.futures
+        import urllib.parse
+        mirrorlists = glob.glob(os.path.join(msys2_path, 'etc', 'pacman.d', 'mirrorlist.*'))
+        mirrorlists = [path for path in mirrorlists if not path.endswith(CONFIG_BACKUP_SUFFIX)]
+        if not mirrorlists:
+            logger.warning("Không tìm thấy MSYS2 mirrorlist")
+            return False
 
-    def get_version_command(self, tool):
-        """Trả về command phù hợp để kiểm tra version của tool"""
-        version_commands = {
-            'gcc': 'gcc --version',
-            'g++': 'g++ --version',
-            'cmake': 'cmake --version',
-            'ninja': 'ninja --version',
-            'git': 'git --version',
-            'cl': 'cl 2>&1 | findstr "Microsoft"',  # MSVC compiler - kiểm tra output
-            'vcpkg': 'vcpkg version',
-            'msbuild': 'msbuild -version',
-            'mingw32-make': 'mingw32-make --version'
-        }
+        # Đọc tất cả mirror, mỗi host chỉ đo một lần
+        contents = {}
+        hosts = {}
+        for mirrorlist in mirrorlists:
+            with open(mirrorlist, 'r') as f:
+                contents[mirrorlist] = f.read()
+            for line in contents[mirrorlist].splitlines():
+                url = line.strip().lstrip('#').strip()
+                if url.startswith('Server'):
+                    url = url.split('=', 1)[1].strip()
+                    hosts.setdefault(urllib.parse.urlparse(url).hostname, url)
+
+        logger.info(f"Đo độ trễ của {len(hosts)} mirror...")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            latencies = dict(zip(hosts, executor.map(self.measure_mirror_latency, hosts.values())))
+
+        for host, latency in sorted(latencies.items(), key=lambda item: item[1] if item[1] is not None else float('inf')):
+            logger.info(f"  {host}: {'không kết nối được' if latency is None else f'{latency * 1000:.0f} ms'}")
+
+        def sort_key(server_line):
+            url = server_line.split('=', 1)[1].strip()
+            latency = latencies.get(urllib.parse.urlparse(url).hostname)
+            return latency if latency is not None else float('inf')
+
+        for mirrorlist, content in contents.items():
+            lines = content.splitlines()
+            servers = [line.strip() for line in lines if line.strip().startswith('Server')]
+            others = [line for line in lines
+                      if not line.strip().startswith('Server') and line != MIRRORLIST_RANKED_MARKER]
+            ranked = sorted(servers, key=sort_key)
+            if ranked == servers:
+                continue
+            new_content = '\n'.join(others + [MIRRORLIST_RANKED_MARKER] + ranked) + '\n'
+            self.write_config_file(mirrorlist, new_content)
+
+        logger.info("Đã sắp xếp MSYS2 mirrors theo độ trễ")
+        return True
+
+    def accelerate_msys2(self, msys2_path):
+        """Tăng tốc pacman của MSYS2: tải song song và chọn mirror nhanh nhất"""
+        logger.info("Tăng tốc MSYS2 pacman...")
+        try:
+            self.enable_pacman_parallel_downloads(os.path.join(msys2_path, 'etc', 'pacman.conf'))
+            self.rank_msys2_mirrors(msys2_path)
+        except Exception as e:
+            logger.warning(f"Không thể tăng tốc MSYS2 pacman: {e}")
 
-        return version_commands.get(tool, f'{tool} --version')
 
-    def check_tool_with_special_handling(self, tool, tool_path):
-        """Kiểm tra tool với xử lý đặc biệt cho từng loại"""
-        try:
-            if tool == 'cl':
-                # MSVC compiler - thử compile một file trống để kiểm tra
-                result = self.run_command(f'"{tool_path}" /?', check=False)
-                return result.returncode == 0
-            elif tool in ['gcc', 'g++', 'mingw32-make']:
-                # MinGW tools - kiểm tra --version
-                result = self.run_command(f'"{tool_path}" --version', check=False)
-                return result.returncode == 0
-            elif tool == 'cmake':
-                # CMake - kiểm tra --version
-                result = self.run_command(f'"{tool_path}" --version', check=False)
-                return result.returncode == 0
-            elif tool == 'msbuild':
-                # MSBuild - kiểm tra -version
-                result = self.run_command(f'"{tool_path}" -version', check=False)
-                return result.returncode == 0
-            elif tool == 'vcpkg':
-                # vcpkg - kiểm tra version
-                result = self.run_command(f'"{tool_path}" version', check=False)
-                return result.returncode == 0
-            else:
-                # Default: thử --version
-                result = self.run_command(f'"{tool_path}" --version', check=False)
-                return result.returncode == 0
-        except:
-            return False
+class LinuxCppDepsInstaller(CppDepsInstaller):
+    """Installer cho Linux: apt, dnf, yum, pacman, zypper"""
 
-    def manual_tool_check(self, tool):
-        """Kiểm tra thủ công tool bằng cách tìm trong các đường dẫn thông thường"""
-        logger.info(f"Tìm kiếm {tool} thủ công...")
+    platform_system = 'linux'
 
-        # Các đường dẫn có thể có tool
-        search_paths = []
-
-        if self.system == 'windows':
-            search_paths = [
-                # MSYS2/MinGW paths
-                'C:\\msys64\\usr\\bin',
-                'C:\\msys64\\mingw64\\bin',
-                'C:\\msys64\\mingw32\\bin',
-                'C:\\msys64\\clang64\\bin',
-                'C:\\msys64\\ucrt64\\bin',
-
-                # Git for Windows (có MinGW)
-                'C:\\Program Files\\Git\\bin',
-                'C:\\Program Files\\Git\\mingw64\\bin',
-                'C:\\Program Files\\Git\\usr\\bin',
-                'C:\\Program Files (x86)\\Git\\bin',
-                'C:\\Program Files (x86)\\Git\\mingw64\\bin',
-                'C:\\Program Files (x86)\\Git\\usr\\bin',
-
-                # CMake
-                'C:\\Program Files\\CMake\\bin',
-                'C:\\Program Files (x86)\\CMake\\bin',
-
-                # Ninja
-                'C:\\Program Files\\ninja',
-                'C:\\ninja',
-
-                # MSBuild
-                'C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\MSBuild\\Current\\Bin',
-                'C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\MSBuild\\Current\\Bin',
-                'C:\\Program Files\\Microsoft Visual Studio\\2019\\BuildTools\\MSBuild\\Current\\Bin',
-                'C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\BuildTools\\MSBuild\\Current\\Bin',
-
-                # MSVC Compiler
-                'C:\\Program Files\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSVC',
-                'C:\\Program Files (x86)\\Microsoft Visual Studio\\2022\\BuildTools\\VC\\Tools\\MSVC',
-                'C:\\Program Files\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSVC',
-                'C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\BuildTools\\VC\\Tools\\MSVC',
-
-                # vcpkg
-                'C:\\vcpkg',
-                'C:\\Program Files\\vcpkg',
-
-                # LLVM/Clang
-                'C:\\Program Files\\LLVM\\bin',
-                'C:\\Program Files (x86)\\LLVM\\bin',
-            ]
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
 
-        for base_path in search_paths:
-            if os.path.exists(base_path):
-                # Một số tool có thể không có .exe extension
-                possible_names = [f'{tool}.exe', f'{tool}.bat', f'{tool}.cmd', tool]
-
-                for tool_name in possible_names:
-                    tool_path = os.path.join(base_path, tool_name)
-                    if os.path.exists(tool_path):
-                        logger.info(f"Tìm thấy {tool} tại: {tool_path}")
-
-                        # Kiểm tra xem tool có hoạt động không
-                        if self.check_tool_with_special_handling(tool, tool_path):
-                            logger.info(f"  {tool} hoạt động tốt")
-                            # Thử thêm vào PATH tạm thời
-                            self.add_to_path(base_path)
-                            return tool_path
-                        else:
-                            logger.warning(f"  {tool} tồn tại nhưng không hoạt động")
-
-        # Tìm kiếm đệ quy trong các thư mục con cho MSVC
-        if tool == 'cl':
-            logger.info("Tìm kiếm MSVC compiler (cl.exe) đệ quy...")
-            msvc_base_paths = [
-                'C:\\Program Files\\Microsoft Visual Studio',
-                'C:\\Program Files (x86)\\Microsoft Visual Studio'
-            ]
+        # Cache danh sách package đã cài đặt (theo package manager)
+        self.installed_linux_packages = {}
 
-            for base_path in msvc_base_paths:
-                if os.path.exists(base_path):
-                    for root, dirs, files in os.walk(base_path):
-                        if 'cl.exe' in files:
-                            cl_path = os.path.join(root, 'cl.exe')
-                            logger.info(f"Tìm thấy cl.exe tại: {cl_path}")
-                            if self.check_tool_with_special_handling('cl', cl_path):
-                                cl_dir = os.path.dirname(cl_path)
-                                self.add_to_path(cl_dir)
-                                return cl_path
+    def install_platform_compiler(self):
+        """Cài đặt build-essential/gcc qua package manager"""
+        self.install_linux_compiler()
 
-        logger.warning(f"Không tìm thấy {tool} trong các đường dẫn thông thường")
+    def enable_dnf_parallel_downloads(self, dnf_conf='/etc/dnf/dnf.conf'):
+        """Bật max_parallel_downloads cho dnf"""
+        try:
+            with open(dnf_conf, 'r') as f:
+                content = f.read()
+        except FileNotFoundError:
+            content = ''
+
+        new_content = self.set_config_option(content, 'main', 'max_parallel_downloads',
+                                             self.parallel_downloads, separator='=')
+        if new_content != content:
+            self.write_config_file(dnf_conf, new_content)
+        logger.info(f"Đã bật max_parallel_downloads={self.parallel_downloads} cho dnf")
+        return True
+
+    def accelerate_linux_package_manager(self, manager):
+        """Tăng tốc Linux package manager bằng cách tải song song (pacman, dnf)"""
+        if manager not in ('dnf', 'pacman'):
+            # apt mặc định đã tải song song giữa các host và pipeline, không có option cho một host;
+            # yum và zypper cũng không có option tải song song
+            logger.info(f"{manager} không có option tải song song, bỏ qua --accelerate")
+            return
+        logger.info(f"Tăng tốc {manager}...")
+        try:
+            if manager == 'dnf':
+                self.enable_dnf_parallel_downloads()
+            elif manager == 'pacman':
+                self.enable_pacman_parallel_downloads('/etc/pacman.conf')
+        except Exception as e:
+            logger.warning(f"Không thể tăng tốc {manager}: {e}")
+
+    def read_dpkg_status(self, status_path='/var/lib/dpkg/status'):
+        """Đọc danh sách package đã cài đặt từ dpkg status database"""
+        installed = set()
+        package = None
+        status = ''
+
+        with open(status_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('Package:'):
+                    package = line[8:].strip()
+                elif line.startswith('Status:'):
+                    status = line[7:].strip()
+                elif not line.strip():
+                    # Kết thúc một stanza
+                    if package and status.endswith(' installed'):
+                        installed.add(package)
+                    package = None
+                    status = ''
+
+        if package and status.endswith(' installed'):
+            installed.add(package)
+
+        return installed
+
+    def read_pacman_local_db(self, db_path='/var/lib/pacman/local'):
+        """Đọc danh sách package (và group) đã cài đặt từ pacman local database"""
+        installed = set()
+
+        with os.scandir(db_path) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                desc_file = os.path.join(entry.path, 'desc')
+                try:
+                    with open(desc_file, 'r', encoding='utf-8', errors='replace') as f:
+                        section = None
+                        for line in f:
+                            line = line.strip()
+                            if line.startswith('%') and line.endswith('%'):
+                                section = line
+                            elif not line:
+                                section = None
+                            elif section in ('%NAME%', '%GROUPS%'):
+                                # Group (vd: base-devel) được coi là có khi có ít nhất một package thuộc group
+                                installed.add(line)
+                except OSError:
+                    continue
+
+        return installed
+
+    def query_rpm_packages(self):
+        """Truy vấn rpmdb để lấy danh sách package đã cài đặt"""
+        result = subprocess.run(['rpm', '-qa', '--qf', '%{NAME}\n'],
+                                capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            raise RuntimeError(f"rpm -qa thất bại (exit code: {result.returncode})")
+        return set(result.stdout.split())
+
+    def query_rpm_groups(self, manager):
+        """Lấy các group đã cài đặt (dạng '@<tên group>') từ group list của dnf/yum (chỉ đọc cache)"""
+        config = LINUX_PACKAGE_MANAGERS[manager]
+        result = subprocess.run(config['group_list'].split(), capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            raise RuntimeError(f"{config['group_list']} thất bại (exit code: {result.returncode})")
+        # Output chỉ liệt kê group đã cài (dnf4/yum: một tên mỗi dòng, dnf5: bảng ID/Name/Installed)
+        output = result.stdout
+        return {f'@{group}' for group in config['groups'] if group in output}
+
+    def get_installed_linux_packages(self, manager):
+        """Lấy danh sách package đã cài đặt (đọc database một lần mỗi lần chạy)"""
+        if manager in self.installed_linux_packages:
+            return self.installed_linux_packages[manager]
+
+        installed = None
+        try:
+            if manager == 'apt':
+                installed = self.read_dpkg_status()
+            elif manager == 'pacman':
+                installed = self.read_pacman_local_db()
+            elif manager in ('yum', 'dnf', 'zypper'):
+                installed = self.query_rpm_packages()
+                if LINUX_PACKAGE_MANAGERS[manager].get('groups'):
+                    try:
+                        installed |= self.query_rpm_groups(manager)
+                    except Exception as e:
+                        # Không biết trạng thái group, coi như group còn thiếu
+                        logger.warning(f"Không thể đọc danh sách group của {manager}: {e}")
+        except Exception as e:
+            logger.warning(f"Không thể đọc package database của {manager}: {e}")
+
+        if installed is not None:
+            logger.info(f"Đã đọc {len(installed)} package đã cài đặt từ database của {manager}")
+            self.installed_linux_packages[manager] = installed
+        return installed
+
+    def get_missing_linux_packages(self, manager, packages):
+        """Trả về các package chưa được cài đặt (giữ nguyên thứ tự)"""
+        installed = self.get_installed_linux_packages(manager)
+        if installed is None:
+            # Không đọc được database, coi như tất cả đều thiếu
+            return list(packages)
+        return [package for package in packages if package not in installed]
+
+    def detect_linux_package_manager(self):
+        """Phát hiện Linux package manager (ưu tiên dnf hơn yum)"""
+        for manager in LINUX_PACKAGE_MANAGERS:
+            if self.which(manager):
+                return manager
         return None
 
-    def detect_existing_cmake(self):
-        """Phát hiện CMake có sẵn trên hệ thống"""
-        logger.info("Tìm kiếm CMake có sẵn...")
+    def is_package_index_fresh(self, manager):
+        """Kiểm tra package index có mới hơn package_index_max_age hay không"""
+        newest = 0
+        for pattern in LINUX_PACKAGE_MANAGERS[manager]['index_files']:
+            for index_file in glob.glob(pattern):
+                try:
+                    newest = max(newest, os.stat(index_file).st_mtime)
+                except OSError:
+                    continue
 
-        # Kiểm tra trong PATH
-        if shutil.which('cmake'):
-            logger.info("CMake đã có trong PATH")
-            return True
+        if not newest:
+            return False
 
-        # Tìm kiếm trong các thư mục thông thường
-        cmake_paths = [
-            'C:\\Program Files\\CMake\\bin',
-            'C:\\Program Files (x86)\\CMake\\bin',
-            'C:\\CMake\\bin',
-            'C:\\msys64\\mingw64\\bin',
-            'C:\\msys64\\usr\\bin'
-        ]
-
-        for cmake_path in cmake_paths:
-            cmake_exe = os.path.join(cmake_path, 'cmake.exe')
-            if os.path.exists(cmake_exe):
-                logger.info(f"Tìm thấy CMake tại: {cmake_exe}")
-                self.add_to_path(cmake_path)
-                return True
+        age = time.time() - newest
+        logger.info(f"Package index của {manager} được cập nhật cách đây {int(age)} giây")
+        return age < self.package_index_max_age
 
-        return False
+    def install_linux_compiler(self):
+        """Cài đặt compiler trên Linux"""
+        logger.info("Cài đặt GCC và các công cụ cần thiết trên Linux...")
+        
+        # Phát hiện package manager
+        manager = self.detect_linux_package_manager()
+        if not manager:
+            logger.warning("Không tìm thấy package manager được hỗ trợ (apt/dnf/yum/pacman/zypper)")
+            return False
 
-    def detect_existing_ninja(self):
-        """Phát hiện Ninja có sẵn trên hệ thống"""
-        logger.info("Tìm kiếm Ninja có sẵn...")
+        config = LINUX_PACKAGE_MANAGERS[manager]
 
-        # Kiểm tra trong PATH
-        if shutil.which('ninja'):
-            logger.info("Ninja đã có trong PATH")
+        # Tính các package còn thiếu từ local database
+        # Group (vd: "Development Tools" của dnf/yum) được kiểm tra như package với tên '@<group>'
+        groups = [f'@{group}' for group in config.get('groups', [])]
+        missing = self.get_missing_linux_packages(manager, groups + config['packages'])
+        if not missing:
+            logger.info(f"Tất cả package cần thiết đã được cài đặt ({manager}), bỏ qua")
             return True
 
-        # Tìm kiếm trong các thư mục thông thường
-        ninja_paths = [
-            'C:\\Program Files\\ninja',
-            'C:\\ninja',
-            'C:\\msys64\\mingw64\\bin',
-            'C:\\msys64\\usr\\bin'
-        ]
-
-        for ninja_path in ninja_paths:
-            ninja_exe = os.path.join(ninja_path, 'ninja.exe')
-            if os.path.exists(ninja_exe):
-                logger.info(f"Tìm thấy Ninja tại: {ninja_exe}")
-                self.add_to_path(ninja_path)
-                return True
+        logger.info(f"Các package còn thiếu: {', '.join(missing)}")
 
-        return False
+        if self.accelerate:
+            self.accelerate_linux_package_manager(manager)
 
-    def refresh_environment(self):
-        """Refresh environment variables sau khi cài đặt"""
-        logger.info("Đang refresh environment variables...")
+        # Chỉ refresh package index khi đã cũ
+        install_cmd = config['install']
+        if self.is_package_index_fresh(manager):
+            logger.info(f"Package index của {manager} còn mới, bỏ qua refresh")
+        elif config.get('refresh_install'):
+            install_cmd = config['refresh_install']
+        else:
+            try:
+                self.run_command(f"sudo {config['refresh']}")
+            except:
+                logger.warning(f"Lỗi khi chạy: {config['refresh']}")
 
+        # Một transaction duy nhất cho tất cả package (và group) còn thiếu
+        targets = [f'"{package}"' if package in groups else package for package in missing]
         try:
-            if self.system == 'windows':
-                # Refresh Windows environment
-                import ctypes
-                # Send WM_SETTINGCHANGE message to all windows
-                ctypes.windll.user32.SendMessageW(0xFFFF, 0x001A, 0, 'Environment')
+            self.run_command(f"sudo {install_cmd} {' '.join(targets)}")
+        except:
+            logger.warning("Lỗi khi cài đặt theo batch, thử lại từng package...")
 
-                # Alternative: use setx to refresh environment
+            # Database đã thay đổi một phần, đọc lại để biết package nào thất bại
+            self.installed_linux_packages.pop(manager, None)
+            for package in self.get_missing_linux_packages(manager, missing):
+                target = f'"{package}"' if package in groups else package
                 try:
-                    self.run_command('setx DUMMY_VAR "dummy" /M', check=False)
-                    self.run_command('reg delete "HKLM\\SYSTEM\\CurrentControlSet\\Control\\Session Manager\\Environment" /v DUMMY_VAR /f', check=False)
+                    self.run_command(f"sudo {config['install']} {target}")
                 except:
-                    pass
+                    logger.warning(f"Không thể cài đặt {package}")
 
-                logger.info("Đã refresh Windows environment")
-            else:
-                # Unix/Linux/macOS
-                # Source .bashrc or similar
-                shell_files = ['~/.bashrc', '~/.bash_profile', '~/.zshrc', '~/.profile']
-                for shell_file in shell_files:
-                    try:
-                        shell_file_path = os.path.expanduser(shell_file)
-                        if os.path.exists(shell_file_path):
-                            self.run_command(f'source {shell_file_path}', check=False)
-                    except:
-                        pass
+        # Database đã thay đổi, đọc lại ở lần kiểm tra sau
+        self.installed_linux_packages.pop(manager, None)
+        return True
 
-                logger.info("Đã refresh Unix environment")
 
-        except Exception as e:
-            logger.warning(f"Không thể refresh environment: {e}")
+class MacOSCppDepsInstaller(CppDepsInstaller):
+    """Installer cho macOS: Xcode Command Line Tools và Homebrew"""
 
-    def force_path_refresh(self):
-        """Buộc refresh PATH environment variable"""
-        logger.info("Buộc refresh PATH...")
+    platform_system = 'darwin'
+
+    def install_platform_compiler(self):
+        """Cài đặt Xcode Command Line Tools"""
+        self.install_macos_compiler()
 
-        # Đọc lại PATH từ registry (Windows) hoặc environment
-        if self.system == 'windows':
+    def install_macos_compiler(self):
+        """Cài đặt compiler trên macOS"""
+        logger.info("Cài đặt Xcode Command Line Tools và Homebrew...")
+        
+        # Cài đặt Xcode Command Line Tools
+        try:
+            self.run_command('xcode-select --install')
+        except:
+            logger.info("Xcode Command Line Tools có thể đã được cài đặt")
+        
+        # Cài đặt Homebrew
+        if not self.which('brew'):
+            homebrew_install_script = '/bin/bash -c "$(curl -fsSL https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)"'
             try:
-                # Đọc PATH từ registry
-                import winreg
-                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 'Environment', 0, winreg.KEY_READ)
+                self.run_command(homebrew_install_script)
+                self.get_executable_index().refresh()
+            except:
+                logger.warning("Không thể cài đặt Homebrew tự động")
+        
+        # Cài đặt các package cần thiết
+        if self.which('brew'):
+            packages = ['cmake', 'ninja', 'llvm', 'gdb']
+            for package in packages:
                 try:
-                    current_path, _ = winreg.QueryValueEx(key, 'PATH')
-                    os.environ['PATH'] = current_path
-                    logger.info("Đã refresh PATH từ registry")
+                    self.run_command(f'brew install {package}')
                 except:
-                    pass
-                finally:
-                    winreg.CloseKey(key)
-            except Exception as e:
-                logger.error(f"Lỗi khi refresh PATH: {e}")
-        else:
-            # Unix/Linux/macOS - reload PATH
-            try:
-                result = self.run_command('echo $PATH', check=False)
-                if result.returncode == 0:
-                    os.environ['PATH'] = result.stdout.strip()
-                    logger.info("Đã refresh PATH từ shell")
-            except:
-                pass
-
-    def cleanup(self):
-        """Dọn dẹp các file tạm"""
-        try:
-            shutil.rmtree(self.temp_dir)
-            logger.info("Đã dọn dẹp các file tạm")
-        except Exception as e:
-            logger.error(f"Lỗi khi dọn dẹp: {e}")
+                    logger.warning(f"Không thể cài đặt {package}")
 
-    def run_full_installation(self):
-        """Chạy toàn bộ quá trình cài đặt"""
-        logger.info("Bắt đầu cài đặt C/C++ dependencies...")
-        logger.info(f"Hệ điều hành: {self.system}")
-        logger.info(f"Kiến trúc: {self.architecture}")
-        logger.info(f"Quyền admin: {self.is_admin}")
-        logger.info(f"Thư mục cài đặt: {self.install_dir}")
-        
-        try:
-            # Tạo thư mục cài đặt
-            self.install_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Cài đặt compiler
-            self.install_compiler()
-            
-            # Kiểm tra và cài đặt MSBuild và MSYS2 (Windows only)
-            if self.system == 'windows':
-                if not self.detect_existing_msbuild():
-                    logger.info("MSBuild chưa được cài đặt, tiến hành cài đặt...")
-                    self.setup_msbuild_path()  # Thử tìm lại sau khi cài VS Build Tools
-                    if not self.detect_existing_msbuild():
-                        self.install_msbuild_standalone()
-
-                # Kiểm tra và cài đặt MSYS2/MinGW
-                if not self.detect_existing_msys2():
-                    logger.info("MSYS2/MinGW chưa được cài đặt, tiến hành cài đặt...")
-                    self.setup_msys2_path()  # Thử tìm lại sau khi cài VS Build Tools
-                    if not self.detect_existing_msys2():
-                        self.install_msys2()
-            
-            # Cài đặt CMake (đảm bảo được cài đặt)
-            if not self.detect_existing_cmake():
-                logger.info("CMake chưa được cài đặt, tiến hành cài đặt...")
-                self.install_cmake()
-            else:
-                logger.info("CMake đã được cài đặt")
 
-            # Cài đặt Ninja
-            if not self.detect_existing_ninja():
-                logger.info("Ninja chưa được cài đặt, tiến hành cài đặt...")
-                self.install_ninja()
-            else:
-                logger.info("Ninja đã được cài đặt")
+# Installer theo hệ điều hành (platform.system().lower()); CppDepsInstaller() chọn lớp phù hợp
+PLATFORM_INSTALLERS = {
+    'windows': WindowsCppDepsInstaller,
+    'linux': LinuxCppDepsInstaller,
+    'darwin': MacOSCppDepsInstaller,
+}
 
-            # Cài đặt vcpkg
-            self.install_vcpkg()
 
-            # Cài đặt Conan
-            self.install_conan()
+def get_platform_installer_class(system):
+    """Lớp installer của hệ điều hành (CppDepsInstaller nếu chưa hỗ trợ)"""
+    return PLATFORM_INSTALLERS.get(system, CppDepsInstaller)
 
-            # Cài đặt các công cụ bổ sung
-            self.install_additional_tools()
-            
-            # Refresh environment trước khi kiểm tra
-            self.refresh_environment()
-            self.force_path_refresh()
 
-            # Kiểm tra cài đặt
-            success = self.verify_installation()
+def has_cli_option(name):
+    """Kiểm tra option có trong command line (--name hoặc --name=value)"""
+    return any(arg == name or arg.startswith(f'{name}=') for arg in sys.argv[1:])
 
-            if success:
-                logger.info("🎉 Cài đặt hoàn tất thành công!")
-                logger.info("Tất cả công cụ đã được cài đặt và sẵn sàng sử dụng.")
-            else:
-                logger.warning("⚠️ Cài đặt hoàn tất nhưng một số công cụ có thể chưa sẵn sàng.")
-                logger.info("Gợi ý:")
-                logger.info("  1. Khởi động lại terminal/command prompt")
-                logger.info("  2. Kiểm tra PATH environment variable")
-                logger.info("  3. Chạy lại script với --verify-only để kiểm tra")
-                logger.info("  4. Cài đặt thủ công các công cụ còn thiếu")
-            
-        except Exception as e:
-            logger.error(f"Lỗi trong quá trình cài đặt: {e}")
-        finally:
-            self.cleanup()
+def get_cli_option(name, default=None, separate=False):
+    """Lấy giá trị của option dạng --name=value (separate=True: chấp nhận cả --name value)"""
+    args = sys.argv[1:]
+    for i, arg in enumerate(args):
+        if arg.startswith(f'{name}='):
+            return arg.split('=', 1)[1]
+        if separate and arg == name and i + 1 < len(args) and not args[i + 1].startswith('--'):
+            return args[i + 1]
+    return default
 
 def main():
     """Hàm chính"""
+    # Logging qua queue để không chặn worker threads; text hoặc json, có thể ghi thêm file xoay vòng
+    log_format = get_cli_option('--log-format', 'text', separate=True)
+    if log_format not in LOG_FORMATS:
+        logger.error(f"Log format không hợp lệ: {log_format} (hỗ trợ: {', '.join(LOG_FORMATS)})")
+        sys.exit(2)
+    setup_logging(log_format, get_cli_option('--log-file', separate=True),
+                  get_cli_option('--log-file-max-size', DEFAULT_LOG_FILE_MAX_SIZE, separate=True))
+
+    command_log_level = get_cli_option('--command-log-level')
+    if command_log_level:
+        try:
+            parse_log_level(command_log_level)
+        except ValueError as e:
+            logger.error(f"--command-log-level: {e} (vd: debug, info, warning; xem --help)")
+            sys.exit(2)
+
+    if has_cli_option('--optimize-path'):
+        # Báo cáo (mặc định) hoặc ghi PATH đã tối ưu (--optimize-path=apply)
+        installer = CppDepsInstaller(env_backend=get_cli_option('--env-backend'))
+        apply = get_cli_option('--optimize-path') == 'apply'
+        result = installer.optimize_path(apply=apply)
+        if apply and installer.system != 'windows':
+            sys.stdout.write(f'export PATH={shell_quote(result["path"])}\n')
+        installer.cleanup()
+        return
+
+    if '--print-env' in sys.argv:
+        # Chỉ in các export ra stdout (vd: eval "$(python auto_install_cpp_deps.py --print-env)")
+        installer = CppDepsInstaller(env_backend=get_cli_option('--env-backend'))
+        installer.print_environment()
+        installer.cleanup()
+        return
+
     print("=" * 60)
     print("🔧 AUTO C/C++ DEPENDENCIES INSTALLER 🔧")
     print("Tự động cài đặt tất cả dependencies cần thiết cho C/C++")
@@ -1689,6 +4502,44 @@ Options:
     --verify-only      Chỉ kiểm tra các công cụ đã cài đặt
     --debug            Chạy với chế độ debug (thông tin chi tiết hơn)
     --force-install    Buộc cài đặt lại tất cả (bỏ qua detection)
+    --accelerate       Bật tải song song cho pacman/dnf và xếp hạng MSYS2 mirrors
+    --pacman-cache=DIR Dùng pacman cache chung (local hoặc network share) cho mọi MSYS2 root
+    --seed-pacman-cache[=FILE]
+                       Tải trước packages (từ FILE, mỗi dòng một package) vào pacman cache chung
+    --prune-pacman-cache[=SIZE]
+                       Xóa package cũ nhất để pacman cache chung không vượt quá SIZE (mặc định 10G)
+    --vcpkg-reference=DIR
+                       Dùng git object store chung (bare mirror tại DIR) khi clone vcpkg
+    --vcpkg-shallow    Clone vcpkg với --depth 1 (mặc định: partial clone --filter=blob:none)
+    --vcpkg-binary-cache=DIR
+                       Cấu hình vcpkg binary cache (local hoặc shared path) qua VCPKG_BINARY_SOURCES
+    --vcpkg-warm-cache=PORTS
+                       Build trước các ports (danh sách cách nhau bởi dấu phẩy hoặc file) vào binary cache
+    --vcpkg-warm-jobs=N
+                       Số ports build song song khi làm nóng cache (mặc định 4)
+    --vcpkg-cache-stats
+                       Báo cáo kích thước và tỉ lệ cache hit của vcpkg binary cache
+    --conan-wheelhouse=DIR
+                       Wheelhouse local để cài Conan offline vào venv riêng
+    --conan-download-cache=DIR
+                       Download cache dùng chung cho Conan (core.download/core.sources)
+    --lazy-vcpkg       Chỉ đặt vcpkg shim lên PATH, clone/bootstrap vcpkg khi dùng lần đầu
+    --probe-timeout=SEC
+                       Timeout cho mỗi lần kiểm tra version của tool (mặc định 15 giây)
+    --no-probe-cache   Không dùng cache kết quả kiểm tra version (luôn chạy lại tool)
+    --shim-bin         Chỉ thêm một thư mục shim (symlink/launcher tới các tool) vào PATH
+    --optimize-path[=apply]
+                       Bỏ trùng lặp/thư mục không tồn tại trong PATH, đưa toolchain lên đầu và
+                       báo cáo thời gian tìm executable (=apply: ghi User PATH / in export PATH)
+    --env-backend=NAME Nơi lưu PATH/biến môi trường: registry, shell hoặc memory (không ghi gì, để thử/benchmark)
+    --print-env        In PATH và biến môi trường do installer quản lý (dạng export/set) cho CI
+    --log-format=FORMAT
+                       Định dạng log: text (mặc định) hoặc json (mỗi dòng một object với event,
+                       step, tool, duration_ms, bytes, exit_code)
+    --log-file=FILE    Ghi thêm log vào FILE, xoay vòng khi vượt --log-file-max-size (mặc định 10M)
+    --command-log-level=LEVEL
+                       Mức log cho output của các command (apt, pacman, git...), vd: debug để ẩn
+                       khỏi console (mặc định INFO, hoặc CPPDEPS_COMMAND_LOG_LEVEL)
 
 Công cụ sẽ được cài đặt:
     - Compiler (GCC/Clang/MSVC)
@@ -1701,13 +4552,100 @@ Công cụ sẽ được cài đặt:
         """)
         return
 
-    if '--verify-only' in sys.argv:
-        installer = CppDepsInstaller()
-        installer.verify_installation()
+    if has_cli_option('--bootstrap-vcpkg'):
+        # Được gọi bởi vcpkg shim khi vcpkg được dùng lần đầu
+        installer = CppDepsInstaller(vcpkg_reference=get_cli_option('--vcpkg-reference'),
+                                     vcpkg_shallow='--vcpkg-shallow' in sys.argv,
+                                     vcpkg_binary_cache=get_cli_option('--vcpkg-binary-cache'),
+                                     command_log_level=command_log_level,
+                                     env_backend=get_cli_option('--env-backend'))
+        if get_cli_option('--bootstrap-vcpkg'):
+            installer.install_dir = Path(get_cli_option('--bootstrap-vcpkg'))
+        success = installer.bootstrap_vcpkg_locked()
+        installer.cleanup()
+        sys.exit(0 if success else 1)
+
+    if has_cli_option('--seed-pacman-cache') or has_cli_option('--prune-pacman-cache'):
+        installer = CppDepsInstaller(pacman_cache_dir=get_cli_option('--pacman-cache'),
+                                     command_log_level=command_log_level,
+                                     env_backend=get_cli_option('--env-backend'))
+        if installer.system != 'windows':
+            logger.error("pacman cache dùng chung chỉ hỗ trợ cho MSYS2 trên Windows")
+            return
+        if not installer.pacman_cache_dir:
+            logger.error("Cần chỉ định --pacman-cache=DIR hoặc CPPDEPS_PACMAN_CACHE")
+            return
+
+        if has_cli_option('--seed-pacman-cache'):
+            package_list = get_cli_option('--seed-pacman-cache')
+            packages = None
+            if package_list:
+                with open(package_list, 'r') as f:
+                    packages = [line.strip() for line in f
+                                if line.strip() and not line.startswith('#')]
+            installer.seed_pacman_cache(packages)
+
+        if has_cli_option('--prune-pacman-cache'):
+            installer.prune_pacman_cache(get_cli_option('--prune-pacman-cache') or
+                                         DEFAULT_PACMAN_CACHE_MAX_SIZE)
+        installer.cleanup()
+        return
+
+    if has_cli_option('--vcpkg-warm-cache') or '--vcpkg-cache-stats' in sys.argv:
+        installer = CppDepsInstaller(vcpkg_binary_cache=get_cli_option('--vcpkg-binary-cache'),
+                                     command_log_level=command_log_level,
+                                     env_backend=get_cli_option('--env-backend'))
+        if not installer.vcpkg_binary_cache:
+            logger.error("Cần chỉ định --vcpkg-binary-cache=DIR hoặc CPPDEPS_VCPKG_BINARY_CACHE")
+            return
+
+        if has_cli_option('--vcpkg-warm-cache'):
+            ports = get_cli_option('--vcpkg-warm-cache', '')
+            if os.path.isfile(ports):
+                with open(ports, 'r') as f:
+                    ports = [line.strip() for line in f
+                             if line.strip() and not line.startswith('#')]
+            else:
+                ports = [port.strip() for port in ports.split(',') if port.strip()]
+            jobs = get_cli_option('--vcpkg-warm-jobs')
+            installer.warm_vcpkg_binary_cache(ports, int(jobs) if jobs else None)
+
+        if '--vcpkg-cache-stats' in sys.argv:
+            installer.vcpkg_cache_stats()
+        installer.cleanup()
         return
 
+    probe_timeout = get_cli_option('--probe-timeout', DEFAULT_PROBE_TIMEOUT)
+    try:
+        probe_timeout = float(probe_timeout)
+        if not 0 < probe_timeout < float('inf'):  # loại cả nan/inf
+            raise ValueError
+    except ValueError:
+        logger.error(f"--probe-timeout phải là số giây lớn hơn 0: {probe_timeout} (xem --help)")
+        sys.exit(2)
+
+    if '--verify-only' in sys.argv:
+        installer = CppDepsInstaller(probe_timeout=probe_timeout,
+                                     probe_cache='--no-probe-cache' not in sys.argv,
+                                     env_backend=get_cli_option('--env-backend'))
+        success = installer.verify_installation()
+        installer.cleanup()
+        sys.exit(0 if success else 1)
+
     # Kiểm tra quyền admin trên Windows
-    installer = CppDepsInstaller()
+    installer = CppDepsInstaller(accelerate='--accelerate' in sys.argv,
+                                 pacman_cache_dir=get_cli_option('--pacman-cache'),
+                                 vcpkg_reference=get_cli_option('--vcpkg-reference'),
+                                 vcpkg_shallow='--vcpkg-shallow' in sys.argv,
+                                 vcpkg_binary_cache=get_cli_option('--vcpkg-binary-cache'),
+                                 conan_wheelhouse=get_cli_option('--conan-wheelhouse'),
+                                 conan_download_cache=get_cli_option('--conan-download-cache'),
+                                 lazy_vcpkg='--lazy-vcpkg' in sys.argv,
+                                 probe_timeout=probe_timeout,
+                                 probe_cache='--no-probe-cache' not in sys.argv,
+                                 shim_bin='--shim-bin' in sys.argv,
+                                 env_backend=get_cli_option('--env-backend'),
+                                 command_log_level=command_log_level)
     if installer.system == 'windows' and not installer.is_admin and '--no-admin' not in sys.argv:
         logger.warning("⚠️ Khuyến nghị chạy với quyền Administrator để cài đặt đầy đủ.")
         response = input("Bạn có muốn tiếp tục không? (y/N): ")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark thời gian khởi động của auto_install_cpp_deps.py
+- Thời gian import module (python -X importtime)
+- Thời gian tới dòng output đầu tiên của các lệnh nhẹ (--help, --print-env)
+"""
+
+import os
+import sys
+import subprocess
+import time
+import statistics
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(SCRIPT_DIR, 'auto_install_cpp_deps.py')
+MODULE = 'auto_install_cpp_deps'
+
+DEFAULT_RUNS = 10
+TOP_IMPORTS = 15
+STARTUP_COMMANDS = (['--help'], ['--print-env'])
+
+
+def measure_import_time():
+    """Chạy python -X importtime, trả về (tổng thời gian module µs, danh sách import nặng nhất)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {MODULE}'],
+        cwd=SCRIPT_DIR, capture_output=True, text=True
+    )
+
+    # Mỗi dòng: "import time: self [us] | cumulative | imported package"
+    imports = []
+    total = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0])
+            cumulative_us = int(parts[1])
+        except ValueError:
+            continue
+        name = parts[2].strip()
+        imports.append((cumulative_us, self_us, name))
+        if name == MODULE:
+            total = cumulative_us
+
+    # Chỉ tính các import cấp cao nhất (không thụt lề) để tránh đếm trùng
+    top_level = [item for item in imports if not item[2].startswith(' ')]
+    top_level.sort(reverse=True)
+    return total, top_level[:TOP_IMPORTS]
+
+
+def measure_first_output(args, runs):
+    """Đo thời gian (ms) từ lúc chạy script tới khi có dòng output đầu tiên"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, SCRIPT] + args,
+            cwd=SCRIPT_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        )
+        process.stdout.readline()
+        samples.append((time.perf_counter() - start) * 1000)
+        process.stdout.read()
+        process.wait()
+    return samples
+
+
+def main():
+    runs = DEFAULT_RUNS
+    output_file = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--runs='):
+            runs = max(1, int(arg.split('=', 1)[1]))
+        elif arg.startswith('--output='):
+            output_file = arg.split('=', 1)[1]
+
+    lines = []
+    total, top_imports = measure_import_time()
+    if total is None:
+        lines.append(f"❌ Không đo được thời gian import {MODULE}")
+    else:
+        lines.append(f"Import {MODULE}: {total / 1000:.1f} ms (cumulative)")
+        lines.append(f"Top {len(top_imports)} import (cumulative ms / self ms):")
+        for cumulative_us, self_us, name in top_imports:
+            lines.append(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+    lines.append("")
+    lines.append(f"Thời gian tới output đầu tiên ({runs} lần chạy):")
+    for args in STARTUP_COMMANDS:
+        samples = measure_first_output(args, runs)
+        lines.append(
+            f"  {' '.join(args):<14} median {statistics.median(samples):7.1f} ms"
+            f"  min {min(samples):7.1f} ms  max {max(samples):7.1f} ms"
+        )
+
+    report = '\n'.join(lines)
+    print(report)
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+
+
+if __name__ == "__main__":
+    main()
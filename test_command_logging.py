@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Test tên tool trong log command và vòng đời của QueueListener (setup_logging)
+"""
+
+import atexit
+import logging
+
+import pytest
+
+import auto_install_cpp_deps
+from auto_install_cpp_deps import get_command_tool, setup_logging, stop_logging
+
+
+@pytest.mark.parametrize('command, tool', [
+    ('sudo -u root apt-get install -y cmake', 'apt-get'),
+    ('sudo -E env DEBIAN_FRONTEND=noninteractive -u LANG apt-get install', 'apt-get'),
+    ('sudo --user=root -- pacman -S --noconfirm ninja', 'pacman'),
+    (['sudo', '-n', 'zypper', 'install'], 'zypper'),
+    ('"C:\\msys64\\usr\\bin\\bash.exe" -lc "pacman -Syu"', 'bash'),
+    ('cmake --version', 'cmake'),
+    ('sudo -u root', ''),
+])
+def test_command_tool_skips_wrappers_and_their_options(command, tool):
+    assert get_command_tool(command) == tool
+
+
+def test_stop_logging_is_registered_once(monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    monkeypatch.setattr(auto_install_cpp_deps, 'log_atexit_registered', False)
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    try:
+        for _ in range(3):
+            setup_logging()
+            stop_logging()
+        setup_logging()
+    finally:
+        stop_logging()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+    assert registered == [stop_logging]
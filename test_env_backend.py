@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test luồng cập nhật environment qua MemoryEnvironmentBackend (chạy được trên mọi hệ điều hành)
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+from auto_install_cpp_deps import LinuxCppDepsInstaller, MemoryEnvironmentBackend, WindowsRegistryBackend
+
+
+@pytest.fixture
+def isolated_env(tmp_path, monkeypatch):
+    """HOME, XDG dirs và PATH riêng cho mỗi test"""
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path / 'config'))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('PATH', '/usr/bin:/bin')
+    # set_environment_variable ghi vào os.environ: setenv trước để monkeypatch ghi nhận giá trị gốc
+    # (kể cả khi chưa có) và khôi phục sau mỗi test, delenv để test bắt đầu không có biến này
+    for name in ('VCPKG_ROOT', 'CONAN_HOME'):
+        monkeypatch.setenv(name, '')
+        monkeypatch.delenv(name)
+    return tmp_path
+
+
+def make_installer(backend):
+    return LinuxCppDepsInstaller(env_backend=backend, probe_cache=False)
+
+
+def test_flush_merges_path_and_variables_in_one_write(isolated_env):
+    backend = MemoryEnvironmentBackend('linux', user_path='/opt/old/bin:/usr/bin')
+    installer = make_installer(backend)
+
+    installer.add_to_path('/opt/cmake/bin')
+    installer.add_to_path('/opt/ninja')
+    installer.add_to_path('/opt/old/bin')
+    installer.set_environment_variable('VCPKG_ROOT', '/opt/vcpkg')
+
+    # Thay đổi áp dụng ngay cho process, chưa ghi ra backend
+    assert os.environ['PATH'].split(os.pathsep)[:3] == ['/opt/old/bin', '/opt/ninja', '/opt/cmake/bin']
+    assert backend.writes == 0
+
+    assert installer.flush_environment()
+    assert backend.writes == 1
+    assert backend.user_path.split(':') == ['/opt/old/bin', '/usr/bin', '/opt/cmake/bin', '/opt/ninja']
+    assert backend.variables == {'VCPKG_ROOT': '/opt/vcpkg'}
+
+    # Lần chạy sau gộp vào state cũ, giá trị mới của biến thắng
+    installer.add_to_path('/opt/conan/bin')
+    installer.set_environment_variable('VCPKG_ROOT', '/srv/vcpkg')
+    installer.flush_environment()
+    state = backend.load_state()
+    assert state['path'] == ['/opt/cmake/bin', '/opt/ninja', '/opt/old/bin', '/opt/conan/bin']
+    assert state['variables'] == {'VCPKG_ROOT': '/srv/vcpkg'}
+
+    # Journal rỗng thì không ghi thêm
+    installer.flush_environment()
+    assert backend.writes == 2
+
+
+def test_cleanup_broadcasts_once_per_run(isolated_env):
+    backend = MemoryEnvironmentBackend('linux')
+    installer = make_installer(backend)
+
+    installer.add_to_path('/opt/a')
+    installer.flush_environment()
+    installer.add_to_path('/opt/b')
+    installer.set_environment_variable('CONAN_HOME', '/opt/conan')
+    installer.cleanup()
+    installer.cleanup()
+
+    assert backend.writes == 2
+    assert backend.broadcasts == 1
+
+
+def test_no_broadcast_without_changes(isolated_env):
+    backend = MemoryEnvironmentBackend('linux')
+    make_installer(backend).cleanup()
+    assert backend.writes == 0
+    assert backend.broadcasts == 0
+
+
+def test_optimize_path_writes_user_path_through_backend(isolated_env):
+    tools = isolated_env / 'tools'
+    shared = isolated_env / 'shared'
+    tools.mkdir()
+    shared.mkdir()
+    missing = isolated_env / 'missing'
+    user_path = ':'.join([str(shared), str(missing), str(tools), str(tools), '/usr/bin'])
+    backend = MemoryEnvironmentBackend('linux', user_path=user_path, machine_path='/usr/bin')
+    installer = make_installer(backend)
+
+    result = installer.optimize_path()
+    assert backend.writes == 0
+    assert result['missing'] == [str(missing)]
+    assert result['duplicates'] == [str(tools), '/usr/bin']
+
+    result = installer.optimize_path(apply=True)
+    assert backend.user_path == f'{shared}:{tools}'
+    assert backend.writes == 1
+
+    # PATH của process được tính lại từ backend (machine trước, user sau)
+    assert os.environ['PATH'].split(os.pathsep)[:3] == ['/usr/bin', str(shared), str(tools)]
+
+    installer.cleanup()
+    assert backend.broadcasts == 1
+
+
+def test_registry_read_expands_only_reg_expand_sz(monkeypatch):
+    winreg = types.SimpleNamespace(HKEY_LOCAL_MACHINE='HKLM', HKEY_CURRENT_USER='HKCU', REG_SZ=1, REG_EXPAND_SZ=2)
+    monkeypatch.setitem(sys.modules, 'winreg', winreg)
+    monkeypatch.setenv('USERPROFILE', r'C:\Users\dev')
+    registry = {
+        'HKLM': {'PATH': (r'%SystemRoot%\system32;C:\Tools', winreg.REG_EXPAND_SZ),
+                 'SystemRoot': (r'C:\Windows', winreg.REG_SZ)},
+        'HKCU': {'VCPKG_ROOT': (r'%USERPROFILE%\vcpkg', winreg.REG_EXPAND_SZ),
+                 'LITERAL': ('%VCPKG_ROOT%', winreg.REG_SZ),
+                 'PATH': (r'%VCPKG_ROOT%;C:\bin', winreg.REG_EXPAND_SZ)},
+    }
+    backend = WindowsRegistryBackend('windows')
+    monkeypatch.setattr(backend, 'read_values', lambda root, subkey: registry[root])
+
+    variables, path_entries = backend.read_effective()
+    assert variables['VCPKG_ROOT'] == r'C:\Users\dev\vcpkg'
+    assert variables['LITERAL'] == '%VCPKG_ROOT%'
+    assert path_entries == [r'C:\Windows\system32', r'C:\Tools', r'C:\Users\dev\vcpkg', r'C:\bin']
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test ToolchainDiscovery trên cây thư mục giả lập (chạy được trên mọi hệ điều hành)
+"""
+
+import collections
+import os
+import subprocess
+
+import pytest
+
+import auto_install_cpp_deps
+from auto_install_cpp_deps import ExecutableIndex, ToolchainDiscovery, VisualStudioLocator
+
+
+def touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return path
+
+
+@pytest.fixture
+def toolchain_tree(tmp_path, monkeypatch):
+    """Visual Studio, Windows SDK, MSYS2 và CMake/Ninja ngoài PATH dưới tmp_path"""
+    root = tmp_path / 'root'
+    vs_dir = root / 'Program Files' / 'Microsoft Visual Studio' / '2022' / 'BuildTools'
+    touch(vs_dir / 'MSBuild' / 'Current' / 'Bin' / 'MSBuild.exe')
+    touch(vs_dir / 'MSBuild' / 'Current' / 'Bin' / 'amd64' / 'MSBuild.exe')
+    touch(vs_dir / 'VC' / 'Tools' / 'MSVC' / '14.38.33130' / 'bin' / 'Hostx64' / 'x64' / 'cl.exe')
+
+    sdk_root = root / 'Windows Kits' / '10'
+    for version in ('10.0.9200.0', '10.0.22621.0'):
+        touch(sdk_root / 'Include' / version / 'um' / 'windows.h')
+        touch(sdk_root / 'Include' / version / 'ucrt' / 'stdio.h')
+    touch(sdk_root / 'Include' / '10.0.22621.0' / 'shared' / 'winerror.h')
+
+    msys2_root = root / 'msys64'
+    touch(msys2_root / 'usr' / 'bin' / 'bash.exe')
+    touch(msys2_root / 'usr' / 'bin' / 'pacman.exe')
+    touch(msys2_root / 'mingw64' / 'bin' / 'ninja.exe')
+
+    cmake_bin = root / 'CMake' / 'bin'
+    touch(cmake_bin / 'cmake.exe')
+
+    monkeypatch.setenv('PATHEXT', '.COM;.EXE;.BAT;.CMD')
+    monkeypatch.setattr(auto_install_cpp_deps, 'WINDOWS_SDK_SEARCH_PATHS', [str(sdk_root)])
+    monkeypatch.setattr(auto_install_cpp_deps, 'MSYS2_SEARCH_PATHS', [str(msys2_root)])
+    monkeypatch.setattr(auto_install_cpp_deps, 'CMAKE_SEARCH_PATHS',
+                        [str(cmake_bin), str(msys2_root / 'mingw64' / 'bin')])
+    monkeypatch.setattr(auto_install_cpp_deps, 'NINJA_SEARCH_PATHS',
+                        [str(root / 'ninja'), str(msys2_root / 'mingw64' / 'bin')])
+    return {'root': root, 'vs_dir': vs_dir, 'sdk_root': sdk_root, 'msys2_root': msys2_root,
+            'cmake_bin': cmake_bin}
+
+
+@pytest.fixture
+def scandir_calls(monkeypatch):
+    """Đếm số lần os.scandir được gọi cho mỗi thư mục"""
+    calls = collections.Counter()
+    original_scandir = os.scandir
+
+    def counting_scandir(path='.'):
+        calls[os.path.normpath(str(path))] += 1
+        return original_scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', counting_scandir)
+    return calls
+
+
+def make_discovery(tree, probes=None):
+    index = ExecutableIndex('windows')
+    probes = probes if probes is not None else []
+
+    def run_probe(tool_path, args):
+        probes.append(tool_path)
+        return subprocess.CompletedProcess([tool_path] + args, 0, '', '')
+
+    return ToolchainDiscovery(lambda: index, VisualStudioLocator(tree['root']), run_probe)
+
+
+def test_discovers_toolchain_paths(toolchain_tree):
+    tree = toolchain_tree
+    discovery = make_discovery(tree)
+
+    msbuild_bin = tree['vs_dir'] / 'MSBuild' / 'Current' / 'Bin'
+    assert discovery.get('msbuild') == [msbuild_bin / 'MSBuild.exe', msbuild_bin / 'amd64' / 'MSBuild.exe']
+    assert discovery.get('cl') == [tree['vs_dir'] / 'VC' / 'Tools' / 'MSVC' / '14.38.33130' /
+                                   'bin' / 'Hostx64' / 'x64' / 'cl.exe']
+    assert [sdk['version'] for sdk in discovery.get('windows_sdks')] == ['10.0.22621.0', '10.0.9200.0']
+    assert discovery.get('msys2_roots') == [str(tree['msys2_root'])]
+    assert discovery.get('msys2')['working']
+    assert discovery.get('cmake') == (str(tree['cmake_bin']), str(tree['cmake_bin'] / 'cmake.exe'))
+    ninja_dir = str(tree['msys2_root'] / 'mingw64' / 'bin')
+    assert discovery.get('ninja') == (ninja_dir, os.path.join(ninja_dir, 'ninja.exe'))
+
+    headers = discovery.find_windows_headers(['windows.h', 'stdio.h', 'winerror.h', 'missing.h'])
+    assert headers['windows.h']['version'] == '10.0.22621.0'
+    assert headers['stdio.h']['subdir'] == 'ucrt'
+    assert headers['winerror.h']['subdir'] == 'shared'
+    assert headers['missing.h'] is None
+
+
+def test_each_directory_is_listed_once(toolchain_tree, scandir_calls):
+    tree = toolchain_tree
+    probes = []
+    discovery = make_discovery(tree, probes)
+
+    for _ in range(3):
+        for kind in ('msbuild', 'msvc', 'cl', 'windows_sdk', 'msys2', 'cmake', 'ninja'):
+            discovery.get(kind)
+        discovery.find_windows_headers(['windows.h', 'stdio.h', 'winerror.h', 'missing.h'])
+
+    repeated = {path: count for path, count in scandir_calls.items() if count > 1}
+    assert repeated == {}
+    assert probes == [os.path.join(str(tree['msys2_root']), 'usr', 'bin', 'pacman.exe')]
+
+
+def test_invalidate_rediscovers_dependents(toolchain_tree):
+    tree = toolchain_tree
+    discovery = make_discovery(tree)
+    assert len(discovery.get('windows_sdks')) == 2
+
+    (tree['sdk_root'] / 'Include' / '10.0.26100.0' / 'um').mkdir(parents=True)
+    assert discovery.get('windows_sdk')['version'] == '10.0.22621.0'
+
+    discovery.invalidate('windows_sdks')
+    assert discovery.get('windows_sdk')['version'] == '10.0.26100.0'
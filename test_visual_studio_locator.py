@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test VisualStudioLocator trên cây thư mục giả lập (chạy được trên mọi hệ điều hành)
+"""
+
+import json
+
+import pytest
+
+from auto_install_cpp_deps import VisualStudioLocator
+
+
+def write_instance(program_data, instance_id, installation_path, version, packages=()):
+    """Tạo state.json của một Visual Studio instance trong ProgramData"""
+    instance_dir = program_data / 'Microsoft' / 'VisualStudio' / 'Packages' / '_Instances' / instance_id
+    instance_dir.mkdir(parents=True)
+    state = {
+        'installationPath': str(installation_path),
+        'installationVersion': version,
+        'product': {'id': 'Microsoft.VisualStudio.Product.BuildTools'},
+        'selectedPackages': [{'id': package} for package in packages]
+    }
+    (instance_dir / 'state.json').write_text(json.dumps(state), encoding='utf-8')
+
+
+def make_cl(msvc_version_dir, host, target):
+    cl_exe = msvc_version_dir / 'bin' / host / target / 'cl.exe'
+    cl_exe.parent.mkdir(parents=True)
+    cl_exe.touch()
+    return cl_exe
+
+
+@pytest.fixture
+def vs_tree(tmp_path):
+    """Instance ở thư mục tùy chỉnh (chỉ tìm được qua metadata) và một bản VS 2019 theo cấu trúc mặc định"""
+    root = tmp_path / 'root'
+    instance_path = tmp_path / 'tools' / 'VS17'
+    write_instance(root / 'ProgramData', 'abc123', instance_path, '17.9.34607.119',
+                   packages=['Microsoft.VisualStudio.Component.VC.Tools.x86.x64'])
+
+    msvc_base = instance_path / 'VC' / 'Tools' / 'MSVC'
+    make_cl(msvc_base / '14.9.0', 'Hostx64', 'x64')
+    make_cl(msvc_base / '14.38.33130', 'Hostx86', 'x86')
+    make_cl(msvc_base / '14.38.33130', 'Hostx64', 'x64')
+
+    default_path = root / 'Program Files (x86)' / 'Microsoft Visual Studio' / '2019' / 'BuildTools'
+    make_cl(default_path / 'VC' / 'Tools' / 'MSVC' / '14.29.30133', 'Hostx64', 'x64')
+    return root, instance_path, default_path
+
+
+def test_instance_metadata_is_preferred(vs_tree):
+    root, instance_path, default_path = vs_tree
+    locator = VisualStudioLocator(root)
+
+    assert [instance['path'] for instance in locator.instances()] == [instance_path]
+    assert locator.find_instances('Microsoft.VisualStudio.Component.VC.Tools.x86.x64')
+    assert locator.find_instances('Microsoft.VisualStudio.Component.Windows11SDK') == []
+    assert locator.installation_dirs() == [(17, instance_path), (16, default_path)]
+
+
+def test_msvc_versions_sort_numerically(vs_tree):
+    root, instance_path, default_path = vs_tree
+    locator = VisualStudioLocator(root)
+
+    msvc_base = instance_path / 'VC' / 'Tools' / 'MSVC'
+    assert locator.find_msvc_tools_dirs() == [
+        msvc_base / '14.38.33130',
+        default_path / 'VC' / 'Tools' / 'MSVC' / '14.29.30133',
+        msvc_base / '14.9.0'
+    ]
+    # MSVC mới nhất, host/target x64 trước x86
+    assert locator.find_cl() == msvc_base / '14.38.33130' / 'bin' / 'Hostx64' / 'x64' / 'cl.exe'
+
+
+def test_instances_are_cached_until_invalidated(vs_tree, tmp_path):
+    root, instance_path, default_path = vs_tree
+    locator = VisualStudioLocator(root)
+    assert len(locator.instances()) == 1
+
+    newer_path = tmp_path / 'tools' / 'VS18'
+    write_instance(root / 'ProgramData', 'def456', newer_path, '18.0.11111.16')
+    assert len(locator.instances()) == 1
+
+    locator.invalidate()
+    assert [instance['path'] for instance in locator.instances()] == [newer_path, instance_path]